@@ -1,15 +1,38 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, has_request_context, url_for
 from flask_cors import CORS
 import os
 import base64
-import openai
-import stripe
-import requests
-import traceback
 import logging
+import time
+import threading
+import hashlib
+import json
+import socket
+from cachetools import TTLCache
 from dotenv import load_dotenv
-from werkzeug.utils import secure_filename
 from datetime import datetime
+from urllib.parse import urlsplit
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from prompts import ANALYSIS_MODES, get_prompt
+from entitlement import DEFAULT_TTL, issue_token, verify_token
+from schemas import STYLE_LABELS, JsonFieldStream, as_dict, label_confidence, parse_result
+from translation import LANGUAGE_NAMES, translate_result
+from store_catalog import get_catalog
+from metrics import (
+    REGISTRY, PROMETHEUS_CONTENT_TYPE, REQUEST_SECONDS, RESPONSES,
+    OPENAI_RETRIES, UPSTREAM_ERRORS, STYLE_ROUTES, STYLE_ROUTING_SAVED_SECONDS,
+    STYLE_ROUTING_SAVED_USD, STYLE_ROUTING_OVERHEAD_SECONDS, STYLE_ROUTING_OVERHEAD_USD, LOCALIZED_SECONDS,
+    UPLOADS_REJECTED, SIMILARITY_ADDS, stage
+)
+from usage import USAGE, usage_counts
+from lazy_import import LazyModule
+from log_config import configure_logging
+from jobs import JobStore
+from scheduler import PriorityScheduler, QueueTimeout, Tier
+from profiling import RequestProfiler
+from image_header import InvalidImage, validate_image
 
 # --- Configuration ---
 load_dotenv()
@@ -21,35 +44,93 @@ REQUIRED_ENV_VARS = {
     'STRIPE_WEBHOOK_SECRET': 'Stripe webhook secret',
     'GOOGLE_SHEET_API_URL': 'Google Sheets API URL'
 }
+# Premium endpoints only accept tokens signed with ENTITLEMENT_SECRET.
+# ALLOW_UNGATED_PREMIUM=1 runs without it and opens them to everyone
+# (local development and load tests only)
+if os.getenv('ALLOW_UNGATED_PREMIUM', '0') != '1':
+    REQUIRED_ENV_VARS['ENTITLEMENT_SECRET'] = 'Entitlement token signing secret'
 
 missing_vars = [name for name, desc in REQUIRED_ENV_VARS.items() if not os.getenv(name)]
 if missing_vars:
     raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
 # Initialize services
-stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+def configure_stripe(module):
+    module.api_key = os.getenv('STRIPE_SECRET_KEY')
+    module.api_base = os.getenv('STRIPE_API_BASE', module.api_base)  # local stand-in for load tests (bench/stubs.py)
+
+# Heavy SDKs are imported on first use to keep cold starts short (see lazy_import.py)
+openai = LazyModule('openai')
+stripe = LazyModule('stripe', on_import=configure_stripe)
+requests = LazyModule('requests')
+similarity = LazyModule('similarity')  # numpy and PIL, only once an image is indexed or searched
+
 app = Flask(__name__)
 CORS(app)
 
 # --- Logging Configuration ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('app.log')
-    ]
-)
+# JSON lines written by a background listener (see log_config.py)
+configure_logging()
 logger = logging.getLogger(__name__)
+# Per-request lines that LOG_SAMPLE_RATES can thin out under load
+cache_logger = logging.getLogger('app.cache')
 
 # --- Constants ---
-UPLOAD_FOLDER = 'uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', 16))
+# Model slots are shared by tier (see scheduler.py); free calls never take the
+# last slots, and give up with a 503 rather than queue for too long
+PREMIUM_WEIGHT = float(os.getenv('PREMIUM_WEIGHT', 3))
+FREE_MAX_CONCURRENCY = int(os.getenv('FREE_MAX_CONCURRENCY', max(1, OPENAI_MAX_CONCURRENCY * 3 // 4)))
+FREE_MAX_QUEUE_WAIT = float(os.getenv('FREE_MAX_QUEUE_WAIT', 20))
+PREMIUM_MAX_QUEUE_WAIT = float(os.getenv('PREMIUM_MAX_QUEUE_WAIT', 60))
+ANALYSIS_CACHE_SIZE = 256
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 8))
+FULL_REPORT_MODES = ('roast', 'glowup', 'diagnostic')
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', 30))
+# /upload/batch body limit: the frontend sends pieces downscaled to ~1024px,
+# so this allows BATCH_MAX_FILES of them with room to spare
+BATCH_MAX_FILE_SIZE = int(os.getenv('BATCH_MAX_FILE_MB', 4)) * 1024 * 1024
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 8))
+JOB_TTL = int(os.getenv('JOB_TTL', 60 * 60))  # finished jobs are kept this long
+# Job records are shared by all workers on the host through this SQLite file
+JOB_DB = os.getenv('JOB_DB', os.path.join('job_store', 'jobs.sqlite3'))
+JOB_MAX_WAIT = 30  # longest a GET /jobs/<id> poll is held open
+# Fast-tier style answers below this probability are re-asked on the full tier
+STYLE_CONFIDENCE_THRESHOLD = float(os.getenv('STYLE_CONFIDENCE_THRESHOLD', 0.8))
+PREMIUM_MODES = ('roast', 'glowup', 'diagnostic', 'region')
+# Languages the model writes travel/trends in directly; any other language is
+# generated in English and translated afterwards (compare both in LOCALIZED_SECONDS).
+# Roman Urdu is left out by default: the model's output in it is too weak.
+NATIVE_LANGUAGES = {
+    code.strip() for code in os.getenv('NATIVE_LANGUAGES', 'en,fr,de,pt').split(',')
+    if code.strip() in LANGUAGE_NAMES
+}
+
+# Signed entitlement tokens are issued and enforced with this secret (required
+# at boot unless ALLOW_UNGATED_PREMIUM=1, see REQUIRED_ENV_VARS)
+ENTITLEMENT_SECRET = os.getenv('ENTITLEMENT_SECRET')
+ENTITLEMENT_TTL = int(os.getenv('ENTITLEMENT_TTL', DEFAULT_TTL))
+ALLOW_UNGATED_PREMIUM = os.getenv('ALLOW_UNGATED_PREMIUM', '0') == '1'
+if not ENTITLEMENT_SECRET:
+    logger.warning('ENTITLEMENT_SECRET not set and ALLOW_UNGATED_PREMIUM=1; premium endpoints are open to everyone')
+ANALYSIS_CACHE_TTL = 60 * 60  # 1 hour
+SHEETS_POOL_SIZE = int(os.getenv('SHEETS_POOL_SIZE', 10))
+
+# "Find looks like this": every styled upload is added to a local vector index
+SIMILARITY_INDEX = os.getenv('SIMILARITY_INDEX', '1') == '1'
+SIMILARITY_DIR = os.getenv('SIMILARITY_DIR', 'similarity_index')
+SIMILARITY_MAX_ROWS = int(os.getenv('SIMILARITY_MAX_ROWS', 2_000_000))
+SIMILAR_MAX_K = 50
+SIMILAR_MAX_QUERIES = 16
+
+# Each worker opens its upstream connections before /ready reports it ready
+WARMUP_ON_BOOT = os.getenv('WARMUP_ON_BOOT', '1') == '1'
+WARMUP_STEP_TIMEOUT = float(os.getenv('WARMUP_STEP_TIMEOUT', 5))
 
 app.config.update({
-    'UPLOAD_FOLDER': UPLOAD_FOLDER,
     'MAX_CONTENT_LENGTH': MAX_FILE_SIZE
 })
 
@@ -58,11 +139,117 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def check_upload(file):
+    """Validate an upload's name and image header before reading it; returns (ImageInfo, error message)"""
+    endpoint = current_endpoint()
+    if not allowed_file(file.filename):
+        UPLOADS_REJECTED.inc(endpoint=endpoint, reason='extension')
+        return None, 'File type not allowed'
+    try:
+        return validate_image(file.stream), None
+    except InvalidImage as e:
+        UPLOADS_REJECTED.inc(endpoint=endpoint, reason=e.reason)
+        return None, str(e)
+
 def validate_email(email):
     """Basic email validation"""
     return '@' in email and '.' in email.split('@')[-1]
 
+def normalize_email(email):
+    """Lower-case an email and drop the (non-breaking) spaces Sheets tends to add"""
+    return email.strip().lower().replace('\u00a0', '').replace(' ', '')
+
+def find_user_record(user_data, email):
+    """Pick the record for `email` out of a Google Sheets response (a list or a single record)"""
+    if isinstance(user_data, list):
+        target = normalize_email(email)
+        return next((u for u in user_data if normalize_email(u.get('email', '')) == target), None)
+    return user_data
+
+def has_verified_entitlement():
+    """Whether the request carries an entitlement token that verifies against ENTITLEMENT_SECRET"""
+    if not ENTITLEMENT_SECRET:
+        return False
+    return verify_token(request.headers.get('X-Entitlement', ''), ENTITLEMENT_SECRET) is not None
+
+def has_entitlement():
+    """Whether the request may use premium endpoints.
+
+    Without ENTITLEMENT_SECRET no token can be verified, so access is denied
+    unless ALLOW_UNGATED_PREMIUM explicitly opens it.
+    """
+    if not ENTITLEMENT_SECRET:
+        return ALLOW_UNGATED_PREMIUM
+    return has_verified_entitlement()
+
+_endpoint_scope = threading.local()
+
+def current_endpoint():
+    """Endpoint name for metric labels.
+
+    Work running outside the request (worker threads, streamed responses)
+    uses the endpoint set with endpoint_scope, else 'background'.
+    """
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return getattr(_endpoint_scope, 'name', 'background')
+
+def current_tier():
+    """Scheduling tier for model calls: 'premium' for a verified entitlement token, else 'free'.
+
+    Ungated premium access (ALLOW_UNGATED_PREMIUM) still schedules as free.
+    Like current_endpoint, work outside the request uses the tier set with
+    endpoint_scope.
+    """
+    if has_request_context():
+        if 'tier' not in g:
+            g.tier = 'premium' if has_verified_entitlement() else 'free'
+        return g.tier
+    return getattr(_endpoint_scope, 'tier', 'free')
+
+@contextmanager
+def endpoint_scope(name, tier='free'):
+    """Attribute metrics recorded in this thread to endpoint `name` and schedule its model calls as `tier`"""
+    previous = getattr(_endpoint_scope, 'name', None), getattr(_endpoint_scope, 'tier', 'free')
+    _endpoint_scope.name, _endpoint_scope.tier = name, tier
+    try:
+        yield
+    finally:
+        _endpoint_scope.name, _endpoint_scope.tier = previous
+
+# --- Request Metrics ---
+# Opt-in per-request profiles and Server-Timing (see profiling.py)
+profiler = RequestProfiler.from_env()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if profiler.enabled and profiler.wants(request.headers):
+        g.profile = profiler.start()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unknown'
+    RESPONSES.inc(endpoint=endpoint, status=response.status_code)
+    if 'request_start' in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    if 'profile' in g:
+        profile_id, timing = profiler.finish(g.pop('profile'), endpoint)
+        response.headers['Server-Timing'] = timing
+        response.headers['X-Profile-Id'] = profile_id
+    return response
+
 # --- API Endpoints ---
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics for this worker process"""
+    return Response(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/usage', methods=['GET'])
+def usage_summary():
+    """OpenAI token usage and estimated cost since this worker started"""
+    return jsonify(USAGE.summary()), 200
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -76,38 +263,37 @@ def health_check():
         }
     }), 200
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 until this worker has finished warming up"""
+    start_warmup()
+    with _warmup_lock:
+        warmup = {key: value for key, value in _warmup.items() if key != 'pid'}
+    if warmup['state'] != 'done':
+        return jsonify({'status': 'warming_up', 'warmup': warmup}), 503
+    return jsonify({'status': 'ready', 'warmup': warmup}), 200
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({'error': 'Upload is too large', 'code': 'too_large'}), 413
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Handle image uploads for style detection and fashion suggestion"""
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
-
-    file = request.files['file']
-
-    if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
-
-    if not allowed_file(file.filename):
-        return jsonify({'error': 'File type not allowed'}), 400
+    with stage('upload_file', 'encode'):
+        image, error = read_image_upload()
+    if error:
+        return jsonify({'error': error}), 400
 
     try:
-        # Secure filename and save temporarily
-        filename = secure_filename(file.filename)
-        temp_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(temp_path)
-
-        # Process image
-        with open(temp_path, 'rb') as img_file:
-            image_b64 = base64.b64encode(img_file.read()).decode('utf-8')
-
-        # Clean up
-        os.remove(temp_path)
-
         # Step 1: Detect style
-        style = detect_style(image_b64)
+        with stage('upload_file', 'detect_style'):
+            style = detect_style(image)
 
         # Step 2: Generate fashion suggestion
-        fashion_description = generate_fashion_suggestion(image_b64, style)
+        with stage('upload_file', 'generate_fashion_suggestion'):
+            fashion_description = generate_fashion_suggestion(image, style)
+        index_upload(image, style, fashion_description)
 
         # Return both
         return jsonify({
@@ -119,19 +305,118 @@ def upload_file():
         }), 200
 
     except openai.APIError as e:
-        logger.error(f'OpenAI API error: {str(e)}')
+        logger.error('OpenAI API error: %s', e)
         return jsonify({
             'error': 'AI service unavailable',
             'code': 'ai_error'
         }), 503
+    except ModelOutputError as e:
+        logger.error('Model output error: %s', e)
+        return jsonify({
+            'error': 'Unusable model output',
+            'code': 'bad_model_output'
+        }), 502
+    except QueueTimeout as e:
+        logger.warning('%s', e)
+        return jsonify({
+            'error': 'Service busy, please retry',
+            'code': 'busy'
+        }), 503, {'Retry-After': '5'}
     except Exception as e:
-        logger.error(f'Upload error: {str(e)}\n{traceback.format_exc()}')
+        logger.error('Upload error: %s', e, exc_info=True)
         return jsonify({
             'error': 'Processing failed',
             'details': str(e)
         }), 500
 
 
+def batch_item(image, tier):
+    """Style one batch image, turning failures into an error record"""
+    try:
+        with endpoint_scope('upload_batch', tier), stage('upload_batch', 'style_upload'):
+            style, suggestion = style_upload(image)
+        return {'status': 'success', 'style': style, 'fashion_suggestion': suggestion}
+    except openai.APIError as e:
+        logger.error('OpenAI API error (batch item): %s', e)
+        return {'status': 'error', 'error': 'AI service unavailable', 'code': 'ai_error'}
+    except ModelOutputError as e:
+        logger.error('Model output error (batch item): %s', e)
+        return {'status': 'error', 'error': 'Unusable model output', 'code': 'bad_model_output'}
+    except QueueTimeout as e:
+        logger.warning('%s', e)
+        return {'status': 'error', 'error': 'Service busy, please retry', 'code': 'busy'}
+    except Exception as e:
+        logger.error('Batch item error: %s', e, exc_info=True)
+        return {'status': 'error', 'error': 'Processing failed', 'details': str(e)}
+
+
+@app.route('/upload/batch', methods=['POST'])
+def upload_batch():
+    """Style many images from one multipart request ('files' parts), streaming NDJSON results.
+
+    Each line carries the item's index and filename and is sent as soon as
+    that image is done; identical images are only sent to the model once.
+    A final line reports the totals.
+    """
+    # Sized for a full batch instead of one upload; set before the body is parsed
+    request.max_content_length = BATCH_MAX_FILES * BATCH_MAX_FILE_SIZE
+    files = request.files.getlist('files')
+    if not files:
+        return jsonify({'error': 'No files part'}), 400
+    if len(files) > BATCH_MAX_FILES:
+        return jsonify({'error': f'At most {BATCH_MAX_FILES} files per batch'}), 400
+
+    rejected = []
+    by_digest = {}  # digest -> (PreparedImage, [(index, filename)])
+    for index, file in enumerate(files):
+        filename = file.filename or ''
+        info, error = check_upload(file)
+        if error:
+            rejected.append({'index': index, 'filename': filename, 'status': 'error', 'error': error})
+            continue
+        with stage('upload_batch', 'encode'):
+            image = prepare_image(file.read(), info.mimetype)
+        by_digest.setdefault(image.digest, (image, []))[1].append((index, filename))
+
+    tier = current_tier()
+
+    def generate():
+        futures = {
+            _batch_executor.submit(batch_item, image, tier): items
+            for image, items in by_digest.values()
+        }
+        succeeded = failed = 0
+        try:
+            for record in rejected:
+                failed += 1
+                yield json.dumps(record) + '\n'
+            for future in as_completed(futures):
+                result = future.result()
+                for index, filename in futures[future]:
+                    if result['status'] == 'success':
+                        succeeded += 1
+                    else:
+                        failed += 1
+                    yield json.dumps(dict(result, index=index, filename=filename)) + '\n'
+            yield json.dumps({
+                'status': 'done',
+                'total': len(files),
+                'succeeded': succeeded,
+                'failed': failed,
+                'processed_at': datetime.utcnow().isoformat()
+            }) + '\n'
+        finally:
+            # Client went away: drop images that have not started yet
+            for future in futures:
+                future.cancel()
+
+    return Response(
+        generate(),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/create-checkout-session', methods=['POST'])
 def create_checkout_session():
     """Create Stripe checkout session"""
@@ -144,43 +429,45 @@ def create_checkout_session():
         return jsonify({'error': 'Invalid email format'}), 400
     
     try:
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=[{
-                'price_data': {
-                    'currency': 'usd',
-                    'unit_amount': 500,  # $5.00
-                    'product_data': {
-                        'name': 'StyleWithAI Premium',
-                        'description': 'AI-powered outfit analysis'
+        with stage('create_checkout_session', 'stripe_create_session'):
+            checkout_session = stripe.checkout.Session.create(
+                payment_method_types=['card'],
+                line_items=[{
+                    'price_data': {
+                        'currency': 'usd',
+                        'unit_amount': 500,  # $5.00
+                        'product_data': {
+                            'name': 'StyleWithAI Premium',
+                            'description': 'AI-powered outfit analysis'
+                        },
                     },
-                },
-                'quantity': 1,
-            }],
-            mode='payment',
-            customer_email=email,
-            success_url=os.getenv('SUCCESS_URL', 'https://yourdomain.com/success'),
-            cancel_url=os.getenv('CANCEL_URL', 'https://yourdomain.com/cancel'),
-            metadata={
-                'service': 'stylewithai',
-                'timestamp': datetime.utcnow().isoformat()
-            }
-        )
+                    'quantity': 1,
+                }],
+                mode='payment',
+                customer_email=email,
+                success_url=os.getenv('SUCCESS_URL', 'https://yourdomain.com/success'),
+                cancel_url=os.getenv('CANCEL_URL', 'https://yourdomain.com/cancel'),
+                metadata={
+                    'service': 'stylewithai',
+                    'timestamp': datetime.utcnow().isoformat()
+                }
+            )
         
-        logger.info(f'Created checkout session for {email}')
+        logger.info('Created checkout session for %s', email)
         return jsonify({
             'sessionId': checkout_session.id,
             'url': checkout_session.url
         }), 200
         
     except stripe.error.StripeError as e:
-        logger.error(f'Stripe error: {str(e)}')
+        UPSTREAM_ERRORS.inc(service='stripe', kind=type(e).__name__)
+        logger.error('Stripe error: %s', e)
         return jsonify({
             'error': 'Payment processing error',
             'details': str(e.user_message if hasattr(e, 'user_message') else str(e))
         }), 500
     except Exception as e:
-        logger.error(f'Checkout error: {str(e)}')
+        logger.error('Checkout error: %s', e)
         return jsonify({
             'error': 'Internal server error',
             'details': str(e)
@@ -197,16 +484,17 @@ def stripe_webhook():
         return jsonify({'error': 'Missing signature header'}), 400
     
     try:
-        event = stripe.Webhook.construct_event(
-            payload,
-            sig_header,
-            os.getenv('STRIPE_WEBHOOK_SECRET')
-        )
+        with stage('stripe_webhook', 'verify_signature'):
+            event = stripe.Webhook.construct_event(
+                payload,
+                sig_header,
+                os.getenv('STRIPE_WEBHOOK_SECRET')
+            )
     except ValueError as e:
-        logger.error(f'Invalid payload: {str(e)}')
+        logger.error('Invalid payload: %s', e)
         return jsonify({'error': 'Invalid payload'}), 400
     except stripe.error.SignatureVerificationError as e:
-        logger.error(f'Signature verification failed: {str(e)}')
+        logger.error('Signature verification failed: %s', e)
         return jsonify({'error': 'Invalid signature'}), 400
     
     # Handle specific event types
@@ -220,132 +508,866 @@ def stripe_webhook():
         
         try:
             # Update Google Sheet
-            response = requests.post(
-                os.getenv('GOOGLE_SHEET_API_URL'),
-                json={
-                    'email': customer_email,
-                    'status': 'paid',
-                    'payment_id': session.get('id'),
-                    'amount': session.get('amount_total', 500) / 100  # Convert cents to dollars
-                },
-                timeout=10
-            )
+            with stage('stripe_webhook', 'sheets_update'):
+                response = get_sheets_session().post(
+                    os.getenv('GOOGLE_SHEET_API_URL'),
+                    json={
+                        'email': customer_email,
+                        'status': 'paid',
+                        'payment_id': session.get('id'),
+                        'amount': session.get('amount_total', 500) / 100  # Convert cents to dollars
+                    },
+                    timeout=10
+                )
             
             if response.status_code == 200:
-                logger.info(f'Updated payment status for {customer_email}')
+                logger.info('Updated payment status for %s', customer_email)
             else:
-                logger.error(f'Google Sheets update failed: {response.status_code}')
+                UPSTREAM_ERRORS.inc(service='google_sheets', kind=f'http_{response.status_code}')
+                logger.error('Google Sheets update failed: %s', response.status_code)
                 
         except requests.exceptions.RequestException as e:
-            logger.error(f'Google Sheets API error: {str(e)}')
+            UPSTREAM_ERRORS.inc(service='google_sheets', kind=type(e).__name__)
+            logger.error('Google Sheets API error: %s', e)
     
     return jsonify({'status': 'success'}), 200
 
 # --- Service Functions ---
-import time
+_openai_client = None
+_openai_client_lock = threading.Lock()
+_sheets_session = None
+_sheets_session_lock = threading.Lock()
+
+# Bounds the number of in-flight model calls across all endpoints, shared between tiers
+_model_slots = PriorityScheduler(OPENAI_MAX_CONCURRENCY, [
+    Tier('premium', PREMIUM_WEIGHT, OPENAI_MAX_CONCURRENCY, PREMIUM_MAX_QUEUE_WAIT),
+    Tier('free', 1, FREE_MAX_CONCURRENCY, FREE_MAX_QUEUE_WAIT),
+])
+
+# Shared pool for fan-out work such as the full report
+_analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='analysis')
+
+# Separate pool for /upload/batch so a large wardrobe cannot starve full reports
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+
+# Background jobs started through /jobs
+_job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+
+# One thread adds styled uploads to the similarity index, off the request path
+_index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='index')
+_similarity_index = None
+_similarity_index_lock = threading.Lock()
+
+# Finished analyses, keyed by mode + parameters + image content hash
+_analysis_cache = TTLCache(maxsize=ANALYSIS_CACHE_SIZE, ttl=ANALYSIS_CACHE_TTL)
+_analysis_cache_lock = threading.Lock()
+
+
+def get_openai_client():
+    """Process-wide OpenAI client so every model call shares one connection pool"""
+    global _openai_client
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                import httpx
+                _openai_client = openai.OpenAI(
+                    api_key=os.getenv('OPENAI_API_KEY'),
+                    max_retries=0,  # retries are handled by run_completion
+                    http_client=openai.DefaultHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=OPENAI_MAX_CONCURRENCY,
+                            max_keepalive_connections=OPENAI_MAX_CONCURRENCY
+                        )
+                    )
+                )
+    return _openai_client
+
+
+def get_similarity_index():
+    """Process-wide similarity index, opened on first use (read-only if another worker writes it)"""
+    global _similarity_index
+    if _similarity_index is None:
+        with _similarity_index_lock:
+            if _similarity_index is None:
+                _similarity_index = similarity.SimilarityIndex(SIMILARITY_DIR, max_rows=SIMILARITY_MAX_ROWS)
+    return _similarity_index
+
+
+def get_sheets_session():
+    """Process-wide requests session for the Google Sheets API, so lookups reuse pooled connections"""
+    global _sheets_session
+    if _sheets_session is None:
+        with _sheets_session_lock:
+            if _sheets_session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_maxsize=SHEETS_POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _sheets_session = session
+    return _sheets_session
+
+
+def build_messages(spec, image_b64=None, image_type='image/jpeg', **params):
+    """Build the chat messages for a registered prompt"""
+    system, user_text = spec.render(**params)
+    if spec.needs_image:
+        user_content = [
+            { 'type': 'text', 'text': user_text },
+            { 'type': 'image_url', 'image_url': { 'url': f'data:{image_type};base64,{image_b64}', 'detail': spec.image_detail } }
+        ]
+    else:
+        user_content = user_text
+    return [
+        { 'role': 'system', 'content': system },
+        { 'role': 'user', 'content': user_content }
+    ]
+
 
-def detect_style(image_b64, max_retries=3):
-    """Use OpenAI to detect clothing style with retries"""
-    client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+class CompletionStream:
+    """A streaming completion that holds its model slot until closed.
+
+    close() is idempotent, so it can be called both when the stream is read
+    to the end and when the HTTP response is closed without ever being read.
+    """
+
+    def __init__(self, stream, tier):
+        self.stream = stream
+        self.tier = tier
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return iter(self.stream)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            self.stream.close()
+        finally:
+            _model_slots.release(self.tier)
+
+
+def create_completion(prompt_name, image_b64=None, image_type='image/jpeg', max_retries=3, stream=False, **params):
+    """Create a completion for a registered prompt through the shared client, with retries.
+
+    A model slot of the current tier is held for every attempt. Streaming
+    calls return a CompletionStream that keeps the slot until it is closed.
+    """
+    spec = get_prompt(prompt_name)
+    tier = current_tier()
+    messages = build_messages(spec, image_b64, image_type, **params)
+    client = get_openai_client()
+    options = {}
+    if stream:
+        options['stream_options'] = {'include_usage': True}  # usage arrives in a final chunk
+    if spec.logprobs:
+        options['logprobs'] = True
 
     for attempt in range(1, max_retries + 1):
+        _model_slots.acquire(tier)
         try:
             response = client.chat.completions.create(
-                model='gpt-4o',
-                messages=[
-                    {
-                        'role': 'system',
-                        'content': 'Classify the outfit style from the image. Respond with ONLY one of: south_asian, east_asian, western, middle_eastern, african, latin_american, north_american'
-                    },
-                    {
-                        'role': 'user',
-                        'content': [
-                            { 'type': 'text', 'text': 'Classify this outfit:' },
-                            { 'type': 'image_url', 'image_url': { 'url': f'data:image/jpeg;base64,{image_b64}' } }
-                        ]
-                    }
-                ],
-                max_tokens=50,
-                timeout=15
+                model=spec.model,
+                messages=messages,
+                max_tokens=spec.max_tokens,
+                timeout=spec.timeout,
+                response_format=spec.response_format(),
+                stream=stream,
+                **options
             )
-
-            style = response.choices[0].message.content.strip().lower()
-            logger.info(f'Detected style: {style}')
-            return style
+            if stream:
+                return CompletionStream(response, tier)
+            _model_slots.release(tier)
+            USAGE.record(current_endpoint(), prompt_name, spec.model, response.usage)
+            return response
 
         except openai.APIError as e:
-            logger.warning(f'OpenAI APIError on attempt {attempt}/{max_retries}: {str(e)}')
+            _model_slots.release(tier)
+            UPSTREAM_ERRORS.inc(service='openai', kind=type(e).__name__)
+            logger.warning('OpenAI APIError (%s) on attempt %s/%s: %s', prompt_name, attempt, max_retries, e)
 
             # If not last attempt, wait and retry
             if attempt < max_retries:
                 wait_time = 2 * attempt  # exponential backoff
-                logger.info(f'Waiting {wait_time} seconds before retrying...')
-                time.sleep(wait_time)
+                logger.info('Waiting %s seconds before retrying...', wait_time)
+                OPENAI_RETRIES.inc(prompt=prompt_name)
+                with stage(current_endpoint(), 'retry_sleep'):
+                    time.sleep(wait_time)
             else:
-                # Last attempt failed — raise to caller (will trigger your 503 logic)
-                logger.error('All OpenAI API attempts failed.')
+                # Last attempt failed — raise to caller (will trigger the 503 logic)
+                logger.error('All OpenAI API attempts failed for %s.', prompt_name)
                 raise e
+        except Exception:
+            _model_slots.release(tier)
+            raise
 
-        except Exception as e:
-            # For other unexpected errors
-            logger.error(f'Unexpected error in detect_style: {str(e)}\n{traceback.format_exc()}')
-            raise e
 
-def generate_fashion_suggestion(image_b64, style_label):
-    """Use OpenAI to generate full fashion suggestion based on image + style"""
-    client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+class ModelOutputError(Exception):
+    """The model refused or returned JSON that does not match the prompt's schema"""
 
-    response = client.chat.completions.create(
-        model='gpt-4o',
-        messages=[
-            {
-                'role': 'system',
-                'content': f'You are a world-class fashion stylist specializing in {style_label} fashion. You will analyze the image and generate a detailed fashion recommendation. Respond in Markdown format.'
-            },
+
+def parse_model_json(prompt_name, text):
+    """Parse a structured completion; bad output is reported, never re-requested"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        raise ModelOutputError(f'{prompt_name}: model output is not valid JSON')
+    if not isinstance(data, dict):
+        raise ModelOutputError(f'{prompt_name}: model output is not a JSON object')
+    return data
+
+
+def run_completion(prompt_name, image_b64=None, image_type='image/jpeg', max_retries=3, **params):
+    """Run a registered prompt and return its parsed structured output"""
+    response = create_completion(prompt_name, image_b64, image_type, max_retries, **params)
+    return completion_json(prompt_name, response)
+
+
+def completion_json(prompt_name, response):
+    """Parsed structured output of a finished completion"""
+    choice = response.choices[0]
+    if choice.message.refusal:
+        raise ModelOutputError(f'{prompt_name}: model refused ({choice.message.refusal})')
+    if choice.finish_reason == 'length':
+        raise ModelOutputError(f'{prompt_name}: output truncated at max_tokens')
+    return parse_model_json(prompt_name, choice.message.content)
+
+
+def iter_completion_text(stream, prompt_name, endpoint):
+    """Yield the text deltas of a CompletionStream, then close it to release its model slot.
+
+    The final chunk carries the token usage, recorded against `endpoint`
+    since the request context is gone by the time the stream is read.
+    """
+    try:
+        for chunk in stream:
+            if chunk.usage is not None:
+                USAGE.record(endpoint, prompt_name, get_prompt(prompt_name).model, chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
+
+class RoutingSavings:
+    """Prices fast-tier style answers against a running average of full-tier calls.
+
+    The average is seeded with a typical high-detail gpt-4o call and then
+    follows the escalations actually observed.
+    """
+
+    def __init__(self, seconds=2.5, cost=0.0025, weight=0.1):
+        self.seconds = seconds
+        self.cost = cost
+        self.weight = weight
+        self._lock = threading.Lock()
+
+    def observe_full(self, seconds, cost):
+        with self._lock:
+            self.seconds += self.weight * (seconds - self.seconds)
+            self.cost += self.weight * (cost - self.cost)
+
+    def record_fast(self, seconds, cost):
+        STYLE_ROUTING_SAVED_SECONDS.inc(max(0.0, self.seconds - seconds))
+        STYLE_ROUTING_SAVED_USD.inc(max(0.0, self.cost - cost))
+
+    def record_escalation(self, seconds, cost):
+        STYLE_ROUTING_OVERHEAD_SECONDS.inc(seconds)
+        STYLE_ROUTING_OVERHEAD_USD.inc(cost)
+
+
+_style_savings = RoutingSavings()
+
+
+def timed_completion(prompt_name, image, max_retries):
+    """(response, seconds, estimated cost) of one style call on a PreparedImage"""
+    start = time.perf_counter()
+    response = create_completion(prompt_name, image.b64, image.type, max_retries=max_retries)
+    seconds = time.perf_counter() - start
+    cost = USAGE.cost(get_prompt(prompt_name).model, usage_counts(response.usage)) if response.usage else 0.0
+    return response, seconds, cost
+
+
+def route_style(image, max_retries=3):
+    """Classify on the fast tier; escalate to the full tier if the label is invalid or uncertain"""
+    fast_seconds = fast_cost = 0.0
+    try:
+        response, fast_seconds, fast_cost = timed_completion('style_fast', image, max_retries=1)
+        style = completion_json('style_fast', response).get('style')
+        if style not in STYLE_LABELS:
+            reason = 'invalid'
+        elif label_confidence(response.choices[0].logprobs, style) < STYLE_CONFIDENCE_THRESHOLD:
+            reason = 'low_confidence'
+        else:
+            STYLE_ROUTES.inc(route='fast', reason='confident')
+            _style_savings.record_fast(fast_seconds, fast_cost)
+            return style
+    except (openai.APIError, ModelOutputError) as e:
+        logger.warning('Fast style classification failed, escalating: %s', e)
+        reason = 'error'
+
+    STYLE_ROUTES.inc(route='escalated', reason=reason)
+    _style_savings.record_escalation(fast_seconds, fast_cost)
+    response, seconds, cost = timed_completion('style', image, max_retries=max_retries)
+    _style_savings.observe_full(seconds, cost)
+    style = completion_json('style', response).get('style')
+    if style not in STYLE_LABELS:
+        raise ModelOutputError(f'style: unknown label {style!r}')
+    return style
+
+
+def detect_style(image, max_retries=3):
+    """Use OpenAI to detect the clothing style of a PreparedImage, routed through the fast tier first"""
+    try:
+        style = route_style(image, max_retries=max_retries)
+    except openai.APIError:
+        raise
+    except Exception as e:
+        # For other unexpected errors
+        logger.error('Unexpected error in detect_style: %s', e, exc_info=True)
+        raise e
+
+    logger.info('Detected style: %s', style)
+    return style
+
+def generate_fashion_suggestion(image, style_label):
+    """Use OpenAI to generate full fashion suggestion based on a PreparedImage + style"""
+    suggestion = run_completion('suggestion', image.b64, image.type, max_retries=1, style_label=style_label)
+    logger.info('Generated fashion suggestion.')
+    return suggestion
+
+
+PreparedImage = namedtuple('PreparedImage', ['digest', 'b64', 'type'])
+
+
+def prepare_image(image_bytes, image_type='image/jpeg'):
+    """Hash and base64-encode an upload once so several analyses can share it"""
+    return PreparedImage(
+        digest=hashlib.sha256(image_bytes).hexdigest(),
+        b64=base64.b64encode(image_bytes).decode('utf-8'),
+        type=image_type
+    )
+
+
+def style_upload(image):
+    """The /upload pipeline for one PreparedImage: style detection, then the fashion suggestion"""
+    style = detect_style(image)
+    suggestion = generate_fashion_suggestion(image, style)
+    index_upload(image, style, suggestion)
+    return style, suggestion
+
+
+def add_to_index(image, style, suggestion):
+    """Add a styled upload to the index, or queue it for the worker that writes the index"""
+    try:
+        vector = similarity.image_features(base64.b64decode(image.b64))
+        result = get_similarity_index().add(image.digest, vector, style, suggestion)
+    except Exception as e:
+        SIMILARITY_ADDS.inc(result='dropped')
+        logger.warning('Could not index upload %s: %s', image.digest[:12], e)
+        return
+    SIMILARITY_ADDS.inc(result=result)
+
+
+def index_upload(image, style, suggestion):
+    """Queue a styled upload for the similarity index"""
+    if SIMILARITY_INDEX:
+        _index_executor.submit(add_to_index, image, style, suggestion)
+
+
+def analysis_cache_key(mode, image, params):
+    """Cache key for an analysis: mode, sorted parameters and image content hash"""
+    digest = image.digest if image else ''
+    return (mode, digest, tuple(sorted(params.items())))
+
+
+def store_suggestions(result, params):
+    """Section C stores for a result, looked up in the local catalog from the model's categories"""
+    return get_catalog().find_stores(params.get('user_region', ''), result['shopping_categories'])
+
+
+def localize_params(params):
+    """Prompt parameters for the requested language, plus the language to translate into afterwards (or None).
+
+    `language` arrives as a code; native languages are named in the prompt,
+    anything else is generated in English and translated.
+    """
+    if 'language' not in params:
+        return params, None
+    code = params['language']
+    if code in NATIVE_LANGUAGES:
+        return dict(params, language=LANGUAGE_NAMES[code]), None
+    return dict(params, language=LANGUAGE_NAMES['en']), code
+
+
+def observe_localized(mode, params, seconds, translated):
+    language = params['language'] if params['language'] in LANGUAGE_NAMES else 'other'
+    LOCALIZED_SECONDS.observe(
+        seconds, feature=mode, language=language, mode='translated' if translated else 'native'
+    )
+
+
+def run_analysis(mode, image=None, fresh=False, **params):
+    """Run one /analyze mode on a PreparedImage, serving repeats from the shared cache unless `fresh`"""
+    key = analysis_cache_key(mode, image, params)
+    with _analysis_cache_lock:
+        cached = None if fresh else _analysis_cache.get(key)
+    if cached is not None:
+        cache_logger.info('Analysis cache hit for %s', mode)
+        return cached
+
+    start = time.perf_counter()
+    prompt_params, translate_to = localize_params(params)
+    if image:
+        result = run_completion(mode, image.b64, image.type, **prompt_params)
+    else:
+        result = run_completion(mode, **prompt_params)
+    if translate_to:
+        schema_name = get_prompt(mode).schema
+        with stage(current_endpoint(), 'translate'):
+            result = as_dict(translate_result(parse_result(schema_name, result), translate_to))
+    if 'language' in params:
+        observe_localized(mode, params, time.perf_counter() - start, bool(translate_to))
+    if 'shopping_categories' in result:
+        result['stores'] = store_suggestions(result, params)
+
+    with _analysis_cache_lock:
+        _analysis_cache[key] = result
+    return result
+
+
+def field_events(result):
+    """NDJSON lines for each field of a finished result"""
+    return (json.dumps({'field': key, 'value': value}) + '\n' for key, value in result.items())
+
+
+def stream_analysis(mode, image=None, fresh=False, **params):
+    """Start a streaming analysis and return (generator of NDJSON field events, close callback).
+
+    Each top-level field of the structured output is sent as soon as the
+    model has finished it. The completion is opened eagerly so API errors
+    still surface as a 503 before the response starts, and the parsed result
+    is cached once the stream ends. Register the close callback on the
+    response: it releases the model slot even if the client disconnects
+    before the body is read. `fresh` skips the cache lookup, as for
+    run_analysis.
+    """
+    key = analysis_cache_key(mode, image, params)
+    with _analysis_cache_lock:
+        cached = None if fresh else _analysis_cache.get(key)
+    if cached is not None:
+        cache_logger.info('Analysis cache hit for %s', mode)
+        return field_events(cached), lambda: None
+
+    prompt_params, translate_to = localize_params(params)
+    if translate_to:
+        # Fields can only be sent once the whole result is translated
+        return field_events(run_analysis(mode, image, fresh, **params)), lambda: None
+
+    start = time.perf_counter()
+    if image:
+        stream = create_completion(mode, image.b64, image.type, stream=True, **prompt_params)
+    else:
+        stream = create_completion(mode, stream=True, **prompt_params)
+    endpoint = current_endpoint()
+
+    def generate():
+        parts = []
+        parser = JsonFieldStream()
+        for text in iter_completion_text(stream, mode, endpoint):
+            parts.append(text)
+            for name, value in parser.feed(text):
+                yield json.dumps({'field': name, 'value': value}) + '\n'
+                if name == 'shopping_categories':
+                    stores = store_suggestions({name: value}, params)
+                    yield json.dumps({'field': 'stores', 'value': stores}) + '\n'
+
+        try:
+            result = parse_model_json(mode, ''.join(parts))
+        except ModelOutputError as e:
+            logger.error('Model output error (streamed %s): %s', mode, e)
+            yield json.dumps({'error': 'Unusable model output', 'code': 'bad_model_output'}) + '\n'
+            return
+        if 'language' in params:
+            observe_localized(mode, params, time.perf_counter() - start, False)
+        if 'shopping_categories' in result:
+            result['stores'] = store_suggestions(result, params)
+        with _analysis_cache_lock:
+            _analysis_cache[key] = result
+
+    return generate(), stream.close
+
+
+def read_image_upload():
+    """Read the 'file' part of the request into a PreparedImage, or return an error message"""
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        return None, 'No file part'
+    info, error = check_upload(file)
+    if error:
+        return None, error
+    return prepare_image(file.read(), info.mimetype), None
+
+
+def analysis_params(spec):
+    """Collect a prompt's template parameters from the form data"""
+    params = {key: request.form.get(key, '').strip() for key in spec.params}
+    if 'user_region' in params and not params['user_region']:
+        params['user_region'] = 'globally available'
+    if 'language' in params:
+        params['language'] = params['language'].lower() or 'en'
+    return params
+
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
+    """Run a premium/travel/trends analysis through the shared prompt registry"""
+    mode = request.form.get('mode', '').strip().lower()
+    if mode not in ANALYSIS_MODES:
+        return jsonify({'error': f"Unknown mode. Use one of: {', '.join(ANALYSIS_MODES)}"}), 400
+
+    if mode in PREMIUM_MODES and not has_entitlement():
+        return jsonify({'error': 'Premium entitlement required', 'code': 'premium_required'}), 403
+
+    spec = get_prompt(mode)
+    image = None
+    if spec.needs_image:
+        image, error = read_image_upload()
+        if error:
+            return jsonify({'error': error}), 400
+
+    params = analysis_params(spec)
+    fresh = request.form.get('fresh') == '1'  # "regenerate": skip the analysis cache
+
+    try:
+        if request.form.get('stream') == '1':
+            events, close = stream_analysis(mode, image, fresh, **params)
+            response = Response(
+                events,
+                mimetype='application/x-ndjson',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+            response.call_on_close(close)
+            return response
+
+        result = run_analysis(mode, image, fresh, **params)
+        return jsonify({
+            'status': 'success',
+            'mode': mode,
+            'result': result,
+            'processed_at': datetime.utcnow().isoformat()
+        }), 200
+
+    except openai.APIError as e:
+        logger.error('OpenAI API error (%s): %s', mode, e)
+        return jsonify({
+            'error': 'AI service unavailable',
+            'code': 'ai_error'
+        }), 503
+    except ModelOutputError as e:
+        logger.error('Model output error (%s): %s', mode, e)
+        return jsonify({
+            'error': 'Unusable model output',
+            'code': 'bad_model_output'
+        }), 502
+    except QueueTimeout as e:
+        logger.warning('%s', e)
+        return jsonify({
+            'error': 'Service busy, please retry',
+            'code': 'busy'
+        }), 503, {'Retry-After': '5'}
+    except Exception as e:
+        logger.error('Analyze error (%s): %s', mode, e, exc_info=True)
+        return jsonify({
+            'error': 'Processing failed',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/similar', methods=['POST'])
+def similar_looks():
+    """Previously styled outfits most similar to each uploaded image ('file' parts, up to 16; k per image)"""
+    if not SIMILARITY_INDEX:
+        return jsonify({'error': 'Similarity search is disabled', 'code': 'disabled'}), 404
+    files = request.files.getlist('file')
+    if not files or files[0].filename == '':
+        return jsonify({'error': 'No file part'}), 400
+    if len(files) > SIMILAR_MAX_QUERIES:
+        return jsonify({'error': f'At most {SIMILAR_MAX_QUERIES} images per search'}), 400
+    try:
+        k = min(max(int(request.form.get('k', 10)), 1), SIMILAR_MAX_K)
+    except ValueError:
+        return jsonify({'error': 'k must be an integer'}), 400
+
+    for file in files:
+        _, error = check_upload(file)
+        if error:
+            return jsonify({'error': f'{file.filename}: {error}'}), 400
+
+    try:
+        with stage('similar_looks', 'features'):
+            queries = [similarity.image_features(file.read()) for file in files]
+        with stage('similar_looks', 'search'):
+            matches = get_similarity_index().search(queries, k)
+    except Exception as e:
+        logger.error('Similarity search error: %s', e, exc_info=True)
+        return jsonify({'error': 'Processing failed', 'details': str(e)}), 500
+
+    return jsonify({
+        'status': 'success',
+        'results': [
             {
-                'role': 'user',
-                'content': [
-                    { 'type': 'text', 'text': 'Give me a full fashion suggestion for this outfit. Include:\n- Theme Name\n- Vibe\n- Top\n- Bottom\n- Shoes\n- Accessories\n- Fit Hack\n- 2 styling tips' },
-                    { 'type': 'image_url', 'image_url': { 'url': f'data:image/jpeg;base64,{image_b64}' } }
-                ]
+                'filename': file.filename,
+                'matches': [dict(record, score=round(score, 4)) for score, record in found]
             }
+            for file, found in zip(files, matches)
         ],
-        max_tokens=800,
-        timeout=20
+        'indexed': get_similarity_index().live_count()
+    }), 200
+
+
+def full_report_section(mode, image, params, tier, fresh):
+    """Run one section of the full report, turning failures into an error record"""
+    try:
+        with endpoint_scope('analyze_full', tier):
+            result = run_analysis(mode, image, fresh, **params)
+        return {'section': mode, 'status': 'success', 'result': result}
+    except openai.APIError as e:
+        logger.error('OpenAI API error (full report, %s): %s', mode, e)
+        return {'section': mode, 'status': 'error', 'error': 'AI service unavailable', 'code': 'ai_error'}
+    except ModelOutputError as e:
+        logger.error('Model output error (full report, %s): %s', mode, e)
+        return {'section': mode, 'status': 'error', 'error': 'Unusable model output', 'code': 'bad_model_output'}
+    except QueueTimeout as e:
+        logger.warning('%s', e)
+        return {'section': mode, 'status': 'error', 'error': 'Service busy, please retry', 'code': 'busy'}
+    except Exception as e:
+        logger.error('Full report error (%s): %s', mode, e, exc_info=True)
+        return {'section': mode, 'status': 'error', 'error': 'Processing failed', 'details': str(e)}
+
+
+@app.route('/analyze/full', methods=['POST'])
+def analyze_full():
+    """Run roast, glow-up and diagnostic on one upload concurrently, streaming NDJSON sections"""
+    if not has_entitlement():
+        return jsonify({'error': 'Premium entitlement required', 'code': 'premium_required'}), 403
+
+    image, error = read_image_upload()
+    if error:
+        return jsonify({'error': error}), 400
+
+    section_params = {mode: analysis_params(get_prompt(mode)) for mode in FULL_REPORT_MODES}
+    tier = current_tier()
+    fresh = request.form.get('fresh') == '1'
+
+    def generate():
+        futures = [
+            _analysis_executor.submit(full_report_section, mode, image, section_params[mode], tier, fresh)
+            for mode in FULL_REPORT_MODES
+        ]
+        try:
+            for future in as_completed(futures):
+                yield json.dumps(future.result()) + '\n'
+            yield json.dumps({'status': 'done', 'processed_at': datetime.utcnow().isoformat()}) + '\n'
+        finally:
+            # Client went away: drop sections that have not started yet
+            for future in futures:
+                future.cancel()
+
+    return Response(
+        generate(),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
     )
 
-    suggestion_text = response.choices[0].message.content.strip()
-    logger.info(f'Generated fashion suggestion.')
-    return suggestion_text
+
+def upload_job(image, tier):
+    with endpoint_scope('jobs', tier):
+        style, suggestion = style_upload(image)
+    return {'style': style, 'fashion_suggestion': suggestion}
+
+
+def analysis_job(mode, image, params, tier):
+    with endpoint_scope('jobs', tier):
+        return run_analysis(mode, image, **params)
+
+
+def job_error(e):
+    """Error record for a failed job, with the same codes as the synchronous endpoints"""
+    if isinstance(e, openai.APIError):
+        logger.error('OpenAI API error (job): %s', e)
+        return {'error': 'AI service unavailable', 'code': 'ai_error'}
+    if isinstance(e, ModelOutputError):
+        logger.error('Model output error (job): %s', e)
+        return {'error': 'Unusable model output', 'code': 'bad_model_output'}
+    if isinstance(e, QueueTimeout):
+        logger.warning('%s', e)
+        return {'error': 'Service busy, please retry', 'code': 'busy'}
+    logger.error('Job error: %s', e, exc_info=True)
+    return {'error': 'Processing failed', 'details': str(e)}
+
+
+_jobs = JobStore(_job_executor, JOB_DB, ttl=JOB_TTL, on_error=job_error)
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Start an upload or analysis in the background and return its job id at once (202).
+
+    'kind' is 'upload' (the /upload pipeline) or an /analyze mode; the file
+    and form parameters are the same as for those endpoints. Poll the
+    returned poll_url for the result.
+    """
+    kind = request.form.get('kind', '').strip().lower()
+    if kind != 'upload' and kind not in ANALYSIS_MODES:
+        return jsonify({'error': f"Unknown kind '{kind}'"}), 400
+    if kind in PREMIUM_MODES and not has_entitlement():
+        return jsonify({'error': 'Premium entitlement required', 'code': 'premium_required'}), 403
+
+    spec = None if kind == 'upload' else get_prompt(kind)
+    image = None
+    if spec is None or spec.needs_image:
+        image, error = read_image_upload()
+        if error:
+            return jsonify({'error': error}), 400
+
+    if spec is None:
+        job = _jobs.submit(kind, upload_job, image, current_tier())
+    else:
+        job = _jobs.submit(kind, analysis_job, kind, image, analysis_params(spec), current_tier())
+
+    poll_url = url_for('get_job', job_id=job.id)
+    return jsonify(dict(job.as_dict(), poll_url=poll_url)), 202, {'Location': poll_url}
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status and result; ?wait=N holds the request open up to N seconds until it finishes.
+
+    Any worker on the host can answer, whichever one runs the job (see JOB_DB).
+    """
+    wait = min(max(request.args.get('wait', 0, type=float), 0), JOB_MAX_WAIT)
+    job = _jobs.wait(job_id, wait)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job', 'code': 'job_not_found'}), 404
+    return jsonify(job.as_dict()), 200
 
 
 @app.route('/check-premium', methods=['GET'])
 def check_premium():
-    """Proxy GET request to Google Sheet API to check premium status"""
+    """Proxy GET request to Google Sheet API to check premium status.
+
+    Paid users also get a signed entitlement token in the X-Entitlement-Token
+    header, which clients can keep and verify locally on later visits.
+    """
     email = request.args.get('email', '').strip().lower()
     
     if not email:
         return jsonify({'error': 'Missing email parameter'}), 400
     
     try:
-        response = requests.get(
-            os.getenv('GOOGLE_SHEET_API_URL'),
-            params={'email': email},
-            timeout=10
-        )
+        with stage('check_premium', 'sheets_lookup'):
+            response = get_sheets_session().get(
+                os.getenv('GOOGLE_SHEET_API_URL'),
+                params={'email': email},
+                timeout=10
+            )
         
         if response.status_code == 200:
-            logger.info(f'Checked premium status for {email}')
-            return jsonify(response.json()), 200
+            logger.info('Checked premium status for %s', email)
+            with stage('check_premium', 'entitlement'):
+                user_data = response.json()
+                headers = {}
+                user_record = find_user_record(user_data, email)
+                if ENTITLEMENT_SECRET and user_record and str(user_record.get('status', '')).strip().lower() == 'paid':
+                    headers['X-Entitlement-Token'] = issue_token(email, ENTITLEMENT_SECRET, ttl=ENTITLEMENT_TTL)
+            return jsonify(user_data), 200, headers
         else:
-            logger.error(f'Failed to check premium status: {response.status_code}')
+            UPSTREAM_ERRORS.inc(service='google_sheets', kind=f'http_{response.status_code}')
+            logger.error('Failed to check premium status: %s', response.status_code)
             return jsonify({'error': 'Failed to check premium status'}), response.status_code
         
     except requests.exceptions.RequestException as e:
-        logger.error(f'Error checking premium status: {str(e)}')
+        UPSTREAM_ERRORS.inc(service='google_sheets', kind=type(e).__name__)
+        logger.error('Error checking premium status: %s', e)
         return jsonify({'error': str(e)}), 500
 
 
+# --- Warm-up ---
+# pid of the process that started warm-up, so forked workers (gunicorn
+# --preload) warm up again with their own connections
+_warmup = {'pid': None, 'state': 'pending', 'steps': {}}
+_warmup_lock = threading.Lock()
+
+
+def warm_openai():
+    get_openai_client().models.list(timeout=WARMUP_STEP_TIMEOUT)
+
+
+def warm_google_sheets():
+    get_sheets_session().head(os.getenv('GOOGLE_SHEET_API_URL'), timeout=WARMUP_STEP_TIMEOUT, allow_redirects=False)
+
+
+def warm_stripe():
+    # The Stripe SDK keeps a connection per thread, so only DNS is worth priming here
+    socket.getaddrinfo(urlsplit(stripe.api_base).hostname, 443)
+
+
+WARMUP_STEPS = (
+    ('store_catalog', get_catalog),
+    ('openai', warm_openai),
+    ('google_sheets', warm_google_sheets),
+    ('stripe', warm_stripe),
+)
+
+
+def run_warmup():
+    """Import SDKs, build clients and open pooled connections; failed steps are logged, not fatal"""
+    steps = {}
+    for name, step in WARMUP_STEPS:
+        start = time.perf_counter()
+        try:
+            with stage('warmup', name):
+                step()
+            steps[name] = {'ok': True}
+        except Exception as e:
+            logger.warning('Warm-up step %s failed: %s', name, e)
+            steps[name] = {'ok': False, 'error': type(e).__name__}
+        steps[name]['ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    with _warmup_lock:
+        _warmup.update(state='done', steps=steps, finished_at=datetime.utcnow().isoformat())
+    timings = ', '.join(f'{name}={step["ms"]}ms' for name, step in steps.items())
+    logger.info('Warm-up finished: %s', timings)
+
+
+def start_warmup():
+    """Start warm-up once per worker process; without WARMUP_ON_BOOT the worker is ready at once"""
+    global _openai_client, _sheets_session
+    if _warmup['pid'] == os.getpid():
+        return
+    with _warmup_lock:
+        if _warmup['pid'] == os.getpid():
+            return
+        if _warmup['pid'] is not None:
+            # Forked from a process that already warmed up: its sockets are not ours
+            _openai_client = None
+            _sheets_session = None
+        _warmup.update(
+            pid=os.getpid(),
+            state='running' if WARMUP_ON_BOOT else 'done',
+            steps={},
+            started_at=datetime.utcnow().isoformat()
+        )
+    if WARMUP_ON_BOOT:
+        threading.Thread(target=run_warmup, name='warmup', daemon=True).start()
+
+
+start_warmup()
+
 # --- Main ---
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 10000))
@@ -0,0 +1,207 @@
+"""Bounded, process-wide store for per-session artifacts of the Streamlit app.
+
+Streamlit keeps everything placed in st.session_state alive until the
+session ends, so uploads, encoded images and results used to grow the
+process without limit. ArtifactStore holds them instead, under three
+budgets with least-recently-used eviction:
+
+* a per-session memory budget, so one busy visitor cannot crowd out others
+* a global memory budget across all sessions
+* a disk budget for large blobs, which are spilled to files named by their
+  content hash (shared between sessions that upload the same image)
+
+Evicted artifacts simply read back as None; callers rebuild them from the
+source (the upload is still held by the file_uploader widget). Sessions idle
+for longer than `session_ttl` are dropped on the next write.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ('session', 'key', 'value', 'digest', 'size', 'on_disk')
+
+    def __init__(self, session, key, value, digest, size, on_disk):
+        self.session = session
+        self.key = key
+        self.value = value  # None when on disk
+        self.digest = digest
+        self.size = size
+        self.on_disk = on_disk
+
+
+class ArtifactStore:
+    """Thread-safe LRU store for session artifacts with memory and disk budgets"""
+
+    def __init__(self, session_budget, global_budget, disk_budget, spill_threshold,
+                 spill_dir=None, session_ttl=3600):
+        self.session_budget = session_budget
+        self.global_budget = global_budget
+        self.disk_budget = disk_budget
+        self.spill_threshold = spill_threshold
+        self.spill_dir = spill_dir or os.path.join(tempfile.gettempdir(), 'stylewithai-artifacts')
+        self.session_ttl = session_ttl
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (session, key) -> _Entry, least recently used first
+        self._session_bytes = {}  # session -> in-memory bytes
+        self._last_seen = {}  # session -> monotonic time of last access
+        self._disk_refs = {}  # digest -> number of entries pointing at the file
+        self._disk_sizes = {}  # digest -> file size
+        self.memory_bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    # --- public API ---
+    def put(self, session, key, value):
+        """Store `value` (bytes, or any picklable object) for `session` under `key`"""
+        if isinstance(value, (bytes, bytearray)):
+            data, is_blob = bytes(value), True
+        else:
+            data, is_blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), False
+        digest = hashlib.sha256(data).hexdigest()
+        spill = is_blob and len(data) >= self.spill_threshold
+
+        with self._lock:
+            self._touch_session(session)
+            self._remove((session, key))
+            if spill:
+                self._write_blob(digest, data)
+                entry = _Entry(session, key, None, digest, len(data), True)
+            else:
+                entry = _Entry(session, key, data if is_blob else value, digest, len(data), False)
+                self.memory_bytes += entry.size
+                self._session_bytes[session] = self._session_bytes.get(session, 0) + entry.size
+            self._entries[(session, key)] = entry
+            self._enforce_budgets(session)
+            self._sweep_idle()
+
+    def get(self, session, key, default=None):
+        with self._lock:
+            self._touch_session(session)
+            entry = self._entries.get((session, key))
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end((session, key))
+            if not entry.on_disk:
+                self.hits += 1
+                return entry.value
+
+        # Spilled blobs are read without the lock, so other sessions are not
+        # held up by disk I/O; the file may be evicted meanwhile.
+        try:
+            with open(self._blob_path(entry.digest), 'rb') as f:
+                value = f.read()
+        except OSError:
+            with self._lock:
+                if self._entries.get((session, key)) is entry:
+                    self._remove((session, key))
+                self.misses += 1
+            return default
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def discard(self, session, key):
+        with self._lock:
+            self._remove((session, key))
+
+    def drop_session(self, session):
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == session]:
+                self._remove(entry_key)
+            self._session_bytes.pop(session, None)
+            self._last_seen.pop(session, None)
+
+    def stats(self, session=None):
+        """Usage summary for the debug panel"""
+        with self._lock:
+            summary = {
+                'sessions': len(self._last_seen),
+                'entries': len(self._entries),
+                'memory_bytes': self.memory_bytes,
+                'global_budget': self.global_budget,
+                'disk_bytes': sum(self._disk_sizes.values()),
+                'disk_budget': self.disk_budget,
+                'disk_files': len(self._disk_sizes),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+            if session is not None:
+                summary['session'] = {
+                    'memory_bytes': self._session_bytes.get(session, 0),
+                    'budget': self.session_budget,
+                    'artifacts': [
+                        {'key': e.key, 'bytes': e.size, 'on_disk': e.on_disk}
+                        for e in self._entries.values() if e.session == session
+                    ],
+                }
+            return summary
+
+    # --- internals (lock held) ---
+    def _blob_path(self, digest):
+        return os.path.join(self.spill_dir, digest)
+
+    def _write_blob(self, digest, data):
+        if digest not in self._disk_sizes:
+            path = self._blob_path(digest)
+            tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+            self._disk_sizes[digest] = len(data)
+        self._disk_refs[digest] = self._disk_refs.get(digest, 0) + 1
+
+    def _remove(self, entry_key, evicted=False):
+        entry = self._entries.pop(entry_key, None)
+        if entry is None:
+            return
+        if evicted:
+            self.evictions += 1
+        if entry.on_disk:
+            self._disk_refs[entry.digest] -= 1
+            if self._disk_refs[entry.digest] == 0:
+                del self._disk_refs[entry.digest]
+                del self._disk_sizes[entry.digest]
+                try:
+                    os.remove(self._blob_path(entry.digest))
+                except OSError:
+                    pass
+        else:
+            self.memory_bytes -= entry.size
+            self._session_bytes[entry.session] -= entry.size
+
+    def _evict_lru(self, predicate, over_budget):
+        for entry_key in [k for k, e in self._entries.items() if predicate(e)]:
+            if not over_budget():
+                return
+            self._remove(entry_key, evicted=True)
+
+    def _enforce_budgets(self, session):
+        self._evict_lru(
+            lambda e: e.session == session and not e.on_disk,
+            lambda: self._session_bytes.get(session, 0) > self.session_budget
+        )
+        self._evict_lru(lambda e: not e.on_disk, lambda: self.memory_bytes > self.global_budget)
+        self._evict_lru(lambda e: e.on_disk, lambda: sum(self._disk_sizes.values()) > self.disk_budget)
+
+    def _touch_session(self, session):
+        self._last_seen[session] = time.monotonic()
+
+    def _sweep_idle(self):
+        cutoff = time.monotonic() - self.session_ttl
+        idle = {s for s, seen in self._last_seen.items() if seen < cutoff}
+        if not idle:
+            return
+        for entry_key in [k for k in self._entries if k[0] in idle]:
+            self._remove(entry_key)
+        for session in idle:
+            self._session_bytes.pop(session, None)
+            self._last_seen.pop(session, None)
@@ -0,0 +1,5 @@
+"""Offline load tests for the Flask backend.
+
+Run ``python -m bench.run --help``; see bench/stubs.py for the local
+stand-ins that replace OpenAI, Stripe and Google Sheets.
+"""
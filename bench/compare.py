@@ -0,0 +1,57 @@
+"""Compare two bench.run result files.
+
+    python -m bench.compare bench/results/before.json bench/results/after.json
+
+Runs are matched on (mode, endpoint, concurrency); the table shows the new
+value and the change relative to the baseline.
+"""
+import argparse
+import json
+
+COLUMNS = (('rps', ('rps',)), ('p50', ('latency_ms', 'p50')), ('p95', ('latency_ms', 'p95')),
+           ('p99', ('latency_ms', 'p99')), ('MB', ('memory', 'peak_rss_mb_total')))
+
+
+def load_runs(path):
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    return {(r['mode'], r['endpoint'], r['concurrency']): r for r in report['runs'] if 'skipped' not in r}
+
+
+def lookup(run, keys):
+    for key in keys:
+        run = run.get(key) if isinstance(run, dict) else None
+    return run
+
+
+def change(old, new):
+    if old is None or new is None:
+        return f'{new}'
+    if not old:
+        return f'{new} (n/a)'
+    return f'{new} ({(new - old) / old:+.0%})'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    args = parser.parse_args()
+
+    baseline, candidate = load_runs(args.baseline), load_runs(args.candidate)
+    rows = [('mode', 'endpoint', 'c') + tuple(name for name, _ in COLUMNS)]
+    for key in sorted(set(baseline) & set(candidate)):
+        rows.append(tuple(str(k) for k in key) + tuple(
+            change(lookup(baseline[key], keys), lookup(candidate[key], keys)) for _, keys in COLUMNS
+        ))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+    for label, only in (('baseline', set(baseline) - set(candidate)), ('candidate', set(candidate) - set(baseline))):
+        if only:
+            print(f'Only in {label}: ' + ', '.join('/'.join(map(str, key)) for key in sorted(only)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Import-time benchmark with a budget check, based on ``python -X importtime``.
+
+Targets:
+    app       ``import app`` (the Flask backend, with placeholder credentials)
+    frontend  the top-level imports of frontend.py (the script itself only
+              runs under ``streamlit run``)
+
+Each target is imported in a fresh interpreter several times and the median
+is reported, excluding modules the bare interpreter loads anyway. With
+--boot, the time from starting the backend to its first /health response is
+measured too. The exit status is 1 when a budget is exceeded.
+
+    python -m bench.importtime --budget app=300 --budget frontend=1500 --boot
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLACEHOLDER_ENV = {
+    'OPENAI_API_KEY': 'sk-importtime',
+    'STRIPE_SECRET_KEY': 'sk_test_importtime',
+    'STRIPE_WEBHOOK_SECRET': 'whsec_importtime',
+    'GOOGLE_SHEET_API_URL': 'http://127.0.0.1:9/sheets',
+}
+
+
+def frontend_imports():
+    """Source of the module-level import statements in frontend.py"""
+    path = os.path.join(ROOT, 'frontend.py')
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    return '\n'.join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+TARGETS = {
+    'app': lambda: 'import app',
+    'frontend': frontend_imports,
+}
+
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us, depth)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def import_profile(code, env):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(f'Import failed:\n{result.stderr[-2000:]}')
+    return parse_importtime(result.stderr)
+
+
+def measure(code, env, runs, baseline):
+    """Median total import time in ms and the slowest top-level imports of the median run"""
+    import_profile(code, env)  # populate __pycache__ first
+    profiles = []
+    for _ in range(runs):
+        modules = {name: m for name, m in import_profile(code, env).items() if name not in baseline}
+        total = sum(cumulative for _, cumulative, depth in modules.values() if depth == 0)
+        profiles.append((total, modules))
+    profiles.sort(key=lambda p: p[0])
+    total, modules = profiles[len(profiles) // 2]
+    slowest = sorted(((name, cumulative) for name, (_, cumulative, depth) in modules.items() if depth == 0),
+                     key=lambda item: item[1], reverse=True)[:10]
+    return {
+        'median_ms': round(total / 1000, 1),
+        'runs_ms': [round(t / 1000, 1) for t, _ in profiles],
+        'modules': len(modules),
+        'slowest_ms': {name: round(us / 1000, 1) for name, us in slowest},
+    }
+
+
+def boot_time(env, runs):
+    """Median ms from launching the Flask backend to its first successful /health"""
+    from bench.run import free_port, server_command, start_server, stop_server
+
+    samples = []
+    for _ in range(runs):
+        port = free_port()
+        started = time.perf_counter()
+        process = start_server(server_command('flask', port, None), port, env, path='/health')
+        samples.append((time.perf_counter() - started) * 1000)
+        stop_server(process)
+    return {'median_ms': round(statistics.median(samples), 1), 'runs_ms': [round(s, 1) for s in samples]}
+
+
+def parse_budget(value):
+    name, _, ms = value.partition('=')
+    if name not in TARGETS and name != 'boot':
+        raise argparse.ArgumentTypeError(f'unknown target {name!r}')
+    return name, float(ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import time of the backend and the Streamlit app')
+    parser.add_argument('--targets', default=','.join(TARGETS), help='comma-separated, from ' + ', '.join(TARGETS))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=parse_budget, action='append', default=[],
+                        help='TARGET=MS, e.g. app=300; "boot" applies to --boot')
+    parser.add_argument('--boot', action='store_true', help='also measure backend start to first response')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    env = dict(PLACEHOLDER_ENV, **os.environ, PYTHONPATH=ROOT)
+    env.pop('ENTITLEMENT_SECRET', None)
+    env['ALLOW_UNGATED_PREMIUM'] = '1'
+    baseline = set(import_profile('pass', env))
+
+    results = {}
+    for name in [t.strip() for t in args.targets.split(',') if t.strip()]:
+        results[name] = measure(TARGETS[name](), env, args.runs, baseline)
+        print(f'{name}: {results[name]["median_ms"]} ms ({results[name]["modules"]} modules)')
+        for module, ms in results[name]['slowest_ms'].items():
+            print(f'    {ms:8.1f} ms  {module}')
+    if args.boot:
+        results['boot'] = boot_time(env, args.runs)
+        print(f'boot to first response: {results["boot"]["median_ms"]} ms')
+
+    failures = []
+    for name, budget_ms in args.budget:
+        if name in results:
+            results[name]['budget_ms'] = budget_ms
+            if results[name]['median_ms'] > budget_ms:
+                failures.append(f'{name}: {results[name]["median_ms"]} ms > budget {budget_ms} ms')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    for failure in failures:
+        print(f'OVER BUDGET {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
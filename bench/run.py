@@ -0,0 +1,332 @@
+"""Load-test the backend against local stubs and save the results as JSON.
+
+For every server mode, the backend is started as a subprocess wired to
+bench.stubs, then each endpoint is driven at each concurrency level for a
+fixed duration. Latency percentiles, throughput, status codes and the peak
+RSS of every worker process are written to bench/results/<timestamp>.json;
+compare two runs with ``python -m bench.compare``.
+
+    python -m bench.run --modes flask,gthread,gevent --concurrency 1,8,32 --duration 20
+
+Modes: flask (Werkzeug threaded dev server), gthread (gunicorn threads) and
+gevent (gunicorn async workers; needs gevent installed). Modes whose server
+is not installed are recorded as skipped.
+"""
+import argparse
+import hashlib
+import hmac
+import importlib.util
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from bench.stubs import add_profile_arguments, profiles_from_args, service_env, start_stub_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'bench', 'results')
+DEFAULT_IMAGE = os.path.join(ROOT, 'assets', 'stylewithai_logo.png')
+WEBHOOK_SECRET = 'whsec_bench'
+ENDPOINTS = ('upload', 'check-premium', 'stripe-webhook')
+MODES = ('flask', 'gthread', 'gevent')
+
+
+# --- Servers ---
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(mode, port, args):
+    """Command line for `mode`, or None when its server is not installed"""
+    bind = f'127.0.0.1:{port}'
+    if mode == 'flask':
+        return [sys.executable, '-c', f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    if not importlib.util.find_spec('gunicorn'):
+        return None
+    if mode == 'gthread':
+        return [sys.executable, '-m', 'gunicorn', '-k', 'gthread', '--workers', str(args.workers),
+                '--threads', str(args.threads), '--bind', bind, '--timeout', '120', 'app:app']
+    if mode == 'gevent':
+        if not importlib.util.find_spec('gevent'):
+            return None
+        return [sys.executable, '-m', 'gunicorn', '-k', 'gevent', '--workers', str(args.workers),
+                '--worker-connections', '1000', '--bind', bind, '--timeout', '120', 'app:app']
+    raise ValueError(f'Unknown mode {mode!r}')
+
+
+def start_server(command, port, env, timeout=30, path='/ready'):
+    """Start the backend and wait until `path` answers 200 (by default, until it has warmed up)"""
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited: {process.stderr.read().decode(errors="replace")[-2000:]}')
+        try:
+            if requests.get(f'http://127.0.0.1:{port}{path}', timeout=1).ok:
+                return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'Server did not answer {path} within {timeout}s')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# --- Memory ---
+def rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # the command name may contain spaces; ppid is the second field after it
+                if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                    children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return children
+
+
+class MemorySampler:
+    """Peak RSS of the server's worker processes, sampled on a background thread.
+
+    Gunicorn workers are the master's children; the Flask dev server is a
+    single process. Needs /proc, so memory is empty on macOS and Windows.
+    """
+
+    def __init__(self, pid, interval=0.25):
+        self.pid = pid
+        self.interval = interval
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            for pid in child_pids(self.pid) or [self.pid]:
+                self.peaks[pid] = max(self.peaks.get(pid, 0), rss_kb(pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if os.path.isdir('/proc'):
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def summary(self):
+        per_worker = sorted(round(kb / 1024, 1) for kb in self.peaks.values())
+        return {
+            'peak_rss_mb_per_worker': per_worker,
+            'peak_rss_mb_total': round(sum(per_worker), 1),
+            'master_rss_mb': round(rss_kb(self.pid) / 1024, 1) if per_worker and self.pid not in self.peaks else None,
+        }
+
+
+# --- Requests ---
+def build_request(endpoint, base_url, image, n):
+    """(method, url, kwargs) for the n-th request to `endpoint`"""
+    if endpoint == 'upload':
+        return 'POST', f'{base_url}/upload', {'files': {'file': ('outfit.png', image, 'image/png')}}
+    if endpoint == 'check-premium':
+        return 'GET', f'{base_url}/check-premium', {'params': {'email': f'bench{n}@example.com'}}
+    if endpoint == 'stripe-webhook':
+        payload = json.dumps({
+            'id': f'evt_bench_{n}', 'object': 'event', 'type': 'checkout.session.completed',
+            'data': {'object': {
+                'id': f'cs_test_bench_{n}', 'object': 'checkout.session',
+                'customer_email': f'bench{n}@example.com', 'amount_total': 500
+            }}
+        })
+        timestamp = int(time.time())
+        signature = hmac.new(WEBHOOK_SECRET.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+        return 'POST', f'{base_url}/stripe-webhook', {
+            'data': payload,
+            'headers': {'Content-Type': 'application/json', 'Stripe-Signature': f't={timestamp},v1={signature}'}
+        }
+    raise ValueError(f'Unknown endpoint {endpoint!r}')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def drive(endpoint, base_url, image, concurrency, duration, timeout):
+    """Keep `concurrency` clients busy for `duration` seconds; returns the run's statistics"""
+    counter = iter(range(10 ** 9))
+    counter_lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        latencies, statuses = [], {}
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            with counter_lock:
+                n = next(counter)
+            method, url, kwargs = build_request(endpoint, base_url, image, n)
+            start = time.perf_counter()
+            try:
+                status = session.request(method, url, timeout=timeout, **kwargs).status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        session.close()
+        return latencies, statuses
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: client(), range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(l for client_latencies, _ in results for l in client_latencies)
+    statuses = {}
+    for _, client_statuses in results:
+        for status, count in client_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    ok = sum(count for status, count in statuses.items() if status.isdigit() and int(status) < 400)
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': len(latencies) - ok,
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+            'max': ms(latencies[-1]) if latencies else None,
+        },
+        'status_codes': statuses,
+    }
+
+
+# --- Main ---
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def csv_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--modes', type=csv_list, default=list(MODES), help=f'comma-separated, from {", ".join(MODES)}')
+    parser.add_argument('--endpoints', type=csv_list, default=list(ENDPOINTS), help=f'comma-separated, from {", ".join(ENDPOINTS)}')
+    parser.add_argument('--concurrency', type=lambda v: [int(c) for c in csv_list(v)], default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=15, help='seconds per endpoint and concurrency level')
+    parser.add_argument('--warmup', type=int, default=3, help='unmeasured requests before each endpoint')
+    parser.add_argument('--timeout', type=float, default=120, help='client timeout per request')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn gthread threads per worker')
+    parser.add_argument('--image', default=DEFAULT_IMAGE, help='image uploaded to /upload')
+    parser.add_argument('--output', help='results file (default: bench/results/<timestamp>.json)')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as f:
+        image = f.read()
+    profiles = profiles_from_args(args)
+    stubs = start_stub_server(profiles)
+    env = dict(os.environ, **service_env(stubs.base_url), STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET, PYTHONUNBUFFERED='1')
+    env.pop('ENTITLEMENT_SECRET', None)
+    env['ALLOW_UNGATED_PREMIUM'] = '1'
+
+    report = {
+        'started_at': datetime.utcnow().isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'duration_s': args.duration, 'warmup': args.warmup, 'workers': args.workers,
+            'threads': args.threads, 'image_bytes': len(image),
+            'stubs': {service: profile.as_dict() for service, profile in profiles.items()},
+        },
+        'runs': [],
+    }
+
+    for mode in args.modes:
+        port = free_port()
+        command = server_command(mode, port, args)
+        if command is None:
+            print(f'[{mode}] skipped: server not installed')
+            report['runs'].append({'mode': mode, 'skipped': 'server not installed'})
+            continue
+
+        process = start_server(command, port, env)
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            for endpoint in args.endpoints:
+                for n in range(args.warmup):
+                    method, url, kwargs = build_request(endpoint, base_url, image, -n - 1)
+                    requests.request(method, url, timeout=args.timeout, **kwargs)
+                for concurrency in args.concurrency:
+                    stubs_before = stubs.snapshot()
+                    with MemorySampler(process.pid) as memory:
+                        stats = drive(endpoint, base_url, image, concurrency, args.duration, args.timeout)
+                    stubs_after = stubs.snapshot()
+                    run = dict({'mode': mode, 'endpoint': endpoint, 'concurrency': concurrency}, **stats)
+                    run['memory'] = memory.summary()
+                    run['upstream_calls'] = {
+                        service: {key: stubs_after[service][key] - stubs_before[service][key] for key in counts}
+                        for service, counts in stubs_after.items()
+                    }
+                    report['runs'].append(run)
+                    latency = run['latency_ms']
+                    print(f'[{mode}] {endpoint} c={concurrency}: {run["rps"]} rps, '
+                          f'p50 {latency["p50"]} ms, p95 {latency["p95"]} ms, p99 {latency["p99"]} ms, '
+                          f'{run["errors"]} errors, {run["memory"]["peak_rss_mb_total"]} MB')
+        finally:
+            stop_server(process)
+
+    stubs.shutdown()
+    output = args.output or os.path.join(RESULTS_DIR, datetime.utcnow().strftime('%Y%m%dT%H%M%SZ') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
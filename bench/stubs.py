@@ -0,0 +1,344 @@
+"""Local stand-ins for the services app.py calls, so load tests cost nothing.
+
+A single threaded HTTP server answers:
+
+    POST /v1/chat/completions   OpenAI (plain JSON or an SSE stream); the
+                                content is generated from the request's
+                                json_schema so structured-output parsing works;
+                                cached_tokens follows the provider's prefix
+                                caching rules (see PromptCacheSimulator)
+    POST /v1/checkout/sessions  Stripe checkout
+    GET  /sheets                Google Sheets lookup (every email is paid)
+    HEAD /sheets, GET /v1/models  connection warm-up
+    POST /sheets                Google Sheets update
+    GET  /_stats                requests and injected errors per service
+
+Each service has its own latency distribution and error rate. Point the
+backend at it with OPENAI_BASE_URL, STRIPE_API_BASE and GOOGLE_SHEET_API_URL
+(see service_env).
+
+    python -m bench.stubs --port 9100 --openai-latency lognormal:1.2,0.4
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SERVICES = ('openai', 'stripe', 'sheets')
+
+
+class Latency:
+    """Latency distribution parsed from a spec string (values in seconds):
+
+    none | fixed:S | uniform:LOW,HIGH | lognormal:MEDIAN,SIGMA
+    """
+
+    def __init__(self, spec='none'):
+        self.spec = spec
+        kind, _, args = spec.partition(':')
+        self.kind = kind
+        self.args = [float(a) for a in args.split(',')] if args else []
+        expected = {'none': 0, 'fixed': 1, 'uniform': 2, 'lognormal': 2}
+        if kind not in expected or len(self.args) != expected[kind]:
+            raise ValueError(f'Invalid latency spec {spec!r}')
+
+    def sample(self):
+        if self.kind == 'fixed':
+            return self.args[0]
+        if self.kind == 'uniform':
+            return random.uniform(*self.args)
+        if self.kind == 'lognormal':
+            median, sigma = self.args
+            return random.lognormvariate(math.log(median), sigma)
+        return 0.0
+
+    def __str__(self):
+        return self.spec
+
+
+@dataclass
+class ServiceProfile:
+    """How one stubbed service behaves"""
+    latency: Latency = field(default_factory=Latency)
+    error_rate: float = 0.0
+    error_status: int = 500
+
+    def as_dict(self):
+        return {'latency': str(self.latency), 'error_rate': self.error_rate, 'error_status': self.error_status}
+
+
+def sample_from_schema(schema, list_length=3):
+    """A value that satisfies a strict JSON schema as produced by schemas.py"""
+    if 'enum' in schema:
+        return random.choice(schema['enum'])
+    kind = schema.get('type')
+    if kind == 'object':
+        return {name: sample_from_schema(sub, list_length) for name, sub in schema['properties'].items()}
+    if kind == 'array':
+        return [sample_from_schema(schema['items'], list_length) for _ in range(list_length)]
+    if kind == 'integer':
+        return random.randint(1, 10)
+    if kind == 'number':
+        return round(random.uniform(0, 10), 2)
+    if kind == 'boolean':
+        return True
+    return 'Stub text standing in for a model answer of typical length.'
+
+
+def completion_content(body):
+    """JSON content for a chat completion request"""
+    response_format = body.get('response_format') or {}
+    schema = response_format.get('json_schema', {}).get('schema')
+    if schema:
+        return json.dumps(sample_from_schema(schema))
+    return 'Stub completion.'
+
+
+def prompt_units(body):
+    """The request as a sequence of ~token-sized units, in the order the provider caches them"""
+    units = []
+
+    def add_text(text):
+        units.extend(text[i:i + 4] for i in range(0, len(text), 4))
+
+    response_format = body.get('response_format')
+    if response_format:
+        add_text(json.dumps(response_format, sort_keys=True))
+    for message in body.get('messages', []):
+        parts = message.get('content')
+        for part in parts if isinstance(parts, list) else [{'type': 'text', 'text': parts or ''}]:
+            if part.get('type') == 'image_url':
+                digest = hashlib.sha1(part['image_url']['url'].encode('utf-8')).hexdigest()
+                units.extend([f'<image:{digest}>'] * 765)  # a high-detail image
+            else:
+                add_text(part.get('text', ''))
+    return units
+
+
+class PromptCacheSimulator:
+    """Approximates provider prompt caching: once a prompt has been seen, later
+    prompts sharing its first 1024 tokens (then every further 128) are cached."""
+    MIN_TOKENS = 1024
+    INCREMENT = 128
+
+    def __init__(self):
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def cached_tokens(self, model, units):
+        prefix = hashlib.sha256(model.encode('utf-8'))
+        digests, start = [], 0
+        for end in range(self.MIN_TOKENS, len(units) + 1, self.INCREMENT):
+            prefix.update(''.join(units[start:end]).encode('utf-8'))
+            digests.append((end, prefix.hexdigest()))
+            start = end
+        with self._lock:
+            cached = max((end for end, digest in digests if digest in self._seen), default=0)
+            self._seen.update(digest for _, digest in digests)
+        return cached
+
+
+def usage_block(prompt_tokens, cached_tokens, content):
+    completion_tokens = max(1, len(content) // 4)
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+        'prompt_tokens_details': {'cached_tokens': cached_tokens},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real APIs
+
+    def log_message(self, format, *args):
+        pass  # request logging would dominate the benchmark output
+
+    # --- plumbing ---
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _simulate(self, service):
+        """Sleep for the service's latency; returns True if this call should fail"""
+        profile = self.server.profiles[service]
+        self.server.count(service, 'requests')
+        time.sleep(profile.latency.sample())
+        if random.random() < profile.error_rate:
+            self.server.count(service, 'errors')
+            self._send_json(profile.error_status, {'error': {'message': f'Injected {service} error', 'type': 'stub_error'}})
+            return True
+        return False
+
+    # --- routes ---
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/_stats':
+            self._send_json(200, self.server.snapshot())
+        elif url.path.endswith('/models'):
+            self._send_json(200, {'object': 'list', 'data': []})  # backend warm-up
+        elif url.path == '/sheets':
+            if self._simulate('sheets'):
+                return
+            email = parse_qs(url.query).get('email', [''])[0]
+            self._send_json(200, [{'email': email, 'status': 'paid'}])
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_HEAD(self):
+        # Backend warm-up opens its Sheets connection with a HEAD request
+        self.send_response(200 if urlsplit(self.path).path == '/sheets' else 404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        body = self._read_body()
+        if path.endswith('/chat/completions'):
+            if not self._simulate('openai'):
+                self._chat_completion(json.loads(body or b'{}'))
+        elif path.endswith('/checkout/sessions'):
+            if not self._simulate('stripe'):
+                session_id = f'cs_test_{uuid.uuid4().hex}'
+                self._send_json(200, {
+                    'id': session_id, 'object': 'checkout.session',
+                    'url': f'https://checkout.stripe.com/c/pay/{session_id}'
+                })
+        elif path == '/sheets':
+            if not self._simulate('sheets'):
+                self._send_json(200, {'result': 'success'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def _chat_completion(self, body):
+        content = completion_content(body)
+        units = prompt_units(body)
+        cached_tokens = self.server.prompt_cache.cached_tokens(body.get('model', ''), units)
+        self.server.count('openai', 'prompt_tokens', len(units))
+        self.server.count('openai', 'cached_tokens', cached_tokens)
+        usage = usage_block(len(units), cached_tokens, content)
+        base = {'id': f'chatcmpl-{uuid.uuid4().hex}', 'created': int(time.time()), 'model': body.get('model', 'gpt-4o')}
+
+        if not body.get('stream'):
+            self._send_json(200, dict(base, object='chat.completion', usage=usage, choices=[{
+                'index': 0, 'finish_reason': 'stop', 'logprobs': None,
+                'message': {'role': 'assistant', 'content': content, 'refusal': None}
+            }]))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        chunk = dict(base, object='chat.completion.chunk')
+        pieces = [content[i:i + 24] for i in range(0, len(content), 24)]
+        for i, piece in enumerate(pieces):
+            finish = 'stop' if i == len(pieces) - 1 else None
+            self._send_event(dict(chunk, choices=[{'index': 0, 'delta': {'content': piece}, 'finish_reason': finish}]))
+        if (body.get('stream_options') or {}).get('include_usage'):
+            self._send_event(dict(chunk, choices=[], usage=usage))
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.close_connection = True
+
+    def _send_event(self, payload):
+        self.wfile.write(b'data: ' + json.dumps(payload).encode('utf-8') + b'\n\n')
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, profiles):
+        super().__init__(address, StubHandler)
+        self.profiles = profiles
+        self._stats = {service: {'requests': 0, 'errors': 0} for service in SERVICES}
+        self._stats['openai'].update(prompt_tokens=0, cached_tokens=0)
+        self.prompt_cache = PromptCacheSimulator()
+        self._lock = threading.Lock()
+
+    def count(self, service, key, amount=1):
+        with self._lock:
+            self._stats[service][key] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return {service: dict(counts) for service, counts in self._stats.items()}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def start_stub_server(profiles, host='127.0.0.1', port=0):
+    """Start the stubs on a background thread; port 0 picks a free port"""
+    server = StubServer((host, port), profiles)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def service_env(base_url):
+    """Environment variables pointing the backend at the stubs"""
+    return {
+        'OPENAI_API_KEY': 'sk-stub',
+        'OPENAI_BASE_URL': f'{base_url}/v1',
+        'STRIPE_SECRET_KEY': 'sk_test_stub',
+        'STRIPE_API_BASE': base_url,
+        'GOOGLE_SHEET_API_URL': f'{base_url}/sheets',
+    }
+
+
+def add_profile_arguments(parser):
+    for service, default in (('openai', 'lognormal:1.2,0.4'), ('stripe', 'lognormal:0.3,0.3'), ('sheets', 'lognormal:0.5,0.4')):
+        parser.add_argument(f'--{service}-latency', default=default, type=Latency,
+                            help=f'{service} latency distribution (default: {default})')
+        parser.add_argument(f'--{service}-error-rate', default=0.0, type=float,
+                            help=f'fraction of {service} calls that fail')
+        parser.add_argument(f'--{service}-error-status', default=500, type=int,
+                            help=f'HTTP status of injected {service} errors')
+
+
+def profiles_from_args(args):
+    return {
+        service: ServiceProfile(
+            latency=getattr(args, f'{service}_latency'),
+            error_rate=getattr(args, f'{service}_error_rate'),
+            error_status=getattr(args, f'{service}_error_status')
+        )
+        for service in SERVICES
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the OpenAI/Stripe/Sheets stand-ins on their own')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), profiles_from_args(args))
+    for name, value in service_env(server.base_url).items():
+        print(f'{name}={value}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
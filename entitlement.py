@@ -0,0 +1,60 @@
+"""Signed premium entitlement tokens.
+
+A token is ``<payload>.<signature>``: the payload is base64url-encoded JSON
+with the email, tier and expiry, and the signature is an HMAC-SHA256 of the
+payload keyed with ENTITLEMENT_SECRET. The backend issues tokens after a
+successful premium check; anyone holding the secret (the backend and the
+Streamlit app) can verify them offline. A token only stands for the email in
+its claims: the app asks for that email before restoring a token from a URL.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+DEFAULT_TTL = 24 * 60 * 60  # 1 day
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _sign(payload, secret):
+    return _b64encode(hmac.new(secret.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).digest())
+
+
+def issue_token(email, secret, ttl=DEFAULT_TTL, tier='premium'):
+    """Create a token granting `tier` to `email` for `ttl` seconds"""
+    claims = {'email': email.strip().lower(), 'tier': tier, 'exp': int(time.time()) + int(ttl)}
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+    return f'{payload}.{_sign(payload, secret)}'
+
+
+def token_matches_email(claims, email):
+    """Whether verified `claims` were issued for `email`"""
+    issued_for = str(claims.get('email', '')).encode('utf-8')
+    return bool(email) and hmac.compare_digest(issued_for, email.strip().lower().encode('utf-8'))
+
+
+def verify_token(token, secret):
+    """Return the token's claims if the signature is valid and it has not expired, else None"""
+    if not token or not secret or token.count('.') != 1:
+        return None
+
+    payload, signature = token.split('.')
+    if not hmac.compare_digest(signature.encode('utf-8'), _sign(payload, secret).encode('ascii')):
+        return None
+
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+
+    if not isinstance(claims, dict) or claims.get('exp', 0) < time.time():
+        return None
+    return claims
@@ -1,21 +1,17 @@
 # ✅ Corrected frontend.py with all name updates from StyleSync → StyleWithAI
-from openai import OpenAI
 import streamlit as st
 import requests
-from PIL import Image
-from gtts import gTTS
-from deep_translator import GoogleTranslator
 import io
 import time
-from textwrap import wrap
-import re
-import base64
+import hashlib
+import json
+import threading
 from dotenv import load_dotenv
 import os
 from streamlit.components.v1 import html
-import stripe
-import requests
-from io import BytesIO
+from entitlement import token_matches_email, verify_token
+from schemas import field_markdown, parse_result, to_markdown
+from translation import translate_result, translation_key
 
 # Initialize environment first
 load_dotenv()
@@ -23,126 +19,459 @@ load_dotenv()
 st.set_page_config(page_title="StyleWithAI", layout="wide")
 
 
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")  # Do not hardcode key!
-
 STRIPE_PRICE_ID = "price_1RYNCkB1g7uD1vIapFF9HOwr"
-SUCCESS_URL = "https://gosho1992-stylesync-backend-frontend-0zlcqx.streamlit.app/"
-API_URL = "https://stylesync-backend-2kz6.onrender.com/check-premium"
+SUCCESS_URL = os.getenv("FRONTEND_URL", "https://gosho1992-stylesync-backend-frontend-0zlcqx.streamlit.app/")
+BACKEND_URL = os.getenv("BACKEND_URL", "https://stylesync-backend-2kz6.onrender.com").rstrip("/")
+API_URL = f"{BACKEND_URL}/check-premium"
+ANALYZE_URL = f"{BACKEND_URL}/analyze"
+FULL_REPORT_URL = f"{BACKEND_URL}/analyze/full"
+UPLOAD_BATCH_URL = f"{BACKEND_URL}/upload/batch"
+JOBS_URL = f"{BACKEND_URL}/jobs"
+JOB_POLL_WAIT = 25  # seconds the backend holds each poll open
+JOB_DEADLINE = 5 * 60  # give up polling after this long
+ANALYZE_TIMEOUT = 90  # gpt-4o diagnostics can take a while
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))  # roughly the number of concurrent sessions
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+
+# Shared with the backend so entitlement tokens can be verified offline
+ENTITLEMENT_SECRET = os.getenv("ENTITLEMENT_SECRET")
+VERIFIED_EMAIL_TTL = 60 * 60  # paid emails are remembered across sessions for an hour
+
+# Uploader slots are remembered per session; their encoded bytes live in the
+# artifact store below
+IMAGE_CACHE_KEY = "_image_cache"
+ARTIFACT_SESSION_KEY = "_artifact_session"
+MAX_WORKING_SIZE = (2048, 2048)  # gpt-4o downsizes to this anyway
+THUMBNAIL_SIZE = (600, 600)
+BATCH_WORKING_SIZE = (1024, 1024)  # wardrobe pieces: enough for style and colour, 30 fit in one request
+WARDROBE_KEY = "_wardrobe"
+
+# Budgets for session artifacts (uploads, encoded images, translations)
+MB = 1024 * 1024
+SESSION_ARTIFACT_BUDGET = int(os.getenv("SESSION_ARTIFACT_BUDGET_MB", "16")) * MB
+GLOBAL_ARTIFACT_BUDGET = int(os.getenv("GLOBAL_ARTIFACT_BUDGET_MB", "512")) * MB
+ARTIFACT_DISK_BUDGET = int(os.getenv("ARTIFACT_DISK_BUDGET_MB", "2048")) * MB
+ARTIFACT_SPILL_BYTES = int(os.getenv("ARTIFACT_SPILL_KB", "256")) * 1024
+ARTIFACT_SPILL_DIR = os.getenv("ARTIFACT_SPILL_DIR")  # defaults to a temp dir
+ARTIFACT_SESSION_TTL = int(os.getenv("ARTIFACT_SESSION_TTL", str(60 * 60)))
+# Premium results are reused across reruns: per session in the artifact store,
+# and across sessions for the same image in a shared TTL cache
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(60 * 60)))
+SHOW_STORAGE_PANEL = os.getenv("SHOW_STORAGE_PANEL", "").lower() in ("1", "true", "yes")
 
 
 # ----- Helper Functions -----
 
+# PIL, gTTS, deep_translator and stripe are imported where they are first
+# needed, so a cold start only pays for what the visitor actually uses.
+@st.cache_resource
+def get_stripe():
+    import stripe
+    stripe.api_key = os.getenv("STRIPE_SECRET_KEY")  # Do not hardcode key!
+    return stripe
+
+
+@st.cache_resource
+def get_http_session():
+    """Process-wide keep-alive session for backend calls.
+
+    Connection errors are retried for every method (nothing reached the
+    backend); 502/503/504, e.g. while Render wakes the service, only for
+    GET, since repeating a POST would rerun a paid model call.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=1,
+        status=HTTP_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,  # hand the last response to raise_for_status()
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@st.cache_resource
+def get_artifact_store():
+    """Process-wide artifact store shared by all sessions"""
+    from artifact_store import ArtifactStore
+
+    return ArtifactStore(
+        session_budget=SESSION_ARTIFACT_BUDGET,
+        global_budget=GLOBAL_ARTIFACT_BUDGET,
+        disk_budget=ARTIFACT_DISK_BUDGET,
+        spill_threshold=ARTIFACT_SPILL_BYTES,
+        spill_dir=ARTIFACT_SPILL_DIR,
+        session_ttl=ARTIFACT_SESSION_TTL,
+    )
 
-def render_style_card(store_name, product_type, price_range):
-    st.markdown(f"""
-    <div style='
-        background-color: #ffffff;
-        padding: 16px;
-        border: 1px solid #ddd;
-        border-radius: 12px;
-        margin-bottom: 10px;
-        box-shadow: 2px 2px 5px rgba(0,0,0,0.05);
-    '>
-        <h4 style='margin-bottom: 6px;'>{store_name}</h4>
-        <p style='margin: 0'><strong>Product:</strong> {product_type}</p>
-        <p style='margin: 0'><strong>Price:</strong> {price_range}</p>
-    </div>
-    """, unsafe_allow_html=True)
-
-
-def img_to_base64(img):
-    buffered = io.BytesIO()
-    img.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode("utf-8")
 
-def translate_long_text(text, target_lang):
-    chunks = wrap(text, width=4500)
-    translated_chunks = [
-        GoogleTranslator(source='auto', target=target_lang).translate(chunk)
-        for chunk in chunks
-    ]
-    return "\n\n".join(translated_chunks)
-
-def format_text_block(text):
-    sections = re.split(r'\n\d+\.', text)
-    if len(sections) > 1:
-        formatted = ""
-        for i, section in enumerate(sections[1:], 1):
-            section = section.strip()
-            if not section:
+def artifact_session():
+    """Stable id for this browser session's artifacts"""
+    if ARTIFACT_SESSION_KEY not in st.session_state:
+        import uuid
+        st.session_state[ARTIFACT_SESSION_KEY] = uuid.uuid4().hex
+    return st.session_state[ARTIFACT_SESSION_KEY]
+
+
+def encode_upload(data):
+    """Decode an upload once and return (thumbnail JPEG, backend payload JPEG)"""
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGB")
+    img.thumbnail(MAX_WORKING_SIZE)
+    img = img.convert("RGB")
+
+    payload_buf = io.BytesIO()
+    img.save(payload_buf, format="JPEG", quality=90)
+    img.thumbnail(THUMBNAIL_SIZE)
+    thumb_buf = io.BytesIO()
+    img.save(thumb_buf, format="JPEG", quality=85)
+    return thumb_buf.getvalue(), payload_buf.getvalue()
+
+
+def encode_batch_image(data):
+    """A downscaled JPEG of one wardrobe piece; undecodable files are sent as-is for the backend to reject"""
+    from PIL import Image
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.draft("RGB", BATCH_WORKING_SIZE)
+        img = img.convert("RGB")
+    except Exception:
+        return data
+    img.thumbnail(BATCH_WORKING_SIZE)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+def load_upload(uploaded_file, slot):
+    """Return the thumbnail for an uploader slot, and a reader for its backend payload.
+
+    session_state only records which upload a slot holds (by content hash),
+    so reruns skip hashing. The encoded bytes are kept in the artifact store,
+    which may evict them under memory pressure; they are then re-encoded
+    from the upload, which the file_uploader widget still holds. The payload
+    is usually spilled to disk, so it is only read back by
+    upload["read_payload"]() when a request actually sends it.
+    """
+    cache = st.session_state.setdefault(IMAGE_CACHE_KEY, {})
+    store, session = get_artifact_store(), artifact_session()
+    thumb_key, payload_key = f"{slot}/thumbnail", f"{slot}/payload"
+    if uploaded_file is None:
+        if cache.pop(slot, None):
+            store.discard(session, thumb_key)
+            store.discard(session, payload_key)
+        return None
+
+    entry = cache.get(slot)
+    file_id = getattr(uploaded_file, "file_id", None)
+    if not (entry and file_id and entry["file_id"] == file_id):
+        digest = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        if not (entry and entry["digest"] == digest):
+            store.discard(session, thumb_key)
+            store.discard(session, payload_key)
+        entry = cache[slot] = {"digest": digest, "file_id": file_id}
+
+    def encode():
+        thumbnail, payload = encode_upload(uploaded_file.getvalue())
+        store.put(session, thumb_key, thumbnail)
+        store.put(session, payload_key, payload)
+        return thumbnail, payload
+
+    def read_payload():
+        payload = store.get(session, payload_key)
+        return payload if payload is not None else encode()[1]
+
+    thumbnail = store.get(session, thumb_key)
+    if thumbnail is None:
+        thumbnail = encode()[0]
+    return {**entry, "thumbnail": thumbnail, "read_payload": read_payload}
+
+class PremiumNotFound(Exception):
+    """No paid record for an email; raised so st.cache_data never caches the miss"""
+
+class EntitlementUnavailable(Exception):
+    """A paid email, but the backend issued no entitlement token to unlock premium with"""
+
+class PremiumRequired(Exception):
+    """The backend refused a premium call: the entitlement is missing, expired or not accepted"""
+
+def find_user_record(user_data, email):
+    def normalize(value):
+        return value.strip().lower().replace('\u00a0', '').replace(' ', '')
+
+    if isinstance(user_data, list):
+        return next((u for u in user_data if normalize(u.get("email", "")) == normalize(email)), None)
+    return user_data
+
+@st.cache_data(ttl=VERIFIED_EMAIL_TTL, show_spinner=False)
+def fetch_entitlement(email):
+    """Check a paid email on the backend and return its entitlement token.
+
+    Results are shared across sessions; unpaid lookups raise PremiumNotFound
+    so that someone who has just paid is picked up on their next check.
+    Without a token the backend would refuse every premium call, so a paid
+    email without one raises EntitlementUnavailable.
+    """
+    response = get_http_session().get(API_URL, params={"email": email}, timeout=10)
+    response.raise_for_status()
+    user_record = find_user_record(response.json(), email)
+    if not user_record or user_record.get("status", "").strip().lower() != "paid":
+        raise PremiumNotFound(email)
+    token = response.headers.get("X-Entitlement-Token")
+    if not token:
+        raise EntitlementUnavailable(email)
+    return token
+
+def grant_entitlement(token):
+    """Unlock premium for this session and keep the token in the URL for later visits"""
+    st.session_state.premium_unlocked = True
+    st.session_state.entitlement = token
+    st.query_params["entitlement"] = token
+
+def revoke_entitlement():
+    """Lock premium again after the backend refused this session's token"""
+    st.session_state.premium_unlocked = False
+    st.session_state.payment_checked = False
+    st.session_state.pop("entitlement", None)
+    st.query_params.pop("entitlement", None)
+    st.warning("🔒 Your premium access has expired or could not be verified. Please check your premium status again.")
+
+def restore_entitlement(email):
+    """Unlock premium from a previously issued token with a local signature check.
+
+    The token is bound to the email it was issued for, so a shared link or a
+    browser history entry alone does not unlock premium: the visitor has to
+    enter that email too.
+    """
+    token = st.session_state.get("entitlement") or st.query_params.get("entitlement")
+    if not token or not ENTITLEMENT_SECRET:
+        return
+    claims = verify_token(token, ENTITLEMENT_SECRET)
+    if claims is None:
+        st.session_state.pop("entitlement", None)
+        st.query_params.pop("entitlement", None)
+    elif email and token_matches_email(claims, email):
+        grant_entitlement(token)
+
+def entitlement_headers():
+    token = st.session_state.get("entitlement")
+    return {"X-Entitlement": token} if token else {}
+
+def raise_for_status(response):
+    """response.raise_for_status(), raising PremiumRequired for the backend's premium_required 403"""
+    if response.status_code == 403:
+        try:
+            code = response.json().get("code")
+        except ValueError:
+            code = None
+        if code == "premium_required":
+            raise PremiumRequired()
+    response.raise_for_status()
+
+class StreamError(Exception):
+    """An error event in a streamed backend response; the message is the backend's"""
+
+def stream_analysis(mode, upload=None, **params):
+    """Yield (field, value) pairs of an /analyze run as the backend streams them; raises StreamError"""
+    files = None
+    if upload is not None:
+        files = {"file": ("image.jpg", upload["read_payload"](), "image/jpeg")}
+    with get_http_session().post(
+        ANALYZE_URL,
+        files=files,
+        data={"mode": mode, "stream": "1", **params},
+        headers=entitlement_headers(),
+        timeout=ANALYZE_TIMEOUT,
+        stream=True
+    ) as response:
+        raise_for_status(response)
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
                 continue
-            emoji = get_section_emoji(section)
-            formatted += f"\n{emoji} **{i}. {section.split('.')[0].strip()}**\n"
-            points = [p.strip() for p in section.split('.')[1:] if p.strip()]
-            for point in points[:3]:
-                formatted += f"   ◦ {point}\n"
-            formatted += "\n"
-        return formatted
-
-    paragraphs = text.split("\n")
-    formatted = ""
-    current_section = ""
-
-    for p in paragraphs:
-        p = p.strip()
-        if not p:
-            continue
-        if p.endswith(":") or any(word in p.lower() for word in [
-            "outfit", "attire", "accessories", "daywear", "nightwear", "tips", 
-            "shoes", "summary", "jewelry", "temple", "trends", "men", "women"]):
-            if current_section:
-                formatted += f"\n{format_paragraphs(current_section)}\n"
-                current_section = ""
-            emoji = get_section_emoji(p)
-            formatted += f"\n{emoji} **{p}**\n\n"
-        else:
-            current_section += p + "\n"
-
-    if current_section:
-        formatted += f"\n{format_paragraphs(current_section)}\n"
-
-    return formatted
-
-def format_paragraphs(text, max_lines=3):
-    sentences = re.split(r'(?<=[.!?]) +', text)
-    formatted = ""
-    current_line = ""
-    for sentence in sentences:
-        if len(current_line.split('\n')) >= max_lines:
-            formatted += current_line + "\n\n"
-            current_line = ""
-        current_line += sentence + " "
-    if current_line:
-        formatted += current_line
-    return formatted.strip()
-
-def get_section_emoji(text):
-    text = text.lower()
-    if any(word in text for word in ['shirt', 'top', 'blouse']):
-        return "👕"
-    elif any(word in text for word in ['pant', 'trouser', 'jeans']):
-        return "👖"
-    elif any(word in text for word in ['dress', 'skirt', 'gown']):
-        return "👗"
-    elif any(word in text for word in ['shoe', 'boot', 'sandal']):
-        return "👠"
-    elif any(word in text for word in ['accessor', 'jewelry', 'bag']):
-        return "💼"
-    elif any(word in text for word in ['men', 'male', 'gentleman']):
-        return "👨"
-    elif any(word in text for word in ['women', 'female', 'lady']):
-        return "👩"
-    elif any(word in text for word in ['summer', 'hot', 'warm']):
-        return "☀️"
-    elif any(word in text for word in ['winter', 'cold', 'chilly']):
-        return "❄️"
-    elif any(word in text for word in ['casual', 'everyday']):
-        return "😊"
-    elif any(word in text for word in ['formal', 'office', 'business']):
-        return "💼"
-    elif any(word in text for word in ['party', 'night', 'club']):
-        return "🎉"
-    return "✨"
+            event = json.loads(line)
+            if "error" in event:
+                raise StreamError(event["error"])
+            yield event["field"], event["value"]
+
+def show_streamed(placeholder, schema_name, events, render):
+    """Preview fields as they stream in, then swap in the final rendering of the typed result"""
+    data = {}
+
+    def preview():
+        for name, value in events:
+            data[name] = value
+            yield field_markdown(name, value) + "\n\n"
+
+    with placeholder.container():
+        st.write_stream(preview())
+    result = parse_result(schema_name, data)
+    with placeholder.container():
+        render(result)
+    return result
+
+@st.cache_resource
+def get_result_cache():
+    """Shared premium results: (TTLCache, lock)"""
+    from cachetools import TTLCache
+
+    return TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL), threading.Lock()
+
+def result_key(upload, mode, region, lang):
+    return f"result/{upload['digest']}/{mode}/{region}/{lang}"
+
+def lookup_result(key):
+    """A premium result computed earlier in this session or, for the same image, in another one"""
+    result = get_artifact_store().get(artifact_session(), key)
+    if result is None:
+        cache, lock = get_result_cache()
+        with lock:
+            result = cache.get(key)
+    return result
+
+def remember_result(key, result):
+    get_artifact_store().put(artifact_session(), key, result)
+    cache, lock = get_result_cache()
+    with lock:
+        cache[key] = result
+
+def localized(result, lang):
+    return translate_result(result, lang) if lang != "en" else result
+
+def translated_result(schema_name, raw, lang):
+    """Typed result for raw model output in `lang`; each translation is made once per session"""
+    result = parse_result(schema_name, raw)
+    if lang == "en":
+        return result
+    store, session, key = get_artifact_store(), artifact_session(), translation_key(raw, lang)
+    translated = store.get(session, key)
+    if translated is None:
+        translated = translate_result(result, lang)
+        store.put(session, key, translated)
+    return translated
+
+def show_analysis(mode, upload, render, label, button_type="secondary", **params):
+    """Premium analysis with a run button; an earlier result for the same inputs re-renders without a model call.
+
+    Once a result exists the button becomes "Regenerate", which asks the
+    backend to bypass its cache too.
+    """
+    lang = lang_codes[language_option]
+    key = result_key(upload, mode, params.get("user_region", ""), lang)
+    result = lookup_result(key)
+    if result is None:
+        run = st.button(label, type=button_type, key=f"{mode}_run")
+    else:
+        run = st.button("🔄 Regenerate", key=f"{mode}_regenerate")
+    placeholder = st.empty()
+    if run:
+        if result is not None:
+            params["fresh"] = "1"
+        result = show_streamed(placeholder, mode, stream_analysis(mode, upload, **params), render)
+        if lang != "en":
+            result = localized(result, lang)
+            with placeholder.container():
+                render(result)
+        remember_result(key, result)
+    elif result is not None:
+        with placeholder.container():
+            render(result)
+
+class JobFailed(Exception):
+    """A background job finished with an error record from the backend"""
+
+class JobLost(Exception):
+    """The backend no longer knows a job: it expired, or the backend's job store was reset"""
+
+def run_job(kind, image_bytes=None, **params):
+    """Start a backend job and long-poll it until it finishes; returns the job's result.
+
+    Each poll is a short request of its own, so a slow analysis is never cut
+    off by a single connection's timeout. A poll answered 404 raises JobLost.
+    """
+    files = {"file": ("image.jpg", image_bytes, "image/jpeg")} if image_bytes is not None else None
+    response = get_http_session().post(
+        JOBS_URL,
+        files=files,
+        data=dict(params, kind=kind),
+        headers=entitlement_headers(),
+        timeout=20
+    )
+    raise_for_status(response)
+    poll_url = f"{BACKEND_URL}{response.json()['poll_url']}"
+
+    deadline = time.monotonic() + JOB_DEADLINE
+    while time.monotonic() < deadline:
+        response = get_http_session().get(poll_url, params={"wait": JOB_POLL_WAIT}, timeout=JOB_POLL_WAIT + 10)
+        if response.status_code == 404:
+            raise JobLost(kind)
+        response.raise_for_status()
+        job = response.json()
+        if job["status"] == "succeeded":
+            return job["result"]
+        if job["status"] == "failed":
+            raise JobFailed(job["error"].get("code") or job["error"].get("error", "failed"))
+    raise TimeoutError(f"Job {kind} did not finish in {JOB_DEADLINE}s")
+
+def error_message(response):
+    """The backend's JSON error message for a failed response, else its status code"""
+    try:
+        return response.json()["error"]
+    except (ValueError, KeyError, TypeError):
+        return f"Error {response.status_code}"
+
+def stream_wardrobe(files):
+    """Yield per-image results from /upload/batch as each image finishes.
+
+    Pieces are downscaled first, so a full batch of phone photos stays far
+    below the backend's body limit.
+    """
+    with get_http_session().post(
+        UPLOAD_BATCH_URL,
+        files=[("files", (f.name, encode_batch_image(f.getvalue()), "image/jpeg")) for f in files],
+        headers=entitlement_headers(),
+        timeout=ANALYZE_TIMEOUT,
+        stream=True
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                item = json.loads(line)
+                if item.get("status") == "done":
+                    break
+                yield item
+
+def stream_full_report(upload, **params):
+    """Yield roast/glow-up/diagnostic sections from /analyze/full as each one finishes"""
+    with get_http_session().post(
+        FULL_REPORT_URL,
+        files={"file": ("image.jpg", upload["read_payload"](), "image/jpeg")},
+        data=params,
+        headers=entitlement_headers(),
+        timeout=ANALYZE_TIMEOUT,
+        stream=True
+    ) as response:
+        raise_for_status(response)
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                section = json.loads(line)
+                if section.get("status") == "done":
+                    break
+                yield section
 
 def render_style_card(store, products, price_range):
     st.markdown(f"""
@@ -160,16 +489,61 @@ def render_style_card(store, products, price_range):
     </div>
     """, unsafe_allow_html=True)
 
-# ----- Initialize APIs -----
-# Get API key from secrets or environment
-openai_api_key = os.getenv("OPENAI_API_KEY") or st.secrets.get("OPENAI_API_KEY")
+def render_card(style, body, header="", footer=""):
+    # Blank lines around the body let Streamlit render it as markdown inside the HTML card
+    st.markdown(f"<div style='{style}'>{header}\n\n{body}\n\n{footer}</div>", unsafe_allow_html=True)
+
+def render_roast(roast):
+    render_card(
+        'background-color: #FFF0F5; padding: 1.5rem; border-radius: 12px; '
+        'border-left: 5px solid #FF69B4; font-family: "Arial", sans-serif;',
+        to_markdown(roast),
+        header="<h4 style='color: #FF1493; margin-top:0;'>💅 Fashion Police Verdict</h4>",
+        footer="<p style='font-size: 0.8em; margin-bottom:0;'><i>Disclaimer: We roast because we care 💋</i></p>"
+    )
 
-if not openai_api_key:
-    st.error("OpenAI API key not found! Check your environment variables or secrets.")
-    st.stop()
+def render_glowup(glowup):
+    render_card(
+        "background-color: #f8f9fa; padding: 20px; border-radius: 10px; "
+        "border-left: 5px solid #bb377d; box-shadow: 0 4px 6px rgba(0,0,0,0.1);",
+        to_markdown(glowup),
+        header="<h3 style='color: #bb377d; margin-top: 0;'>✨ Your Personal Stylist Report</h3>",
+        footer="<p style='font-style: italic; margin-bottom: 0;'>Remember: Confidence is the best accessory!</p>"
+    )
 
-client = OpenAI(api_key=openai_api_key)
+def render_diagnostic(diagnostic):
+    sections = [
+        ("**A. FACE & HAIR SYNERGY**", ["face_shape", "skin_tone", "hair_texture"]),
+        ("**B. OUTFIT ANALYSIS**", ["occasion", "seasonality", "trend_alignment"]),
+    ]
+    body = "\n\n".join(
+        title + "\n\n" + "\n\n".join(field_markdown(name, getattr(diagnostic, name)) for name in names)
+        for title, names in sections
+    )
+    render_card(
+        "background-color: #fafafa; padding: 25px; border-radius: 15px; border-left: 6px solid #6a5acd;",
+        body
+    )
+    if diagnostic.stores:
+        st.markdown("**C. SHOPPING SUGGESTIONS**")
+        for store in diagnostic.stores:
+            render_style_card(store.store_name, store.product_type, store.price_range)
+
+def render_picks(picks, labels, borders):
+    """Women's and men's picks (travel guide / trend report) as trend-item cards"""
+    for label, items, border in zip(labels, (picks.women, picks.men), borders):
+        st.subheader(label)
+        for item in items or []:
+            st.markdown(
+                f"<div class='trend-item' style='border-left: 3px solid {border};'>{item.emoji} {item.text}</div>",
+                unsafe_allow_html=True
+            )
 
+SECTION_RENDERERS = {
+    "roast": render_roast,
+    "glowup": render_glowup,
+    "diagnostic": render_diagnostic,
+}
 
 # ---------- Welcome Splash ----------
 if "show_welcome" not in st.session_state:
@@ -283,12 +657,8 @@ with tab1:
     st.header("👗 Personal Style Architect")
 
     # Persist selections
-    if "uploaded_file" not in st.session_state:
-        st.session_state.uploaded_file = None
     if "suggestion" not in st.session_state:
         st.session_state.suggestion = ""
-    if "translated_suggestion" not in st.session_state:
-        st.session_state.translated_suggestion = ""
 
     # Style Preferences
     with st.expander("✨ Style Blueprint", expanded=True):
@@ -309,15 +679,13 @@ with tab1:
         type=["jpg", "jpeg", "png"],
         help="For best results, use well-lit front-facing images"
     )
-    if uploaded_file:
-        st.session_state.uploaded_file = uploaded_file
-
-    if st.session_state.uploaded_file:
-        st.image(Image.open(st.session_state.uploaded_file), caption="🎨 Your Style Foundation", width=300)
+    outfit_upload = load_upload(uploaded_file, "outfit")
+    if outfit_upload:
+        st.image(outfit_upload["thumbnail"], caption="🎨 Your Style Foundation", width=300)
 
     # Generate button
     if st.button("✨ Generate Masterpiece", type="primary", use_container_width=True):
-        if not st.session_state.uploaded_file:
+        if not outfit_upload:
             st.warning("⚠️ Please upload an image before generating your masterpiece.")
         else:
             data = {
@@ -339,27 +707,24 @@ with tab1:
 
             with st.spinner("🎨 Crafting your couture vision..."):
                 try:
-                    response = requests.post(
-                        "https://stylesync-backend-2kz6.onrender.com/upload",
-                        files={'file': ('image.jpg', st.session_state.uploaded_file.getvalue(), 'image/jpeg')},
-                        data=data,
-                        timeout=20
-                    )
-
-                    if response.status_code == 200:
-                        st.session_state.suggestion = response.json().get("fashion_suggestion", "")
-                        st.session_state.translated_suggestion = ""
-                        st.session_state.image_prompt = response.json().get("image_prompt", "")  # Store image prompt
-
-                        if not st.session_state.suggestion:
-                            st.error("🎭 Our stylists need more inspiration! Try again.")
-                        else:
-                            st.balloons()
-                            st.success("🌟 Style Masterpiece Completed!")
+                    result = run_job("upload", outfit_upload["read_payload"](), **data)
+                    st.session_state.suggestion = result.get("fashion_suggestion", "")
+                    st.session_state.image_prompt = ""
 
+                    if not st.session_state.suggestion:
+                        st.error("🎭 Our stylists need more inspiration! Try again.")
                     else:
-                        st.error(f"⚠️ Creative Block (Error {response.status_code})")
-
+                        st.balloons()
+                        st.success("🌟 Style Masterpiece Completed!")
+
+                except JobFailed as e:
+                    st.error(f"⚠️ Creative Block ({e})")
+                except JobLost:
+                    st.error("⚠️ We lost track of your masterpiece. Please generate it again.")
+                except TimeoutError:
+                    st.error("⏳ Our stylists are still working on it. Please try again in a moment.")
+                except requests.exceptions.HTTPError as e:
+                    st.error(f"⚠️ Creative Block (Error {e.response.status_code})")
                 except requests.exceptions.RequestException:
                     st.error("🌐 Connection Error: The fashion universe is unreachable")
                 except Exception as e:
@@ -367,15 +732,9 @@ with tab1:
 
     # Output
     if st.session_state.suggestion:
-        if lang_codes[language_option] != "en":
-            if not st.session_state.translated_suggestion:
-                st.session_state.translated_suggestion = translate_long_text(
-                    st.session_state.suggestion,
-                    lang_codes[language_option]
-                )
-            display_text = st.session_state.translated_suggestion
-        else:
-            display_text = st.session_state.suggestion
+        # One translation per language and suggestion, so switching back and forth is free
+        suggestion = translated_result("suggestion", st.session_state.suggestion, lang_codes[language_option])
+        display_text = to_markdown(suggestion)
 
         st.markdown("### ✨ Your Style Masterpiece")
         st.markdown("---")
@@ -390,12 +749,57 @@ with tab1:
 
         if st.button("🎧 Hear Your Style Story"):
             with st.spinner("Composing your fashion sonnet..."):
-                tts = gTTS(text=st.session_state.suggestion, lang=lang_codes[language_option])
+                from gtts import gTTS
+
+                tts = gTTS(text=display_text.replace("**", ""), lang=lang_codes[language_option])
                 audio_bytes = io.BytesIO()
                 tts.write_to_fp(audio_bytes)
                 audio_bytes.seek(0)
                 st.audio(audio_bytes, format="audio/mp3")
 
+    # Whole wardrobe in one request; each piece is shown as soon as it is styled
+    with st.expander("👚 Style My Whole Wardrobe", expanded=False):
+        wardrobe_files = st.file_uploader(
+            "📸 Upload up to 30 pieces",
+            type=["jpg", "jpeg", "png"],
+            accept_multiple_files=True,
+            key="wardrobe_upload"
+        )
+        # Results are kept for the uploaded set, so they survive reruns until the files change
+        wardrobe_ids = [getattr(f, "file_id", f.name) for f in wardrobe_files or []]
+        saved = st.session_state.get(WARDROBE_KEY)
+        if saved and saved["ids"] != wardrobe_ids:
+            saved = st.session_state[WARDROBE_KEY] = None
+
+        def show_piece(item):
+            st.markdown(f"#### 👕 {item['filename']}")
+            if item["status"] == "success":
+                piece = translated_result("suggestion", item["fashion_suggestion"], lang_codes[language_option])
+                st.markdown(to_markdown(piece))
+            else:
+                st.error(f"⚠️ {item.get('error', 'Styling failed')}")
+
+        if st.button("✨ Style Them All", key="wardrobe_go", use_container_width=True):
+            if not wardrobe_files:
+                st.warning("⚠️ Please upload at least one image.")
+            else:
+                progress = st.progress(0.0, text="🎨 Styling your wardrobe...")
+                slots = [st.empty() for _ in wardrobe_files]
+                saved = st.session_state[WARDROBE_KEY] = {"ids": wardrobe_ids, "items": {}}
+                try:
+                    for done, item in enumerate(stream_wardrobe(wardrobe_files), start=1):
+                        progress.progress(done / len(wardrobe_files), text=f"🎨 {done}/{len(wardrobe_files)} styled")
+                        saved["items"][item["index"]] = item
+                        with slots[item["index"]].container():
+                            show_piece(item)
+                except requests.exceptions.HTTPError as e:
+                    st.error(f"⚠️ {error_message(e.response)}")
+                except requests.exceptions.RequestException:
+                    st.error("🌐 Connection Error: The fashion universe is unreachable")
+        elif saved:
+            for index in sorted(saved["items"]):
+                show_piece(saved["items"][index])
+
 # ---------- Tab 2: Travel Assistant ----------
 with tab2:
     st.header("✈️ Travel Fashion Assistant")
@@ -413,70 +817,32 @@ with tab2:
         submitted = st.form_submit_button("🌟 Generate Trendy Travel Guide")
 
     if submitted and destination:
-        travel_prompt = (
-            f"""You are a fashion-forward travel stylist. I'm a {travel_age} traveler going to {destination} for {trip_type} during {travel_season}.
-            
-            Give me **5 ultra-concise fashion recommendations per gender** with:
-            - 🔥 Trendy yet practical items
-            - 🌦️ Weather-appropriate fabrics
-            - 🏛️ Cultural considerations
-            - ✨ 1 emoji per line
-            - 🚫 Max 8 words per bullet
-            
-            Format EXACTLY like this:
-            Women:
-            👗 Silk midi dress (elegant + breathable)
-            🧥 Light trench coat (spring-ready)
-            
-            Men:
-            👔 Linen shirt (wrinkle-resistant)
-            🧳 Compact duffel (airline-approved)
-            """
-        )
-
-        with st.spinner(f"✈️ Researching fashion norms for {destination}..."):
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a concise travel fashion advisor. Use bullet points, emojis, and keep suggestions very brief."},
-                    {"role": "user", "content": travel_prompt}
-                ],
-                max_tokens=600
+        st.success(f"🧳 {destination} Travel Style Guide")
+        st.caption(f"Perfect for {trip_type} trips during {travel_season} | Age: {travel_age}")
+
+        try:
+            # Written in the chosen language by the backend, so the draft streams in it too
+            show_streamed(
+                st.empty(),
+                "gendered_picks",
+                stream_analysis(
+                    "travel",
+                    age=travel_age,
+                    destination=destination,
+                    trip_type=trip_type,
+                    season=travel_season,
+                    language=lang_codes[language_option]
+                ),
+                lambda guide: render_picks(
+                    guide,
+                    ("👩 Women's Picks", "👨 Men's Picks"),
+                    ("#fbc2eb", "#a1c4fd")
+                )
             )
-            result = response.choices[0].message.content.strip()
-            translated = translate_long_text(result, lang_codes[language_option])
-            
-            st.success(f"🧳 {destination} Travel Style Guide")
-            st.caption(f"Perfect for {trip_type} trips during {travel_season} | Age: {travel_age}")
-
-            if "Women:" in translated and "Men:" in translated:
-                women_trends, men_trends = translated.split("Men:")
-                
-                # Women's Section
-                st.subheader("👩 Women's Picks")
-                for line in women_trends.replace("Women:", "").strip().split('\n'):
-                    if line.strip():
-                        st.markdown(f"""
-                        <div class='trend-item' style='border-left: 3px solid #fbc2eb;'>
-                        {line.strip()}
-                        </div>
-                        """, unsafe_allow_html=True)
-                
-                # Men's Section
-                st.subheader("👨 Men's Picks")
-                for line in men_trends.strip().split('\n'):
-                    if line.strip():
-                        st.markdown(f"""
-                        <div class='trend-item' style='border-left: 3px solid #a1c4fd;'>
-                        {line.strip()}
-                        </div>
-                        """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
-                <div class='trend-item'>
-                {translated}
-                </div>
-                """, unsafe_allow_html=True)
+        except StreamError as e:
+            st.error(f"⚠️ Couldn't finish your travel guide ({e})")
+        except requests.exceptions.RequestException:
+            st.error("🌐 Connection Error: The fashion universe is unreachable")
 
 # ---------- Tab 3: Fashion Trends ----------
 with tab3:
@@ -486,44 +852,24 @@ with tab3:
     region = st.selectbox("🌍 Select Region", ["Global", "Pakistan", "India", "USA", "Europe", "Middle East"], key="region3")
     
     if st.button("👀 Show Current Trends", key="trends_btn"):
-        trend_prompt = (
-            f"You are a fashion trends expert. Provide concise, emoji-rich trend reports.\n"
-            f"Include sections like Women: and Men:\n"
-            f"Add relevant emojis and separate by gender.\n"
-            f"Keep each trend to one line maximum."
-        )
-
-        with st.spinner(f"🔍 Analyzing {region} fashion trends..."):
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a fashion trends expert. Provide concise, emoji-rich trend reports."},
-                    {"role": "user", "content": trend_prompt}
-                ],
-                max_tokens=600
+        st.success(f"🔥 Current Trends in {region}")
+
+        try:
+            # Written in the chosen language by the backend, so the draft streams in it too
+            show_streamed(
+                st.empty(),
+                "gendered_picks",
+                stream_analysis("trends", region=region, language=lang_codes[language_option]),
+                lambda trends: render_picks(
+                    trends,
+                    ("👩 Women's Trends", "👨 Men's Trends"),
+                    ("#fbc2eb", "#fbc2eb")
+                )
             )
-            result = response.choices[0].message.content.strip()
-            translated = translate_long_text(result, lang_codes[language_option])
-
-            st.success(f"🔥 Current Trends in {region}")
-            
-            if "Women:" in translated and "Men:" in translated:
-                try:
-                    women_trends, men_trends = translated.split("Men:")
-                    st.subheader("👩 Women's Trends")
-                    for line in women_trends.replace("Women:", "").strip().split('\n'):
-                        if line.strip():
-                            st.markdown(f"<div class='trend-item'>✨ {line.strip()}</div>", unsafe_allow_html=True)
-                    
-                    st.subheader("👨 Men's Trends")
-                    for line in men_trends.strip().split('\n'):
-                        if line.strip():
-                            st.markdown(f"<div class='trend-item'>✨ {line.strip()}</div>", unsafe_allow_html=True)
-                except Exception as e:
-                    st.warning("⚠️ Could not split content into men/women sections.")
-                    st.markdown(f"<div class='trend-item'>{translated}</div>", unsafe_allow_html=True)
-            else:
-                st.markdown(f"<div class='trend-item'>{translated}</div>", unsafe_allow_html=True)
+        except StreamError as e:
+            st.error(f"⚠️ Couldn't finish the trend report ({e})")
+        except requests.exceptions.RequestException:
+            st.error("🌐 Connection Error: The fashion universe is unreachable")
 
 with tab4:
     st.header("✨ AI Mirror of Truth – Premium Experience")
@@ -537,7 +883,7 @@ with tab4:
         st.session_state.payment_checked = False
     
     # ========== PAYMENT CONFIG CHECK ==========
-    if not stripe.api_key:
+    if not os.getenv("STRIPE_SECRET_KEY"):
         st.error("""
         ⚠️ Payment system not configured properly. 
         Please contact support or try again later.
@@ -557,51 +903,21 @@ with tab4:
                 st.session_state.payment_checked = False
     
     # ========== PAYMENT STATUS CHECK ==========
+    if not st.session_state.premium_unlocked:
+        restore_entitlement(email)
+
     if email and not st.session_state.premium_unlocked and not st.session_state.payment_checked:
         with st.spinner("🔍 Verifying your premium access..."):
             try:
-                response = requests.get(
-                    API_URL,
-                    params={"email": email.strip().lower()},
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    user_data = response.json()
-
-                    st.write("DEBUG: user_data from API →", user_data)
-                    st.write("DEBUG: email entered →", email.strip().lower())
-
-                    if isinstance(user_data, list):
-                        user_record = next(
-                            (
-                                u for u in user_data
-                                if u.get("email", "")
-                                    .strip()
-                                    .lower()
-                                    .replace('\u00a0', '')
-                                    .replace(' ', '')
-                                ==
-                                email.strip().lower()
-                                    .replace('\u00a0', '')
-                                    .replace(' ', '')
-                            ),
-                            None
-                        )
-                    else:
-                        user_record = user_data
-                    
-                    if user_record and user_record.get("status", "").strip().lower() == "paid":
-                        st.session_state.premium_unlocked = True
-                        st.success("🎉 Premium access granted! Loading your features...")
-                        st.balloons()
-                        time.sleep(1)
-                        st.rerun()
-                    else:
-                        st.info("🔒 Premium features not yet unlocked for this email")
-                else:
-                    st.warning("⚠️ Couldn't verify payment status. Please try again later.")
-                
+                grant_entitlement(fetch_entitlement(email.strip().lower()))
+                st.success("🎉 Premium access granted! Loading your features...")
+                st.balloons()
+            except PremiumNotFound:
+                st.info("🔒 Premium features not yet unlocked for this email")
+            except EntitlementUnavailable:
+                st.warning("⚠️ Your payment is confirmed, but premium can't be activated right now. Please try again later or contact support.")
+            except requests.exceptions.HTTPError:
+                st.warning("⚠️ Couldn't verify payment status. Please try again later.")
             except requests.exceptions.RequestException:
                 st.error("🚫 Connection error. Please check your internet and try again")
             except Exception as e:
@@ -616,10 +932,11 @@ with tab4:
         Enjoy your enhanced fashion experience.
         """)
 
-        tab_roast, tab_glowup, tab_diagnostic = st.tabs([
+        tab_roast, tab_glowup, tab_diagnostic, tab_full = st.tabs([
             "🔥 Brutal Roast", 
             "💎 Glow-Up Plan", 
-            "🔍 Full Diagnostic"
+            "🔍 Full Diagnostic",
+            "📑 Full Report"
         ])
 
         # ---- Brutal Roast Tab ----
@@ -634,66 +951,17 @@ with tab4:
                     label_visibility="collapsed"
                 )
 
-                if roast_img:
-                    img = Image.open(roast_img)
-                    st.image(img, caption="Oh honey...", use_container_width=True)
-
-                    if st.button("🔥 Roast Me Like I'm Zendaya's Backup Dancer"):
-                        with st.spinner("Glam squad is assembling the sass..."):
-                            try:
-                                img_b64 = img_to_base64(img)
-
-                                ROAST_PROMPT = """You're a fashionista with *opinions*. Give a flirty, shady-but-loving roast:
-
-1. **First Impression** (1 sassy sentence)  
-*"Oh you woke up and chose... this?"*  
-
-2. **3 Hot Takes** (emoji + roast)  
-🧥 *"That jacket's giving 'I raided my dad's closet'"*  
-👖 *"Those jeans? More like *why*nses"*  
-
-3. **Celebrity Shade** (playful comparison)  
-*"Kinda serving 'early 2000s Britney denim-on-denim realness... but make it Walmart"*  
-
-4. **Glow-Up Tip** (keep it spicy)  
-*"Add heels and a blazer, or just burn it and start over"*  
-
-5. **Final Rating** (scale of 1-10 with sass)  
-*"3/10 – The sidewalk outside Fashion Week would *side-eye* this"*  
-
-Rules: No body shaming, just outfit shaming!"""
-
-                                response = client.chat.completions.create(
-                                    model="gpt-4o",
-                                    messages=[
-                                        {"role": "system", "content": ROAST_PROMPT},
-                                        {
-                                            "role": "user",
-                                            "content": [
-                                                {"type": "text", "text": "Roast this look like we're on a girls' night out"},
-                                                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_b64}"}}
-                                            ]
-                                        }
-                                    ],
-                                    max_tokens=800
-                                )
-
-                                st.markdown(f"""
-                                <div style='
-                                    background-color: #FFF0F5;
-                                    padding: 1.5rem;
-                                    border-radius: 12px;
-                                    border-left: 5px solid #FF69B4;
-                                    font-family: "Arial", sans-serif;
-                                '>
-                                    <h4 style='color: #FF1493; margin-top:0;'>💅 Fashion Police Verdict</h4>
-                                    {response.choices[0].message.content}
-                                    <p style='font-size: 0.8em; margin-bottom:0;'><i>Disclaimer: We roast because we care 💋</i></p>
-                                </div>
-                                """, unsafe_allow_html=True)
-
-                            except Exception as e:
-                                st.error("🚨 Error: Couldn't handle the truth (or the server)")
+                roast_upload = load_upload(roast_img, "roast")
+                if roast_upload:
+                    st.image(roast_upload["thumbnail"], caption="Oh honey...", use_container_width=True)
+
+                    try:
+                        show_analysis("roast", roast_upload, render_roast, "🔥 Roast Me Like I'm Zendaya's Backup Dancer")
+
+                    except PremiumRequired:
+                        revoke_entitlement()
+                    except Exception as e:
+                        st.error("🚨 Error: Couldn't handle the truth (or the server)")
 
         # ---- Glow-Up Plan Tab ----
         with tab_glowup:
@@ -706,56 +974,17 @@ Rules: No body shaming, just outfit shaming!"""
                     label_visibility="collapsed"
                 )
 
-                if glowup_img:
-                    img = Image.open(glowup_img)
-                    st.image(img, caption="Your current look", use_container_width=True)
-
-                    if st.button("✨ Get Honest Stylist Feedback", type="primary"):
-                        with st.spinner("Consulting with our fashion experts..."):
-                            try:
-                                img_b64 = img_to_base64(img)
-
-                                response = client.chat.completions.create(
-                                    model="gpt-4o",
-                                    messages=[
-                                        {
-                                            "role": "system",
-                                            "content": """You're a celebrity stylist giving honest but kind feedback. Provide:
-1. First impression (1 sentence)
-2. Outfit rating (1-10) with brief explanation
-3. Top 3 strengths of this look
-4. Top 3 areas for improvement
-5. Simple styling tweaks that would elevate it
-6. Recommended accessories
-Use bullet points with emojis and keep it conversational."""
-                                        },
-                                        {
-                                            "role": "user",
-                                            "content": [
-                                                {"type": "text", "text": "Give me honest feedback on this outfit"},
-                                                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_b64}"}}
-                                            ]
-                                        }
-                                    ],
-                                    max_tokens=1000
-                                )
-
-                                st.markdown(f"""
-                                    <div style='
-                                        background-color: #f8f9fa;
-                                        padding: 20px;
-                                        border-radius: 10px;
-                                        border-left: 5px solid #bb377d;
-                                        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-                                    '>
-                                        <h3 style='color: #bb377d; margin-top: 0;'>✨ Your Personal Stylist Report</h3>
-                                        {response.choices[0].message.content}
-                                        <p style='font-style: italic; margin-bottom: 0;'>Remember: Confidence is the best accessory!</p>
-                                    </div>
-                                """, unsafe_allow_html=True)
-
-                            except Exception as e:
-                                st.error(f"❌ Couldn't get styling advice: {str(e)}")
+                glowup_upload = load_upload(glowup_img, "glowup")
+                if glowup_upload:
+                    st.image(glowup_upload["thumbnail"], caption="Your current look", use_container_width=True)
+
+                    try:
+                        show_analysis("glowup", glowup_upload, render_glowup, "✨ Get Honest Stylist Feedback", "primary")
+
+                    except PremiumRequired:
+                        revoke_entitlement()
+                    except Exception as e:
+                        st.error(f"❌ Couldn't get styling advice: {str(e)}")
 
         # ---- Full Diagnostic Tab ----
         with tab_diagnostic:
@@ -774,67 +1003,86 @@ Use bullet points with emojis and keep it conversational."""
                     index=0
                 )
 
-                if diagnostic_img:
-                    img = Image.open(diagnostic_img)
-                    st.image(img, caption="Outfit to analyze", use_container_width=True)
-
-                    if st.button("🧠 Run Full Diagnostic"):
-                        with st.spinner("Analyzing 15+ style factors..."):
-                            try:
-                                img_b64 = img_to_base64(img)
-                                user_region = country if country else "globally available"
-
-                                SYSTEM_PROMPT = f"""
-You're a celebrity stylist giving a HEAD-TO-TOE analysis. Cover:
-
-**A. FACE & HAIR SYNERGY**
-1. Face Shape: Suggest flattering necklines/hairstyles
-2. Skin Tone: Recommend clothing colors for undertone
-3. Hair Texture: Offer styling advice
-
-**B. OUTFIT ANALYSIS**
-1. Occasion: Day/Night appropriateness
-2. Seasonality: Fabric and color match to weather
-3. Trend Alignment: Does this outfit match current fashion trends? Briefly explain.
-
-**C. SHOPPING SUGGESTIONS (For {user_region})**
-List 3–5 realistic stores that users in {user_region} can visit or browse to find the recommended styles.
-
-Return this section like a clean list:
-- Store Name: Product Type (Price Range)
-
-Avoid links and fake stores. Be practical, relevant, and region-aware.
-"""
-
-                                response = client.chat.completions.create(
-                                    model="gpt-4o",
-                                    messages=[
-                                        {"role": "system", "content": SYSTEM_PROMPT},
-                                        {
-                                            "role": "user",
-                                            "content": [
-                                                {"type": "text", "text": "Analyze this look head-to-toe."},
-                                                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_b64}"}}
-                                            ]
-                                        }
-                                    ],
-                                    max_tokens=1400
-                                )
-
-                                st.markdown(f"""
-                                <div style='
-                                    background-color: #fafafa;
-                                    padding: 25px;
-                                    border-radius: 15px;
-                                    border-left: 6px solid #6a5acd;
-                                '>
-                                    {response.choices[0].message.content}
-                                </div>
-                                """, unsafe_allow_html=True)
-
-                            except Exception as e:
-                                st.error(f"❌ Analysis failed: {str(e)}")
-                                st.info("Tip: Use a clear photo with your face and full outfit visible.")
+                diagnostic_upload = load_upload(diagnostic_img, "diagnostic")
+                if diagnostic_upload:
+                    st.image(diagnostic_upload["thumbnail"], caption="Outfit to analyze", use_container_width=True)
+
+                    try:
+                        show_analysis(
+                            "diagnostic",
+                            diagnostic_upload,
+                            render_diagnostic,
+                            "🧠 Run Full Diagnostic",
+                            user_region=country
+                        )
+
+                    except PremiumRequired:
+                        revoke_entitlement()
+                    except Exception as e:
+                        st.error(f"❌ Analysis failed: {str(e)}")
+                        st.info("Tip: Use a clear photo with your face and full outfit visible.")
+
+        # ---- Full Report Tab ----
+        with tab_full:
+            st.subheader("📑 The Full Report")
+            st.caption("Roast, glow-up plan and diagnostic from a single upload")
+            with st.expander("📸 Upload Your Outfit + Face", expanded=True):
+                full_img = st.file_uploader(
+                    "Upload full-body photo with visible face",
+                    type=["jpg", "jpeg", "png"],
+                    key="full_upload",
+                    label_visibility="collapsed"
+                )
+
+                full_country = st.selectbox(
+                    "🌐 Select your country for localized store suggestions (optional)",
+                    options=["", "Pakistan", "Germany", "USA", "UK", "India", "Canada", "Australia"],
+                    index=0,
+                    key="full_country"
+                )
+
+                full_upload = load_upload(full_img, "full")
+                if full_upload:
+                    st.image(full_upload["thumbnail"], caption="Your look", use_container_width=True)
+
+                    # Sections are shared with the single tabs, e.g. an earlier roast of this image is reused
+                    full_lang = lang_codes[language_option]
+                    section_keys = {
+                        mode: result_key(full_upload, mode, full_country if mode == "diagnostic" else "", full_lang)
+                        for mode in SECTION_RENDERERS
+                    }
+                    sections = {mode: lookup_result(key) for mode, key in section_keys.items()}
+                    complete = all(result is not None for result in sections.values())
+                    if complete:
+                        run = st.button("🔄 Regenerate", key="full_regenerate")
+                    else:
+                        run = st.button("📑 Get My Full Report", type="primary")
+
+                    # Sections arrive in completion order; render them in a fixed layout
+                    placeholders = {mode: st.empty() for mode in SECTION_RENDERERS}
+                    if run:
+                        for placeholder in placeholders.values():
+                            placeholder.info("⏳ Working on it...")
+                        try:
+                            fresh = {"fresh": "1"} if complete else {}
+                            for section in stream_full_report(full_upload, user_region=full_country, **fresh):
+                                mode = section["section"]
+                                placeholder = placeholders[mode]
+                                if section["status"] == "success":
+                                    result = localized(parse_result(mode, section["result"]), full_lang)
+                                    remember_result(section_keys[mode], result)
+                                    with placeholder.container():
+                                        SECTION_RENDERERS[mode](result)
+                                else:
+                                    placeholder.error(f"❌ {mode.title()} failed: {section['error']}")
+                        except PremiumRequired:
+                            revoke_entitlement()
+                        except Exception as e:
+                            st.error(f"❌ Report failed: {str(e)}")
+                    elif complete:
+                        for mode, placeholder in placeholders.items():
+                            with placeholder.container():
+                                SECTION_RENDERERS[mode](sections[mode])
 
     # ========== PAYMENT FLOW (LOCKED) ==========
     else:
@@ -880,6 +1128,7 @@ Avoid links and fake stores. Be practical, relevant, and region-aware.
                 st.warning("Please enter your email first")
             else:
                 with st.spinner("Creating secure payment link..."):
+                    stripe = get_stripe()
                     try:
                         checkout_session = stripe.checkout.Session.create(
                             payment_method_types=["card"],
@@ -915,3 +1164,17 @@ Avoid links and fake stores. Be practical, relevant, and region-aware.
             **Contact:** support@stylewithai.com
             """)
 
+
+# ---------- Storage debug panel ----------
+# Rendered last so it reflects everything this run stored
+if SHOW_STORAGE_PANEL:
+    with st.sidebar.expander("🧰 Session Storage", expanded=False):
+        stats = get_artifact_store().stats(artifact_session())
+        session_stats = stats["session"]
+        st.caption(f"This session: {session_stats['memory_bytes'] / MB:.1f} / {session_stats['budget'] / MB:.0f} MB in memory")
+        st.progress(min(session_stats["memory_bytes"] / session_stats["budget"], 1.0))
+        st.caption(f"All sessions ({stats['sessions']}): {stats['memory_bytes'] / MB:.1f} / {stats['global_budget'] / MB:.0f} MB in memory")
+        st.progress(min(stats["memory_bytes"] / stats["global_budget"], 1.0))
+        st.caption(f"Spilled to disk: {stats['disk_bytes'] / MB:.1f} / {stats['disk_budget'] / MB:.0f} MB in {stats['disk_files']} files")
+        st.caption(f"Hits {stats['hits']} • misses {stats['misses']} • evictions {stats['evictions']}")
+        st.table(session_stats["artifacts"])
@@ -0,0 +1,106 @@
+"""Upload validation from the image header alone.
+
+The format is sniffed from the magic bytes and the dimensions are read from
+the PNG IHDR chunk or the JPEG start-of-frame marker, without decoding any
+pixels. JPEG segments before the frame header (EXIF, ICC profiles) are
+skipped with seek(), so even large metadata blocks cost only a few bytes of
+reads. A renamed PDF, a truncated file or a decompression bomb is turned
+away before it is saved, encoded or sent to a model.
+"""
+import os
+import struct
+from collections import namedtuple
+
+ImageInfo = namedtuple('ImageInfo', ['format', 'mimetype', 'width', 'height'])
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+JPEG_SOI = b'\xff\xd8'
+# Start-of-frame markers carry the dimensions (C4, C8 and CC are not frames)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+JPEG_MAX_SEGMENTS = 256
+
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', 40_000_000))  # ~8K x 5K
+MIN_IMAGE_SIDE = int(os.getenv('MIN_IMAGE_SIDE', 64))
+MAX_ASPECT_RATIO = float(os.getenv('MAX_ASPECT_RATIO', 4))
+
+
+class InvalidImage(ValueError):
+    """An upload rejected from its header; `reason` is the metric label"""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise InvalidImage('truncated', 'Image header is truncated')
+    return data
+
+
+def _png_size(stream):
+    chunk_length, chunk_type = struct.unpack('>I4s', _read_exact(stream, 8))
+    if chunk_type != b'IHDR' or chunk_length != 13:
+        raise InvalidImage('corrupt', 'PNG header is corrupt')
+    return struct.unpack('>II', _read_exact(stream, 8))
+
+
+def _jpeg_size(stream):
+    for _ in range(JPEG_MAX_SEGMENTS):
+        marker = _read_exact(stream, 2)
+        while marker[0] == 0xFF and marker[1] == 0xFF:  # fill bytes before a marker
+            marker = marker[1:] + _read_exact(stream, 1)
+        if marker[0] != 0xFF:
+            raise InvalidImage('corrupt', 'JPEG header is corrupt')
+        code = marker[1]
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:  # markers without a length
+            continue
+        if code == 0xD9 or code == 0xDA:  # end of image, or scan data before any frame header
+            break
+        (length,) = struct.unpack('>H', _read_exact(stream, 2))
+        if length < 2:
+            raise InvalidImage('corrupt', 'JPEG header is corrupt')
+        if code in JPEG_SOF_MARKERS:
+            _precision, height, width = struct.unpack('>BHH', _read_exact(stream, 5))
+            return width, height
+        stream.seek(length - 2, os.SEEK_CUR)
+    raise InvalidImage('corrupt', 'JPEG has no frame header')
+
+
+def read_image_info(stream):
+    """Format and dimensions of a PNG or JPEG from its header; the stream is rewound afterwards"""
+    start = stream.tell()
+    try:
+        head = stream.read(8)
+        if head.startswith(PNG_SIGNATURE):
+            width, height = _png_size(stream)
+            info = ImageInfo('png', 'image/png', width, height)
+        elif head.startswith(JPEG_SOI):
+            stream.seek(start + 2)
+            width, height = _jpeg_size(stream)
+            info = ImageInfo('jpeg', 'image/jpeg', width, height)
+        else:
+            raise InvalidImage('format', 'File is not a PNG or JPEG image')
+    finally:
+        stream.seek(start)
+    return info
+
+
+def check_image(info):
+    """Enforce the size and shape limits; raises InvalidImage"""
+    if not info.width or not info.height:
+        raise InvalidImage('corrupt', 'Image has no dimensions')
+    if info.width * info.height > MAX_IMAGE_PIXELS:
+        raise InvalidImage('too_many_pixels', f'Image is larger than {MAX_IMAGE_PIXELS:,} pixels')
+    if min(info.width, info.height) < MIN_IMAGE_SIDE:
+        raise InvalidImage('too_small', f'Image sides must be at least {MIN_IMAGE_SIDE}px')
+    if max(info.width, info.height) > MAX_ASPECT_RATIO * min(info.width, info.height):
+        raise InvalidImage('aspect_ratio', f'Image aspect ratio exceeds {MAX_ASPECT_RATIO:g}:1')
+
+
+def validate_image(stream):
+    """Header-checked ImageInfo for an upload stream; raises InvalidImage"""
+    info = read_image_info(stream)
+    check_image(info)
+    return info
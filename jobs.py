@@ -0,0 +1,177 @@
+"""Background jobs with long-polling, shared by all workers on the host.
+
+A job is submitted to a worker pool and answered immediately with its id;
+clients then poll for the result, optionally holding the poll open until
+the job finishes. Job records live in a SQLite file (WAL mode), so any
+gunicorn worker on the host can answer a poll for a job another worker is
+running. Records expire `ttl` seconds after their last update and are
+purged on the next submit. Workers on different hosts need their own
+routing (or a shared volume for the database).
+
+A poll for a job running in this process wakes up as soon as it finishes;
+polls for jobs in other workers re-read the record every POLL_INTERVAL.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime
+
+from metrics import JOBS
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+FINISHED = (SUCCEEDED, FAILED)
+POLL_INTERVAL = 0.25
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    expires_at REAL NOT NULL
+)
+'''
+
+
+class Job:
+    """A snapshot of one unit of background work and its outcome"""
+
+    def __init__(self, kind, id=None, status=QUEUED, result=None, error=None,
+                 created_at=None, started_at=None, finished_at=None):
+        self.id = id or uuid.uuid4().hex
+        self.kind = kind
+        self.status = status
+        self.result = result
+        self.error = error
+        self.created_at = created_at or datetime.utcnow().isoformat()
+        self.started_at = started_at
+        self.finished_at = finished_at
+
+    @classmethod
+    def from_row(cls, row):
+        job_id, kind, status, result, error, created_at, started_at, finished_at = row
+        return cls(
+            kind, job_id, status,
+            json.loads(result) if result is not None else None,
+            json.loads(error) if error is not None else None,
+            created_at, started_at, finished_at
+        )
+
+    def as_dict(self):
+        data = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.status == SUCCEEDED:
+            data['result'] = self.result
+        if self.status == FAILED:
+            data['error'] = self.error
+        return data
+
+
+class JobStore:
+    """Runs jobs on `executor` and keeps their records in the SQLite file at `path`.
+
+    `fn` returns the job's (JSON-serializable) result; `on_error(exc)` turns
+    an exception into the error record stored on the failed job. At most
+    `maxsize` records are kept.
+    """
+
+    def __init__(self, executor, path, ttl=3600, maxsize=1024, on_error=None, timer=time.time):
+        self.executor = executor
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.on_error = on_error or (lambda e: {'error': str(e)})
+        self.timer = timer
+        self._finished = {}  # job id -> Event, for jobs running in this process
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(_SCHEMA)
+
+    def submit(self, kind, fn, *args, **kwargs):
+        job = Job(kind)
+        now = self.timer()
+        with closing(self._connect()) as db, db:
+            db.execute('DELETE FROM jobs WHERE expires_at <= ?', (now,))
+            db.execute(
+                'INSERT INTO jobs (id, kind, status, created_at, expires_at) VALUES (?, ?, ?, ?, ?)',
+                (job.id, kind, job.status, job.created_at, now + self.ttl)
+            )
+            db.execute(
+                'DELETE FROM jobs WHERE id NOT IN (SELECT id FROM jobs ORDER BY expires_at DESC LIMIT ?)',
+                (self.maxsize,)
+            )
+        with self._lock:
+            self._finished[job.id] = threading.Event()
+        self.executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        """The job's current record, or None if it is unknown or expired"""
+        with closing(self._connect()) as db:
+            row = db.execute(
+                'SELECT id, kind, status, result, error, created_at, started_at, finished_at '
+                'FROM jobs WHERE id = ? AND expires_at > ?',
+                (job_id, self.timer())
+            ).fetchone()
+        return Job.from_row(row) if row else None
+
+    def wait(self, job_id, timeout):
+        """Like get(), but first waits up to `timeout` seconds for the job to finish"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            finished = self._finished.get(job_id)
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.status in FINISHED or remaining <= 0:
+                return job
+            if finished is not None:
+                finished.wait(remaining)
+                finished = None  # set, or the deadline passed: re-read once more, then poll
+            else:
+                time.sleep(min(POLL_INTERVAL, remaining))
+
+    # --- internals ---
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _update(self, job_id, **columns):
+        """Write columns of a job record, restarting its TTL"""
+        columns['expires_at'] = self.timer() + self.ttl
+        with closing(self._connect()) as db, db:
+            db.execute(
+                f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in columns)} WHERE id = ?",
+                (*columns.values(), job_id)
+            )
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            self._update(job.id, status=RUNNING, started_at=datetime.utcnow().isoformat())
+            try:
+                outcome = {'status': SUCCEEDED, 'result': json.dumps(fn(*args, **kwargs))}
+            except Exception as e:
+                outcome = {'status': FAILED, 'error': json.dumps(self.on_error(e))}
+            self._update(job.id, finished_at=datetime.utcnow().isoformat(), **outcome)
+            JOBS.inc(kind=job.kind, status=outcome['status'])
+        finally:
+            with self._lock:
+                finished = self._finished.pop(job.id)
+            finished.set()
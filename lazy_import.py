@@ -0,0 +1,48 @@
+"""Deferred imports for heavy SDKs.
+
+Importing openai, stripe and requests costs several hundred milliseconds,
+which every cold start on Render pays before the first response. A
+LazyModule stands in for the module and imports it, once and under a lock,
+on first attribute access, so code keeps writing ``openai.APIError`` or
+``stripe.checkout.Session`` as usual. Exception clauses such as
+``except openai.APIError`` only touch the module when an exception is
+actually being matched.
+"""
+import importlib
+import threading
+
+
+class LazyModule:
+    """Module proxy that imports `name` on first use.
+
+    `on_import(module)` runs once after the import, before any other thread
+    can see the module, which makes it the place for SDK configuration.
+    """
+
+    def __init__(self, name, on_import=None):
+        self._name = name
+        self._on_import = on_import
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Import (if needed) and return the real module"""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    module = importlib.import_module(self._name)
+                    if self._on_import is not None:
+                        self._on_import(module)
+                    self._module = module
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f'<LazyModule {self._name!r} ({state})>'
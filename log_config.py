@@ -0,0 +1,140 @@
+"""Non-blocking JSON logging.
+
+Loggers hand records to a QueueHandler; a single QueueListener thread
+formats them as JSON lines and writes them to stderr and a rotating file,
+so request threads never wait on disk I/O. The queue is bounded: when the
+writer falls behind, records are dropped and counted instead of blocking.
+
+Log calls should pass arguments lazily (``logger.info('... %s', value)``)
+so filtered records are never formatted; formatting of accepted records
+happens on the listener thread.
+
+Environment:
+    LOG_LEVEL           root level (default INFO)
+    LOG_FILE            file path (default app.log; empty disables the file)
+    LOG_MAX_BYTES       rotate the file at this size (default 10 MB) ...
+    LOG_ROTATE_WHEN     ... or on a schedule instead, e.g. "midnight" or "H"
+    LOG_BACKUP_COUNT    rotated files to keep (default 5)
+    LOG_QUEUE_SIZE      records buffered before dropping (default 10000)
+    LOG_SAMPLE_RATES    per-logger sampling of records below WARNING,
+                        e.g. "werkzeug=0.1,app.cache=0.05"
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+from metrics import LOG_RECORDS_DROPPED
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra=` fields included"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of sub-WARNING records from selected loggers (and their children)"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def rate_for(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        return random.random() < self.rate_for(record.name)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks or formats on the calling thread"""
+
+    def prepare(self, record):
+        # The listener runs in this process, so the record can be passed
+        # as-is and formatted there
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(logger=record.name)
+
+
+def parse_sample_rates(value):
+    rates = {}
+    for item in value.split(','):
+        name, _, rate = item.strip().partition('=')
+        if name and rate:
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+def file_handler(path):
+    backup_count = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    when = os.getenv('LOG_ROTATE_WHEN')
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backup_count, encoding='utf-8')
+    max_bytes = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    return logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+
+
+_listener = None
+
+
+def configure_logging():
+    """Route the root logger through the queue; safe to call more than once"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = JsonFormatter()
+    handlers = [logging.StreamHandler(sys.stderr)]
+    log_file = os.getenv('LOG_FILE', 'app.log')
+    if log_file:
+        handlers.append(file_handler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', ''))))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)  # flush what is still queued on shutdown
+    return _listener
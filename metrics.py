@@ -0,0 +1,190 @@
+"""Minimal in-process metrics exposed in the Prometheus text format.
+
+Counters and histograms are plain dicts guarded by a lock, so recording a
+sample costs a lock, a dict lookup and a bisect. Each worker process keeps
+its own registry; scrape every worker (or aggregate in Prometheus).
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers fast local stages up to slow vision calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    """Monotonic counter with labels"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {value}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._values.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", bound)])} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}'
+
+
+class Registry:
+    """A set of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'stylewithai_request_duration_seconds', 'Time spent in request handlers', ('endpoint',))
+RESPONSES = REGISTRY.counter(
+    'stylewithai_http_responses_total', 'HTTP responses by endpoint and status code', ('endpoint', 'status'))
+STAGE_SECONDS = REGISTRY.histogram(
+    'stylewithai_stage_duration_seconds', 'Time spent in each stage of a request', ('endpoint', 'stage'))
+OPENAI_RETRIES = REGISTRY.counter(
+    'stylewithai_openai_retries_total', 'OpenAI calls retried after an API error', ('prompt',))
+UPSTREAM_ERRORS = REGISTRY.counter(
+    'stylewithai_upstream_errors_total', 'Errors returned by upstream services', ('service', 'kind'))
+OPENAI_TOKENS = REGISTRY.counter(
+    'stylewithai_openai_tokens_total', 'OpenAI tokens used, by kind (prompt, cached, completion)',
+    ('endpoint', 'feature', 'model', 'kind'))
+OPENAI_COST = REGISTRY.counter(
+    'stylewithai_openai_cost_usd_total', 'Estimated OpenAI spend in USD from the price table',
+    ('endpoint', 'feature', 'model'))
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    'stylewithai_log_records_dropped_total', 'Log records dropped because the log queue was full', ('logger',))
+JOBS = REGISTRY.counter(
+    'stylewithai_jobs_total', 'Background jobs finished, by kind and final status', ('kind', 'status'))
+STYLE_ROUTES = REGISTRY.counter(
+    'stylewithai_style_routes_total', 'Style detections by tier and routing reason', ('route', 'reason'))
+STYLE_ROUTING_SAVED_SECONDS = REGISTRY.counter(
+    'stylewithai_style_routing_saved_seconds_total', 'Estimated latency saved by answering style on the fast tier')
+STYLE_ROUTING_SAVED_USD = REGISTRY.counter(
+    'stylewithai_style_routing_saved_usd_total', 'Estimated OpenAI spend saved by answering style on the fast tier')
+STYLE_ROUTING_OVERHEAD_SECONDS = REGISTRY.counter(
+    'stylewithai_style_routing_overhead_seconds_total', 'Latency of fast-tier calls that were escalated anyway')
+STYLE_ROUTING_OVERHEAD_USD = REGISTRY.counter(
+    'stylewithai_style_routing_overhead_usd_total', 'Spend on fast-tier calls that were escalated anyway')
+LOCALIZED_SECONDS = REGISTRY.histogram(
+    'stylewithai_localized_generation_seconds',
+    'Time to produce travel/trends output in the requested language, native or translated afterwards',
+    ('feature', 'language', 'mode'))
+MODEL_QUEUE_SECONDS = REGISTRY.histogram(
+    'stylewithai_model_queue_seconds', 'Time model calls waited for a slot, by tier', ('tier',))
+MODEL_QUEUE_REJECTED = REGISTRY.counter(
+    'stylewithai_model_queue_rejected_total', 'Model calls turned away after waiting too long for a slot', ('tier',))
+UPLOADS_REJECTED = REGISTRY.counter(
+    'stylewithai_uploads_rejected_total', 'Uploads turned away before any model call, by reason', ('endpoint', 'reason'))
+SIMILARITY_ADDS = REGISTRY.counter(
+    'stylewithai_similarity_adds_total',
+    'Styled uploads sent to the similarity index: indexed, queued for the writer worker, or dropped', ('result',))
+
+
+_stage_recorder = threading.local()
+
+
+@contextmanager
+def stage(endpoint, name):
+    """Context manager timing one stage of a request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, endpoint=endpoint, stage=name)
+        timings = getattr(_stage_recorder, 'timings', None)
+        if timings is not None:
+            timings.append((name, seconds))
+
+
+def record_stages():
+    """Start collecting (stage, seconds) for stages timed in this thread; returns the list"""
+    _stage_recorder.timings = []
+    return _stage_recorder.timings
+
+
+def stop_recording_stages():
+    _stage_recorder.timings = None
@@ -0,0 +1,103 @@
+"""Opt-in profiling of single requests.
+
+A request is profiled when it carries the admin secret in the X-Profile
+header (PROFILE_SECRET), or when it is picked by PROFILE_SAMPLE_RATE. The
+handler runs under cProfile. The stats are written as a .prof (pstats) file
+to PROFILE_DIR, which keeps only the newest PROFILE_MAX_FILES. The file
+opens in snakeviz or speedscope, or with `python -m pstats`. The response
+gets a Server-Timing header with the stage durations from metrics.stage()
+and the total wall time.
+
+With no secret and a zero sample rate, the profiler is disabled and
+requests pay only a boolean check. Only the request thread is profiled.
+Work handed to executors and bodies streamed after the handler returns
+show up in wall time, but not in the profile.
+"""
+import cProfile
+import hmac
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from metrics import record_stages, stop_recording_stages
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+
+
+class RequestProfiler:
+    """Decides which requests to profile and stores their profiles"""
+
+    def __init__(self, secret=None, sample_rate=0.0, directory='profiles', max_files=50):
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.max_files = max_files
+        self.enabled = bool(secret) or sample_rate > 0
+        self._rotate_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            secret=os.getenv('PROFILE_SECRET'),
+            sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', 0)),
+            directory=os.getenv('PROFILE_DIR', 'profiles'),
+            max_files=int(os.getenv('PROFILE_MAX_FILES', 50))
+        )
+
+    def wants(self, headers):
+        """Whether to profile a request with these headers"""
+        token = headers.get(PROFILE_HEADER)
+        if token and self.secret and hmac.compare_digest(token.encode('utf-8'), self.secret.encode('utf-8')):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        """Begin profiling the current thread; returns the session to pass to finish()"""
+        profile = cProfile.Profile()
+        session = {'profile': profile, 'timings': record_stages(), 'start': time.perf_counter()}
+        profile.enable()
+        return session
+
+    def finish(self, session, endpoint):
+        """Stop profiling; returns (profile id, Server-Timing header value)"""
+        session['profile'].disable()
+        total = time.perf_counter() - session['start']
+        stop_recording_stages()
+
+        profile_id = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{endpoint}-{uuid.uuid4().hex[:8]}"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            session['profile'].dump_stats(os.path.join(self.directory, f'{profile_id}.prof'))
+            self._rotate()
+        except OSError as e:
+            logger.warning('Could not write profile %s: %s', profile_id, e)
+
+        return profile_id, server_timing(session['timings'], total)
+
+    def _rotate(self):
+        with self._rotate_lock:
+            profiles = sorted(
+                (entry for entry in os.scandir(self.directory) if entry.name.endswith('.prof')),
+                key=lambda entry: entry.stat().st_mtime
+            )
+            for entry in profiles[:max(0, len(profiles) - self.max_files)]:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+def server_timing(timings, total):
+    """Server-Timing header value; repeated stages are summed and keep their first position"""
+    durations = {}
+    for name, seconds in timings:
+        durations[name] = durations.get(name, 0.0) + seconds
+    metrics = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in durations.items()]
+    metrics.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(metrics)
@@ -0,0 +1,209 @@
+"""Central registry of every prompt sent to OpenAI by the backend.
+
+The Flask endpoints look prompts up by name instead of embedding them, so
+the wording, model and token limits of each feature live in one place.
+Every prompt answers with JSON matching its schema in schemas.py.
+
+Provider-side prompt caching only reuses an identical leading prefix, so
+the system prompt and user instructions are static and everything that
+varies per request goes in `context`, which is appended last (before the
+image).
+"""
+from dataclasses import dataclass
+from string import Formatter
+
+from schemas import SCHEMAS, STYLE_LABELS
+
+
+@dataclass(frozen=True)
+class PromptSpec:
+    """A single model call: static instructions, per-request context and limits"""
+    name: str
+    model: str
+    system: str
+    user_text: str
+    max_tokens: int
+    schema: str
+    timeout: float = 30
+    needs_image: bool = True
+    params: tuple = ()
+    context: str = ''
+    image_detail: str = 'auto'  # 'low' sends a single 512px thumbnail
+    logprobs: bool = False
+
+    def __post_init__(self):
+        for part in (self.system, self.user_text):
+            if any(field is not None for _, field, _, _ in Formatter().parse(part)):
+                raise ValueError(f'{self.name}: template fields belong in context, not the cached prefix')
+
+    def render(self, **params):
+        """Return (system, user_text): the static instructions, then the filled-in context"""
+        if not self.context:
+            return self.system, self.user_text
+        values = {key: params.get(key, '') for key in self.params}
+        return self.system, f'{self.user_text}\n\n{self.context.format(**values)}'
+
+    def response_format(self):
+        """OpenAI strict JSON-schema response format for this prompt"""
+        return {
+            'type': 'json_schema',
+            'json_schema': {'name': self.schema, 'strict': True, 'schema': SCHEMAS[self.schema][1]}
+        }
+
+
+# Style detection is tiered: a small model on a low-detail image first, and
+# the full prompt only when that answer is invalid or uncertain (see detect_style)
+STYLE_FAST_PROMPT = PromptSpec(
+    name='style_fast',
+    model='gpt-4o-mini',
+    system='Classify the outfit style from the image as one of: ' + ', '.join(STYLE_LABELS),
+    user_text='Classify this outfit:',
+    max_tokens=50,
+    schema='style',
+    timeout=10,
+    image_detail='low',
+    logprobs=True
+)
+
+STYLE_PROMPT = PromptSpec(
+    name='style',
+    model='gpt-4o',
+    system='Classify the outfit style from the image as one of: ' + ', '.join(STYLE_LABELS),
+    user_text='Classify this outfit:',
+    max_tokens=50,
+    schema='style',
+    timeout=15,
+    image_detail='high'
+)
+
+SUGGESTION_PROMPT = PromptSpec(
+    name='suggestion',
+    model='gpt-4o',
+    system='You are a world-class fashion stylist. You will analyze the image and generate a detailed fashion recommendation in the style given with the request. Keep every field to one or two sentences.',
+    user_text='Give me a full fashion suggestion for this outfit: a theme name, the vibe, top, bottom, shoes, accessories, one fit hack and 2 styling tips.',
+    max_tokens=800,
+    schema='suggestion',
+    timeout=20,
+    params=('style_label',),
+    context='Style: {style_label}'
+)
+
+ROAST_PROMPT = PromptSpec(
+    name='roast',
+    model='gpt-4o',
+    system="""You're a fashionista with *opinions*. Give a flirty, shady-but-loving roast:
+
+- first_impression: 1 sassy sentence, e.g. "Oh you woke up and chose... this?"
+- hot_takes: 3 roasts, each with one emoji, e.g. 🧥 "That jacket's giving 'I raided my dad's closet'"
+- celebrity_shade: a playful celebrity comparison, e.g. "Kinda serving early 2000s Britney denim-on-denim realness... but make it Walmart"
+- glow_up_tip: keep it spicy, e.g. "Add heels and a blazer, or just burn it and start over"
+- rating (1-10) and rating_comment with sass, e.g. "The sidewalk outside Fashion Week would *side-eye* this"
+
+Rules: No body shaming, just outfit shaming!""",
+    user_text="Roast this look like we're on a girls' night out",
+    max_tokens=800,
+    schema='roast'
+)
+
+GLOWUP_PROMPT = PromptSpec(
+    name='glowup',
+    model='gpt-4o',
+    system="""You're a celebrity stylist giving honest but kind feedback. Provide:
+1. First impression (1 sentence)
+2. Outfit rating (1-10) with brief explanation
+3. Top 3 strengths of this look
+4. Top 3 areas for improvement
+5. Simple styling tweaks that would elevate it
+6. Recommended accessories
+Start list entries with an emoji and keep it conversational.""",
+    user_text='Give me honest feedback on this outfit',
+    max_tokens=1000,
+    schema='glowup'
+)
+
+DIAGNOSTIC_PROMPT = PromptSpec(
+    name='diagnostic',
+    model='gpt-4o',
+    system="""
+You're a celebrity stylist giving a HEAD-TO-TOE analysis. Cover:
+
+**A. FACE & HAIR SYNERGY**
+1. Face Shape: Suggest flattering necklines/hairstyles
+2. Skin Tone: Recommend clothing colors for undertone
+3. Hair Texture: Offer styling advice
+
+**B. OUTFIT ANALYSIS**
+1. Occasion: Day/Night appropriateness
+2. Seasonality: Fabric and color match to weather
+3. Trend Alignment: Does this outfit match current fashion trends? Briefly explain.
+
+**C. SHOPPING CATEGORIES**
+Pick the 2–4 product categories, most important first, the user should shop to get the recommended styles. Stores are looked up separately.
+""",
+    user_text='Analyze this look head-to-toe.',
+    max_tokens=1000,
+    schema='diagnostic',
+    timeout=60,
+    params=('user_region',)
+)
+
+REGION_PROMPT = PromptSpec(
+    name='region',
+    model='gpt-4o',
+    system="""You're a personal shopper. Based on the outfit in the image, pick the 2–4 product categories, most important first, to shop for similar or complementary styles. Stores are looked up separately.""",
+    user_text='What should I shop for to get this look?',
+    max_tokens=100,
+    schema='region',
+    params=('user_region',)
+)
+
+TRAVEL_PROMPT = PromptSpec(
+    name='travel',
+    model='gpt-4o',  # structured outputs are not available on gpt-4
+    system='You are a concise travel fashion advisor. Use bullet points, emojis, and keep suggestions very brief.',
+    user_text="""You are a fashion-forward travel stylist. For the trip below, give me **5 ultra-concise fashion recommendations per gender** with:
+- 🔥 Trendy yet practical items
+- 🌦️ Weather-appropriate fabrics
+- 🏛️ Cultural considerations
+- ✨ 1 emoji per item
+- 🚫 Max 8 words per item, e.g. 👗 "Silk midi dress (elegant + breathable)"
+Write every item in the language given below.""",
+    max_tokens=600,
+    schema='gendered_picks',
+    needs_image=False,
+    params=('age', 'destination', 'trip_type', 'season', 'language'),
+    context="Trip: I'm a {age} traveler going to {destination} for {trip_type} during {season}.\nLanguage: {language}"
+)
+
+TRENDS_PROMPT = PromptSpec(
+    name='trends',
+    model='gpt-4o',  # structured outputs are not available on gpt-4
+    system='You are a fashion trends expert. Provide concise, emoji-rich trend reports.',
+    user_text="""You are a fashion trends expert. Provide concise, emoji-rich trend reports for the region below.
+Separate trends by gender, one relevant emoji per trend.
+Keep each trend to one line maximum.
+Write every trend in the language given below.""",
+    max_tokens=600,
+    schema='gendered_picks',
+    needs_image=False,
+    params=('region', 'language'),
+    context='Region: {region}\nLanguage: {language}'
+)
+
+PROMPTS = {
+    spec.name: spec for spec in (
+        STYLE_FAST_PROMPT, STYLE_PROMPT, SUGGESTION_PROMPT, ROAST_PROMPT, GLOWUP_PROMPT,
+        DIAGNOSTIC_PROMPT, REGION_PROMPT, TRAVEL_PROMPT, TRENDS_PROMPT
+    )
+}
+
+# user_region is not part of the diagnostic/region prompts: it only selects
+# stores from the catalog, but stays a parameter so results are cached per region.
+
+# Modes exposed through the /analyze endpoint
+ANALYSIS_MODES = ('roast', 'glowup', 'diagnostic', 'region', 'travel', 'trends')
+
+
+def get_prompt(name):
+    """Look up a prompt by name, raising KeyError for unknown names"""
+    return PROMPTS[name]
@@ -0,0 +1,105 @@
+"""Priority-aware admission for model calls.
+
+All OpenAI calls share a fixed number of slots (OPENAI_MAX_CONCURRENCY).
+Calls are admitted per tier: each tier has its own FIFO queue and
+concurrency cap, and when a slot frees up the waiting tiers are served by
+weighted fair sharing (stride scheduling), so premium calls get `weight`
+times the slots of free calls under saturation without starving them. A
+free-tier cap below the total keeps slots in reserve for premium bursts.
+
+Time spent queued is recorded per tier; a call that waits longer than its
+tier's `max_wait` raises QueueTimeout so the endpoint can answer 503 instead
+of holding the client indefinitely.
+"""
+import threading
+import time
+from collections import deque
+
+from metrics import MODEL_QUEUE_REJECTED, MODEL_QUEUE_SECONDS
+
+
+class QueueTimeout(Exception):
+    """A model call waited longer than its tier allows for a slot"""
+
+
+class Tier:
+    """Scheduling parameters and live state of one tier"""
+
+    def __init__(self, name, weight, max_concurrency, max_wait=None):
+        self.name = name
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.waiters = deque()
+        self.pass_value = 0.0  # virtual time of the tier's next grant
+
+
+class PriorityScheduler:
+    """Weighted fair sharing of `capacity` slots between tiers"""
+
+    def __init__(self, capacity, tiers):
+        self.capacity = capacity
+        self.tiers = {tier.name: tier for tier in tiers}
+        self.in_flight = 0
+        self._virtual_time = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tier_name):
+        """Block until `tier_name` may start a model call; raises QueueTimeout after the tier's max_wait"""
+        tier = self.tiers[tier_name]
+        start = time.perf_counter()
+        with self._lock:
+            if not tier.waiters and self._has_room(tier):
+                self._grant(tier)
+                waiter = None
+            else:
+                if not tier.waiters:
+                    # A tier returning from idle must not spend credit saved while idle
+                    tier.pass_value = max(tier.pass_value, self._virtual_time)
+                waiter = threading.Event()
+                tier.waiters.append(waiter)
+
+        if waiter is not None and not waiter.wait(tier.max_wait):
+            with self._lock:
+                if not waiter.is_set():
+                    tier.waiters.remove(waiter)
+                    MODEL_QUEUE_REJECTED.inc(tier=tier_name)
+                    raise QueueTimeout(f'No model slot for {tier_name} within {tier.max_wait}s')
+        MODEL_QUEUE_SECONDS.observe(time.perf_counter() - start, tier=tier_name)
+
+    def release(self, tier_name):
+        with self._lock:
+            self.in_flight -= 1
+            self.tiers[tier_name].in_flight -= 1
+            self._dispatch()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'in_flight': self.in_flight,
+                'tiers': {
+                    name: {'in_flight': tier.in_flight, 'queued': len(tier.waiters)}
+                    for name, tier in self.tiers.items()
+                }
+            }
+
+    # --- internals (lock held) ---
+    def _has_room(self, tier):
+        return self.in_flight < self.capacity and tier.in_flight < tier.max_concurrency
+
+    def _grant(self, tier):
+        self.in_flight += 1
+        tier.in_flight += 1
+        self._virtual_time = max(self._virtual_time, tier.pass_value)
+        tier.pass_value += 1 / tier.weight
+
+    def _dispatch(self):
+        while self.in_flight < self.capacity:
+            ready = [tier for tier in self.tiers.values() if tier.waiters and self._has_room(tier)]
+            if not ready:
+                return
+            tier = min(ready, key=lambda t: t.pass_value)
+            self._grant(tier)
+            tier.waiters.popleft().set()
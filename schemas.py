@@ -0,0 +1,327 @@
+"""Structured-output schemas and the typed results parsed from them.
+
+Every prompt asks the model for JSON matching one of the schemas below
+(OpenAI strict JSON-schema mode), so neither the backend nor the Streamlit
+app has to split or regex model text. Both sides import this module: the
+backend to request and validate outputs, the frontend to turn them into
+typed objects and render them.
+"""
+import json
+import math
+from dataclasses import dataclass, fields, is_dataclass
+
+
+def _object(properties):
+    """Strict JSON-schema object: every property required, nothing extra"""
+    return {
+        'type': 'object',
+        'properties': properties,
+        'required': list(properties),
+        'additionalProperties': False
+    }
+
+
+STYLE_LABELS = (
+    'south_asian', 'east_asian', 'western', 'middle_eastern',
+    'african', 'latin_american', 'north_american'
+)
+
+# Product categories the model may recommend; store_catalog.py indexes stores by them
+PRODUCT_CATEGORIES = (
+    'tops', 'bottoms', 'dresses', 'outerwear', 'ethnic_wear', 'formal_wear',
+    'activewear', 'shoes', 'bags', 'accessories', 'jewelry'
+)
+
+STRING = {'type': 'string'}
+STRING_LIST = {'type': 'array', 'items': STRING}
+RATING = {'type': 'integer'}
+EMOJI_ITEM = _object({'emoji': STRING, 'text': STRING})
+EMOJI_ITEMS = {'type': 'array', 'items': EMOJI_ITEM}
+CATEGORIES = {'type': 'array', 'items': {'type': 'string', 'enum': list(PRODUCT_CATEGORIES)}}
+
+
+# --- Result types ---
+@dataclass
+class EmojiItem:
+    emoji: str
+    text: str
+
+
+@dataclass
+class StoreSuggestion:
+    store_name: str
+    product_type: str
+    price_range: str
+
+
+@dataclass
+class StyleResult:
+    style: str
+
+
+@dataclass
+class Suggestion:
+    theme: str
+    vibe: str
+    top: str
+    bottom: str
+    shoes: str
+    accessories: list
+    fit_hack: str
+    styling_tips: list
+
+
+@dataclass
+class Roast:
+    first_impression: str
+    hot_takes: list
+    celebrity_shade: str
+    glow_up_tip: str
+    rating: int
+    rating_comment: str
+
+
+@dataclass
+class GlowUp:
+    first_impression: str
+    rating: int
+    rating_reason: str
+    strengths: list
+    improvements: list
+    styling_tweaks: list
+    accessories: list
+
+
+@dataclass
+class Diagnostic:
+    face_shape: str
+    skin_tone: str
+    hair_texture: str
+    occasion: str
+    seasonality: str
+    trend_alignment: str
+    shopping_categories: list
+    stores: list = None  # filled from the store catalog, not by the model
+
+
+@dataclass
+class RegionStores:
+    shopping_categories: list
+    stores: list = None
+
+
+@dataclass
+class GenderedPicks:
+    women: list
+    men: list
+
+
+# Element types of list fields that hold nested objects
+NESTED = {
+    'hot_takes': EmojiItem,
+    'stores': StoreSuggestion,
+    'women': EmojiItem,
+    'men': EmojiItem,
+}
+
+# Display labels for markdown rendering
+LABELS = {
+    'theme': 'Theme', 'vibe': 'Vibe', 'top': 'Top', 'bottom': 'Bottom', 'shoes': 'Shoes',
+    'accessories': 'Accessories', 'fit_hack': 'Fit Hack', 'styling_tips': 'Styling Tips',
+    'first_impression': 'First Impression', 'hot_takes': 'Hot Takes',
+    'celebrity_shade': 'Celebrity Shade', 'glow_up_tip': 'Glow-Up Tip',
+    'rating': 'Rating', 'rating_comment': 'Verdict', 'rating_reason': 'Why',
+    'strengths': 'Strengths', 'improvements': 'Areas to Improve',
+    'styling_tweaks': 'Styling Tweaks', 'face_shape': 'Face Shape', 'skin_tone': 'Skin Tone',
+    'hair_texture': 'Hair Texture', 'occasion': 'Occasion', 'seasonality': 'Seasonality',
+    'trend_alignment': 'Trend Alignment', 'stores': 'Where to Shop',
+    'shopping_categories': 'Shop For',
+    'women': 'Women', 'men': 'Men', 'style': 'Style',
+}
+
+
+# --- Schemas ---
+SCHEMAS = {
+    'style': (StyleResult, _object({'style': {'type': 'string', 'enum': list(STYLE_LABELS)}})),
+    'suggestion': (Suggestion, _object({
+        'theme': STRING, 'vibe': STRING, 'top': STRING, 'bottom': STRING, 'shoes': STRING,
+        'accessories': STRING_LIST, 'fit_hack': STRING, 'styling_tips': STRING_LIST
+    })),
+    'roast': (Roast, _object({
+        'first_impression': STRING, 'hot_takes': EMOJI_ITEMS, 'celebrity_shade': STRING,
+        'glow_up_tip': STRING, 'rating': RATING, 'rating_comment': STRING
+    })),
+    'glowup': (GlowUp, _object({
+        'first_impression': STRING, 'rating': RATING, 'rating_reason': STRING,
+        'strengths': STRING_LIST, 'improvements': STRING_LIST,
+        'styling_tweaks': STRING_LIST, 'accessories': STRING_LIST
+    })),
+    'diagnostic': (Diagnostic, _object({
+        'face_shape': STRING, 'skin_tone': STRING, 'hair_texture': STRING,
+        'occasion': STRING, 'seasonality': STRING, 'trend_alignment': STRING,
+        'shopping_categories': CATEGORIES
+    })),
+    'region': (RegionStores, _object({'shopping_categories': CATEGORIES})),
+    'gendered_picks': (GenderedPicks, _object({'women': EMOJI_ITEMS, 'men': EMOJI_ITEMS})),
+}
+
+
+def from_dict(cls, data):
+    """Build a result object from parsed JSON; missing fields become None"""
+    kwargs = {}
+    for f in fields(cls):
+        value = data.get(f.name)
+        if f.name in NESTED and value is not None:
+            value = [from_dict(NESTED[f.name], item) for item in value]
+        kwargs[f.name] = value
+    return cls(**kwargs)
+
+
+def parse_result(schema_name, data):
+    """Parse a JSON string or dict into the typed result for `schema_name`"""
+    if isinstance(data, str):
+        data = json.loads(data)
+    return from_dict(SCHEMAS[schema_name][0], data)
+
+
+def as_dict(result):
+    """Plain-JSON form of a result object"""
+    if is_dataclass(result):
+        return {f.name: as_dict(getattr(result, f.name)) for f in fields(result)}
+    if isinstance(result, list):
+        return [as_dict(item) for item in result]
+    return result
+
+
+# Fields that are not prose and must survive translation unchanged
+VERBATIM_FIELDS = ('emoji', 'store_name', 'style', 'shopping_categories')
+
+
+def map_strings(result, fn):
+    """Copy of a result with `fn` applied to every prose string (see VERBATIM_FIELDS)"""
+    if is_dataclass(result):
+        return type(result)(**{
+            f.name: getattr(result, f.name) if f.name in VERBATIM_FIELDS else map_strings(getattr(result, f.name), fn)
+            for f in fields(result)
+        })
+    if isinstance(result, list):
+        return [map_strings(item, fn) for item in result]
+    if isinstance(result, str):
+        return fn(result)
+    return result
+
+
+def iter_strings(result):
+    """Every string `map_strings` would visit, in order"""
+    collected = []
+    map_strings(result, lambda text: collected.append(text) or text)
+    return collected
+
+
+def item_markdown(item):
+    """One list entry as markdown"""
+    if isinstance(item, str):
+        return item.replace('_', ' ').capitalize() if item in PRODUCT_CATEGORIES else item
+    if isinstance(item, dict):
+        item = from_dict(EmojiItem if 'emoji' in item else StoreSuggestion, item)
+    if isinstance(item, EmojiItem):
+        return f'{item.emoji} {item.text}'
+    if isinstance(item, StoreSuggestion):
+        return f'**{item.store_name}**: {item.product_type} ({item.price_range})'
+    return str(item)
+
+
+def field_markdown(name, value):
+    """Render one field as markdown; used both for streamed previews and full results"""
+    label = LABELS.get(name, name.replace('_', ' ').title())
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return f'**{label}**\n' + '\n'.join(f'- {item_markdown(item)}' for item in value)
+    if name == 'rating':
+        return f'**{label}:** {value}/10'
+    return f'**{label}:** {value}'
+
+
+def to_markdown(result):
+    """Render a whole result object as markdown"""
+    parts = (field_markdown(f.name, getattr(result, f.name)) for f in fields(result))
+    return '\n\n'.join(part for part in parts if part)
+
+
+class JsonFieldStream:
+    """Pull completed top-level fields out of a JSON object as it streams in.
+
+    feed() returns the (key, value) pairs finished by the new text. A value
+    only counts as finished once the ',' or '}' after it has arrived, so a
+    number such as 12 (or 1.) is never reported while it could still become
+    123 (or 1.5).
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.started = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, text):
+        self.buffer += text
+        completed = []
+        while True:
+            item = self._next_field()
+            if item is None:
+                return completed
+            completed.append(item)
+
+    def _skip_ws(self, pos):
+        while pos < len(self.buffer) and self.buffer[pos] in ' \t\r\n':
+            pos += 1
+        return pos
+
+    def _next_field(self):
+        buf = self.buffer
+        pos = self._skip_ws(self.pos)
+        if not self.started:
+            if pos >= len(buf) or buf[pos] != '{':
+                return None
+            self.started = True
+            pos = self.pos = pos + 1
+            pos = self._skip_ws(pos)
+        if pos < len(buf) and buf[pos] == ',':
+            pos = self._skip_ws(pos + 1)
+        if pos >= len(buf) or buf[pos] == '}':
+            return None
+
+        try:
+            key, pos = self._decoder.raw_decode(buf, pos)
+            pos = self._skip_ws(pos)
+            if pos >= len(buf) or buf[pos] != ':':
+                return None
+            value, end = self._decoder.raw_decode(buf, self._skip_ws(pos + 1))
+        except json.JSONDecodeError:
+            return None  # still incomplete
+
+        after = self._skip_ws(end)
+        if after >= len(buf) or buf[after] not in ',}':
+            return None
+        self.pos = after
+        return key, value
+
+
+def label_confidence(logprobs, label):
+    """Probability the model gave `label` in its JSON answer, from token logprobs (1.0 when absent).
+
+    Every token that overlaps the label's characters counts, including tokens
+    that also carry the surrounding quotes or punctuation.
+    """
+    if logprobs is None or not logprobs.content:
+        return 1.0
+    text, spans = '', []
+    for item in logprobs.content:
+        spans.append((len(text), len(text) + len(item.token), item.logprob))
+        text += item.token
+    start = text.find(f'"{label}"') + 1
+    if start == 0:
+        return 0.0
+    end = start + len(label)
+    return math.exp(sum(logprob for s, e, logprob in spans if s < end and e > start))
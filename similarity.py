@@ -0,0 +1,379 @@
+"""Outfit similarity index behind "find looks like this".
+
+Every styled upload is reduced to a compact feature vector, computed
+locally on the CPU from a heavily downscaled decode: a colour histogram
+plus an 8x8 luminance layout. The vector is stored with the upload's style
+label and suggestion. Cosine similarity between vectors ranks outfits by
+colour palette first and silhouette second.
+
+Files in the index directory:
+
+* vectors.f32 holds float32 rows, memory-mapped, preallocated and grown by
+  doubling.
+* rows.jsonl holds one metadata line per row and is only appended to. A
+  row exists once its line is written.
+* writer.lock is an flock held by the single process that appends and
+  compacts. Other worker processes open the index read-only and pick up
+  new rows (or a compacted index) on their next search.
+* pending-<pid>.jsonl is where a read-only process queues the rows it is
+  asked to add. The writer ingests these logs on its next add or search,
+  so a row added in another worker is searchable once the writer next
+  gets a request.
+
+Only one process writes, and the files must be on a disk that all workers
+share. Workers on different hosts each keep their own index.
+
+Re-indexing an image (same content hash) shadows its older row. Shadowed
+rows, and the oldest rows beyond `max_rows`, are dropped by compaction.
+Compaction rewrites both files beside the live ones and swaps them in with
+os.replace. Searches in progress keep reading the old mapping.
+
+Search is exact: a chunked matrix product over all rows. At 128 float32
+dimensions a million rows take 512MB of page cache. On a single core one
+query scans them in about 50ms. Batched queries share each pass over the
+rows (8 queries in about 180ms), and BLAS spreads the work over more cores.
+"""
+import base64
+import fcntl
+import io
+import json
+import logging
+import math
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DIM = 128  # 64 colour-histogram bins + 8x8 layout
+HISTOGRAM_WEIGHT = 0.6  # share of the cosine score that comes from colour
+CHUNK_ROWS = 1 << 18
+INITIAL_CAPACITY = 4096
+VECTORS_FILE = 'vectors.f32'
+ROWS_FILE = 'rows.jsonl'
+LOCK_FILE = 'writer.lock'
+PENDING_PREFIX = 'pending-'
+PENDING_SUFFIX = '.jsonl'
+INGESTING_SUFFIX = '.ingesting'
+
+
+def _normalize(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def image_features(image_bytes):
+    """Unit-length feature vector of an image; decodes at most a small thumbnail"""
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(image_bytes))
+    img.draft('RGB', (64, 64))  # JPEGs decode straight at 1/2 to 1/8 scale
+    small = img.convert('RGB').resize((32, 32), Image.BILINEAR)
+
+    # 4 levels per channel; the square root makes cosine the Hellinger affinity
+    levels = np.asarray(small, dtype=np.uint8).reshape(-1, 3) >> 6
+    bins = levels[:, 0].astype(np.intp) * 16 + levels[:, 1] * 4 + levels[:, 2]
+    histogram = np.sqrt(np.bincount(bins, minlength=64).astype(np.float32) / len(bins))
+
+    layout = np.asarray(small.convert('L').resize((8, 8), Image.BILINEAR), dtype=np.float32).ravel()
+    layout -= layout.mean()
+
+    return _normalize(np.concatenate([
+        _normalize(histogram) * math.sqrt(HISTOGRAM_WEIGHT),
+        _normalize(layout) * math.sqrt(1 - HISTOGRAM_WEIGHT)
+    ])).astype(np.float32)
+
+
+class SimilarityIndex:
+    """Append-only, memory-mapped vector index with exact cosine top-k search"""
+
+    def __init__(self, directory, max_rows=2_000_000, compact_ratio=0.2, compact_min_rows=10_000):
+        self.directory = directory
+        self.max_rows = max_rows
+        self.compact_ratio = compact_ratio
+        self.compact_min_rows = compact_min_rows
+        os.makedirs(directory, exist_ok=True)
+        self._vectors_path = os.path.join(directory, VECTORS_FILE)
+        self._rows_path = os.path.join(directory, ROWS_FILE)
+
+        self._lock = threading.RLock()
+        self._compacting = threading.Lock()
+        self._lock_file = open(os.path.join(directory, LOCK_FILE), 'a+')
+        self.writable = self._try_lock()
+        with self._lock:
+            self._load()
+            if self.writable:
+                self._ingest_pending()
+        if self.writable:
+            self._maybe_compact()
+
+    def __len__(self):
+        """Rows in the files, including shadowed ones (see live_count)"""
+        return len(self._rows)
+
+    # --- public API ---
+    def add(self, digest, vector, style, suggestion):
+        """Append one row; returns 'indexed', or 'queued' when another process is the writer"""
+        record = {
+            'id': digest,
+            'style': style,
+            'fashion_suggestion': suggestion,
+            'indexed_at': datetime.utcnow().isoformat()
+        }
+        if not self.writable:
+            self._refresh()  # takes over if the writer went away
+            if not self.writable:
+                self._queue(record, vector)
+                return 'queued'
+        with self._lock:
+            self._ingest_pending()
+            self._write_row(record, vector)
+        self._maybe_compact()
+        return 'indexed'
+
+    def live_count(self):
+        """Searchable rows: neither shadowed by a re-indexed image nor dropped"""
+        self._refresh()
+        with self._lock:
+            return int(np.count_nonzero(self._live[:len(self._rows)]))
+
+    def search(self, queries, k=10):
+        """Top-k rows by cosine similarity for each query vector: a list of [(score, record)] per query"""
+        self._refresh()
+        with self._lock:
+            vectors, live, rows = self._vectors, self._live, self._rows
+            n = len(rows)
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        # Candidates are kept as (rows, queries) so each chunk product reads the mapped rows in order
+        best_scores = np.empty((0, len(queries)), dtype=np.float32)
+        best_rows = np.empty((0, len(queries)), dtype=np.intp)
+
+        for start in range(0, n, CHUNK_ROWS):
+            end = min(n, start + CHUNK_ROWS)
+            scores = vectors[start:end] @ queries.T
+            dead = ~live[start:end]
+            if dead.any():
+                scores[dead] = -np.inf
+            chunk_rows = np.broadcast_to(np.arange(start, end)[:, None], scores.shape)
+            best_scores = np.concatenate([best_scores, scores])
+            best_rows = np.concatenate([best_rows, chunk_rows])
+            if len(best_scores) > k:
+                top = np.argpartition(best_scores, len(best_scores) - k, axis=0)[-k:]
+                best_scores = np.take_along_axis(best_scores, top, axis=0)
+                best_rows = np.take_along_axis(best_rows, top, axis=0)
+
+        order = np.argsort(-best_scores, axis=0)
+        return [
+            [
+                (float(best_scores[i, q]), rows[best_rows[i, q]])
+                for i in order[:, q] if np.isfinite(best_scores[i, q])
+            ]
+            for q in range(len(queries))
+        ]
+
+    def compact(self):
+        """Rewrite the index with live rows only (newest `max_rows`), then swap it in"""
+        if not self.writable or not self._compacting.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                vectors, rows = self._vectors, self._rows
+                n = len(rows)
+                keep = np.flatnonzero(self._live[:n])[-self.max_rows:]
+            tmp_vectors, tmp_rows = f'{self._vectors_path}.tmp', f'{self._rows_path}.tmp'
+            out = np.memmap(tmp_vectors, dtype=np.float32, mode='w+', shape=(max(INITIAL_CAPACITY, 2 * len(keep)), DIM))
+            with open(tmp_rows, 'w', encoding='utf-8') as f:
+                for start in range(0, len(keep), CHUNK_ROWS):
+                    chunk = keep[start:start + CHUNK_ROWS]
+                    out[start:start + len(chunk)] = vectors[chunk]
+                    f.writelines(json.dumps(rows[row]) + '\n' for row in chunk)
+
+                with self._lock:
+                    # Rows appended while copying go to the end of the new files
+                    extra = list(range(n, len(self._rows)))
+                    if len(keep) + len(extra) > out.shape[0]:
+                        out.flush()
+                        del out
+                        with open(tmp_vectors, 'ab') as grow:
+                            grow.truncate(2 * (len(keep) + len(extra)) * DIM * 4)
+                        out = np.memmap(tmp_vectors, dtype=np.float32, mode='r+', shape=(2 * (len(keep) + len(extra)), DIM))
+                    out[len(keep):len(keep) + len(extra)] = self._vectors[extra]
+                    f.writelines(json.dumps(self._rows[row]) + '\n' for row in extra)
+                    out.flush()
+                    del out
+                    f.flush()
+                    os.fsync(f.fileno())
+                    kept_rows = [rows[row] for row in keep] + [self._rows[row] for row in extra]
+                    os.replace(tmp_vectors, self._vectors_path)
+                    os.replace(tmp_rows, self._rows_path)
+
+                    self._rows, self._by_digest = [], {}
+                    self._live = np.zeros(0, dtype=bool)
+                    for record in kept_rows:
+                        self._append_row(record)
+                    self._rows_offset, self._rows_inode = f.tell(), os.fstat(f.fileno()).st_ino
+                    self._map()
+            logger.info('Compacted similarity index: %s rows -> %s', n, len(self._rows))
+        finally:
+            self._compacting.release()
+
+    # --- internals ---
+    def _write_row(self, record, vector):
+        """Append one row to both files; writer only, lock held"""
+        row = len(self._rows)
+        if row >= self._capacity:
+            self._map(max(INITIAL_CAPACITY, 2 * self._capacity))
+        self._vectors[row] = vector
+        self._vectors.flush()
+        with open(self._rows_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+            self._rows_offset = f.tell()
+        self._append_row(record)
+
+    def _queue(self, record, vector):
+        """Append a row to this process's pending log for the writer to ingest"""
+        line = json.dumps({
+            'record': record,
+            'vector': base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode('ascii')
+        }) + '\n'
+        path = os.path.join(self.directory, f'{PENDING_PREFIX}{os.getpid()}{PENDING_SUFFIX}')
+        while True:
+            with open(path, 'a', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    current = os.stat(path).st_ino == os.fstat(f.fileno()).st_ino
+                except FileNotFoundError:
+                    current = False
+                if current:  # else the writer took the file between open and flock; reopen
+                    f.write(line)
+                    return
+
+    def _ingest_pending(self):
+        """Append the rows queued by read-only processes and return how many; writer only, lock held"""
+        names = os.listdir(self.directory)
+        # Logs left half-ingested by a previous writer first, then the live ones
+        paths = [os.path.join(self.directory, name) for name in names if name.endswith(INGESTING_SUFFIX)]
+        for name in names:
+            if name.startswith(PENDING_PREFIX) and name.endswith(PENDING_SUFFIX):
+                path = os.path.join(self.directory, name)
+                taken = path + INGESTING_SUFFIX
+                if taken in paths:
+                    continue  # picked up once the older log is done
+                try:
+                    os.replace(path, taken)
+                except FileNotFoundError:
+                    continue
+                paths.append(taken)
+
+        ingested = 0
+        for path in paths:
+            with open(path, 'rb') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)  # wait out an append in progress
+                lines = f.read().splitlines()
+            for line in lines:
+                try:
+                    item = json.loads(line)
+                    vector = np.frombuffer(base64.b64decode(item['vector']), dtype=np.float32)
+                    record = item['record']
+                except (ValueError, KeyError, TypeError):
+                    logger.warning('Skipping a malformed queued row in %s', path)
+                    continue
+                if vector.shape == (DIM,):
+                    self._write_row(record, vector)
+                    ingested += 1
+            os.remove(path)
+        if ingested:
+            logger.info('Ingested %s similarity rows queued by other workers', ingested)
+        return ingested
+
+    def _try_lock(self):
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _load(self):
+        """(Re)read all rows and map the vectors file; lock held"""
+        self._rows, self._by_digest = [], {}
+        self._live = np.zeros(0, dtype=bool)
+        self._rows_offset, self._rows_inode = 0, None
+        if os.path.exists(self._rows_path):
+            self._rows_inode = os.stat(self._rows_path).st_ino
+        self._map()
+        self._read_new_rows()
+
+    def _read_new_rows(self):
+        """Append rows written since the last read (complete lines only); lock held"""
+        if not os.path.exists(self._rows_path):
+            return
+        with open(self._rows_path, 'rb') as f:
+            f.seek(self._rows_offset)
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        self._rows_offset += len(complete)
+        lines = complete.splitlines()
+        if len(self._rows) + len(lines) > self._capacity:
+            self._map()
+        for line in lines:
+            self._append_row(json.loads(line))
+
+    def _append_row(self, record):
+        row = len(self._rows)
+        if row >= len(self._live):
+            live = np.zeros(max(INITIAL_CAPACITY, 2 * len(self._live)), dtype=bool)
+            live[:len(self._live)] = self._live
+            self._live = live
+        previous = self._by_digest.get(record['id'])
+        if previous is not None:
+            self._live[previous] = False  # shadowed by the re-indexed image
+        self._live[row] = True
+        self._by_digest[record['id']] = row
+        self._rows.append(record)
+
+    def _map(self, capacity=None):
+        """Map the vectors file, growing it to `capacity` rows first (writer only); lock held"""
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        if self.writable and capacity and capacity * DIM * 4 > size:
+            with open(self._vectors_path, 'ab') as f:
+                f.truncate(capacity * DIM * 4)
+            size = capacity * DIM * 4
+        self._capacity = size // (DIM * 4)
+        if self._capacity:
+            mode = 'r+' if self.writable else 'r'
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode=mode, shape=(self._capacity, DIM))
+        else:
+            self._vectors = np.zeros((0, DIM), dtype=np.float32)
+
+    def _refresh(self):
+        """Ingest rows queued by other processes (writer), or pick up rows or a compaction from the writer"""
+        if self.writable:
+            with self._lock:
+                ingested = self._ingest_pending()
+            if ingested:
+                self._maybe_compact()
+            return
+        with self._lock:
+            if self._try_lock():  # the writer went away; take over
+                self.writable = True
+                self._load()
+                self._ingest_pending()
+                return
+            try:
+                stat = os.stat(self._rows_path)
+            except FileNotFoundError:
+                return
+            if stat.st_ino != self._rows_inode:
+                self._load()
+            elif stat.st_size > self._rows_offset:
+                self._read_new_rows()
+
+    def _maybe_compact(self):
+        if self._compacting.locked():
+            return
+        n = len(self._rows)
+        dead = n - int(np.count_nonzero(self._live[:n]))
+        if n > self.max_rows * 1.1 or (dead >= self.compact_min_rows and dead > self.compact_ratio * n):
+            threading.Thread(target=self.compact, name='similarity-compact', daemon=True).start()
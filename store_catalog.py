@@ -0,0 +1,102 @@
+"""Local, versioned catalog of stores for the diagnostic shopping suggestions.
+
+data/store_catalog.json maps country -> store -> product category -> price
+band. It is loaded once into an in-memory index so that section C of the
+diagnostic can be filled from the categories the model recommends, instead
+of asking the model to name stores.
+"""
+import json
+import os
+import threading
+
+from schemas import PRODUCT_CATEGORIES
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'store_catalog.json')
+FALLBACK_COUNTRY = 'Global'
+
+
+class StoreCatalog:
+    """Category index over the store catalog, per country"""
+
+    def __init__(self, data):
+        self.version = data['version']
+        self.price_bands = data['price_bands']
+        # country (lower-cased) -> category -> [(store, price band)] in catalog order
+        self._index = {}
+        for country, stores in data['countries'].items():
+            by_category = self._index.setdefault(country.lower(), {})
+            for store, categories in stores.items():
+                for category, band in categories.items():
+                    if category not in PRODUCT_CATEGORIES:
+                        raise ValueError(f'Unknown category {category!r} for {store} ({country})')
+                    if band not in self.price_bands:
+                        raise ValueError(f'Unknown price band {band!r} for {store} ({country})')
+                    by_category.setdefault(category, []).append((store, band))
+
+    @classmethod
+    def load(cls, path=CATALOG_PATH):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def find_stores(self, country, categories, limit=5):
+        """Stores in `country` carrying the most of `categories` (earlier categories weigh more).
+
+        Unknown or empty countries use the global list, which also tops up
+        countries with fewer than `limit` matches or without a store for
+        one of the categories.
+        """
+        categories = [c for c in dict.fromkeys(categories) if c in PRODUCT_CATEGORIES]
+        matches = {}
+        for scope in (country.strip().lower(), FALLBACK_COUNTRY.lower()):
+            by_category = self._index.get(scope)
+            if not by_category:
+                continue
+            for rank, category in enumerate(categories):
+                for store, band in by_category.get(category, ()):
+                    if store in matches and matches[store]['scope'] != scope:
+                        continue
+                    entry = matches.setdefault(store, {'scope': scope, 'score': 0, 'categories': [], 'bands': []})
+                    entry['score'] += len(categories) - rank
+                    entry['categories'].append(category)
+                    entry['bands'].append(band)
+            covered = {c for entry in matches.values() for c in entry['categories']}
+            if len(matches) >= limit and covered.issuperset(categories):
+                break
+
+        local_first = sorted(
+            matches.items(),
+            key=lambda item: (item[1]['scope'] != country.strip().lower(), -item[1]['score'])
+        )
+        # One store per category first (in priority order) so every category is covered
+        picked = []
+        for category in categories:
+            for store, entry in local_first:
+                if category in entry['categories'] and store not in picked:
+                    picked.append(store)
+                    break
+        picked += [store for store, _ in local_first if store not in picked]
+
+        return [
+            {
+                'store_name': store,
+                'product_type': ', '.join(c.replace('_', ' ').capitalize() for c in matches[store]['categories']),
+                'price_range': ' – '.join(
+                    self.price_bands[b] for b in sorted(set(matches[store]['bands']), key=list(self.price_bands).index)
+                )
+            }
+            for store in picked[:limit]
+        ]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """The process-wide catalog, loaded on first use"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = StoreCatalog.load()
+    return _catalog
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+from artifact_store import ArtifactStore
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    def make(**budgets):
+        options = dict(session_budget=100, global_budget=250, disk_budget=100, spill_threshold=50)
+        options.update(budgets)
+        return ArtifactStore(spill_dir=str(tmp_path), **options)
+    return make
+
+
+def test_session_budget_evicts_least_recently_used(make_store):
+    store = make_store()
+    store.put('a', 'one', b'1' * 40)
+    store.put('a', 'two', b'2' * 40)
+    store.get('a', 'one')  # 'two' is now least recently used
+    store.put('a', 'three', b'3' * 40)
+    assert store.get('a', 'two') is None
+    assert store.get('a', 'one') == b'1' * 40
+    assert store.get('a', 'three') == b'3' * 40
+    assert store.evictions == 1
+
+
+def test_session_budget_leaves_other_sessions_alone(make_store):
+    store = make_store()
+    store.put('b', 'kept', b'b' * 40)
+    for i in range(4):
+        store.put('a', i, b'a' * 40)
+    assert store.get('b', 'kept') == b'b' * 40
+    assert store.stats('a')['session']['memory_bytes'] <= 100
+
+
+def test_global_budget_spans_sessions(make_store):
+    store = make_store()
+    for session in 'abcd':
+        store.put(session, 'blob', b'x' * 45)
+        store.put(session, 'more', b'y' * 45)
+    assert store.memory_bytes <= 250
+    assert store.get('a', 'blob') is None
+    assert store.get('d', 'more') == b'y' * 45
+
+
+def test_large_blobs_spill_to_disk_within_budget(make_store, tmp_path):
+    store = make_store()
+    store.put('a', 'big', b'1' * 60)
+    assert store.memory_bytes == 0
+    assert store.stats()['disk_files'] == 1
+    assert store.get('a', 'big') == b'1' * 60
+
+    store.put('a', 'bigger', b'2' * 60)  # 120 bytes on disk: the older file goes
+    assert store.get('a', 'big') is None
+    assert store.get('a', 'bigger') == b'2' * 60
+    assert store.stats()['disk_bytes'] == 60
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_identical_blobs_share_one_file(make_store, tmp_path):
+    store = make_store()
+    store.put('a', 'upload', b'z' * 60)
+    store.put('b', 'upload', b'z' * 60)
+    assert len(os.listdir(tmp_path)) == 1
+    store.drop_session('a')
+    assert store.get('b', 'upload') == b'z' * 60
+    store.drop_session('b')
+    assert os.listdir(tmp_path) == []
+
+
+
+def test_spilled_blobs_are_read_without_the_lock(make_store, monkeypatch):
+    store = make_store()
+    store.put('a', 'big', b'1' * 60)
+
+    def unlocked_open(*args, **kwargs):
+        assert not store._lock.locked()
+        return open(*args, **kwargs)
+
+    monkeypatch.setattr('artifact_store.open', unlocked_open, raising=False)
+    assert store.get('a', 'big') == b'1' * 60
+    assert store.hits == 1
+
+
+def test_missing_spill_file_reads_as_a_miss(make_store, tmp_path):
+    store = make_store()
+    store.put('a', 'big', b'1' * 60)
+    for name in os.listdir(tmp_path):
+        os.remove(tmp_path / name)
+    assert store.get('a', 'big') is None
+    assert store.misses == 1
+    assert store.stats()['entries'] == 0
+    assert store.stats()['disk_files'] == 0
+
+def test_objects_are_stored_unpickled(make_store):
+    store = make_store()
+    result = {'theme': 'Soft Tailoring'}
+    store.put('a', 'result', result)
+    assert store.get('a', 'result') is result
+    assert store.get('a', 'missing', 'default') == 'default'
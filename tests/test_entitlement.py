@@ -0,0 +1,81 @@
+import base64
+import json
+
+import pytest
+
+import entitlement
+from entitlement import issue_token, token_matches_email, verify_token
+
+SECRET = 'test-secret'
+
+
+def forge(claims, secret=SECRET):
+    payload = entitlement._b64encode(json.dumps(claims).encode('utf-8'))
+    return f'{payload}.{entitlement._sign(payload, secret)}'
+
+
+def test_round_trip_normalizes_the_email():
+    claims = verify_token(issue_token(' Ana@Example.com ', SECRET, ttl=60), SECRET)
+    assert claims['email'] == 'ana@example.com'
+    assert claims['tier'] == 'premium'
+
+
+def test_wrong_secret_is_rejected():
+    assert verify_token(issue_token('ana@example.com', SECRET), 'other-secret') is None
+    assert verify_token(issue_token('ana@example.com', SECRET), '') is None
+
+
+def test_tampered_payload_is_rejected():
+    token = issue_token('ana@example.com', SECRET)
+    payload, signature = token.split('.')
+    claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    claims['email'] = 'mallory@example.com'
+    forged = entitlement._b64encode(json.dumps(claims).encode('utf-8'))
+    assert verify_token(f'{forged}.{signature}', SECRET) is None
+
+
+def test_tampered_signature_is_rejected():
+    token = issue_token('ana@example.com', SECRET)
+    flipped = token[:-1] + ('A' if token[-1] != 'A' else 'B')
+    assert verify_token(flipped, SECRET) is None
+
+
+def test_expired_token_is_rejected(monkeypatch):
+    token = issue_token('ana@example.com', SECRET, ttl=60)
+    now = entitlement.time.time()
+    monkeypatch.setattr(entitlement.time, 'time', lambda: now + 61)
+    assert verify_token(token, SECRET) is None
+
+
+@pytest.mark.parametrize('token', [
+    None,
+    '',
+    'no-dot',
+    'a.b.c',
+    '.',
+    'ünïcode.sïgnature',
+])
+def test_malformed_tokens_are_rejected(token):
+    assert verify_token(token, SECRET) is None
+
+
+@pytest.mark.parametrize('claims', [
+    ['ana@example.com'],
+    'premium',
+    {'email': 'ana@example.com'},  # no expiry
+])
+def test_signed_but_unusable_claims_are_rejected(claims):
+    assert verify_token(forge(claims), SECRET) is None
+
+
+def test_signed_garbage_payload_is_rejected():
+    payload = entitlement._b64encode(b'\xff\xfenot json')
+    assert verify_token(f'{payload}.{entitlement._sign(payload, SECRET)}', SECRET) is None
+
+
+def test_token_is_bound_to_its_email():
+    claims = verify_token(issue_token('ana@example.com', SECRET), SECRET)
+    assert token_matches_email(claims, ' ANA@example.com')
+    assert not token_matches_email(claims, 'bob@example.com')
+    assert not token_matches_email(claims, '')
+    assert not token_matches_email(claims, 'ána@example.com')
@@ -0,0 +1,93 @@
+import io
+import struct
+import zlib
+
+import pytest
+from PIL import Image
+
+from image_header import InvalidImage, read_image_info, validate_image
+
+
+def encoded(fmt, size=(200, 300)):
+    out = io.BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(out, fmt)
+    return out.getvalue()
+
+
+def png_header(width, height):
+    """A PNG whose IHDR claims `width` x `height`, with no pixel data behind it"""
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    crc = zlib.crc32(b'IHDR' + ihdr)
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I4s', 13, b'IHDR') + ihdr + struct.pack('>I', crc)
+
+
+def jpeg_header(width, height, app_segments=()):
+    """A JPEG start-of-frame behind the given APPn payloads, with no scan data"""
+    out = b'\xff\xd8'
+    for payload in app_segments:
+        out += b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+    return out + b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+
+
+def reason(data):
+    with pytest.raises(InvalidImage) as excinfo:
+        validate_image(io.BytesIO(data))
+    return excinfo.value.reason
+
+
+@pytest.mark.parametrize('fmt, mimetype', [('PNG', 'image/png'), ('JPEG', 'image/jpeg')])
+def test_reads_real_images(fmt, mimetype):
+    info = validate_image(io.BytesIO(encoded(fmt)))
+    assert (info.mimetype, info.width, info.height) == (mimetype, 200, 300)
+
+
+def test_skips_large_metadata_and_rewinds():
+    stream = io.BytesIO(jpeg_header(640, 480, [b'Exif' + b'\0' * 60_000, b'ICC' * 1000]))
+    stream.seek(0)
+    info = read_image_info(stream)
+    assert (info.width, info.height) == (640, 480)
+    assert stream.tell() == 0
+
+
+def test_jpeg_fill_bytes_before_marker():
+    data = jpeg_header(640, 480)
+    assert validate_image(io.BytesIO(data[:2] + b'\xff\xff' + data[2:])).width == 640
+
+
+def test_rejects_non_images():
+    assert reason(b'%PDF-1.7\n' + b'0' * 100) == 'format'
+    assert reason(b'') == 'format'
+
+
+@pytest.mark.parametrize('data', [
+    png_header(640, 480)[:20],
+    jpeg_header(640, 480)[:-7],
+    encoded('JPEG')[:4],
+])
+def test_rejects_truncated_headers(data):
+    assert reason(data) == 'truncated'
+
+
+def test_rejects_corrupt_headers():
+    png = png_header(640, 480)
+    assert reason(png[:12] + b'IDAT' + png[16:]) == 'corrupt'
+    assert reason(b'\xff\xd8\x00\x00' + b'\0' * 20) == 'corrupt'
+    assert reason(b'\xff\xd8\xff\xe1\x00\x01' + b'\0' * 20) == 'corrupt'  # length below 2
+    assert reason(b'\xff\xd8\xff\xda\x00\x02') == 'corrupt'  # scan data before any frame
+    assert reason(png_header(0, 480)) == 'corrupt'
+
+
+def test_rejects_endless_segments():
+    assert reason(b'\xff\xd8' + b'\xff\xfe\x00\x02' * 1000) == 'corrupt'
+
+
+def test_rejects_decompression_bombs():
+    # A few dozen bytes that would decode to gigabytes
+    assert reason(png_header(100_000, 100_000)) == 'too_many_pixels'
+    assert reason(jpeg_header(60_000, 60_000)) == 'too_many_pixels'
+
+
+def test_enforces_shape_limits():
+    assert reason(png_header(32, 480)) == 'too_small'
+    assert reason(png_header(4000, 500)) == 'aspect_ratio'
+    assert validate_image(io.BytesIO(png_header(2000, 500))).width == 2000
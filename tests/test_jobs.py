@@ -0,0 +1,108 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'jobs' / 'jobs.sqlite3')
+
+
+def test_long_poll_waits_for_the_result(executor, clock, db_path):
+    store = JobStore(executor, db_path, timer=clock)
+    release = threading.Event()
+    job = store.submit('upload', lambda: release.wait(5) and {'style': 'casual'})
+
+    polled = store.wait(job.id, 0.05)  # a poll that times out still sees the job running
+    assert polled.status in (QUEUED, RUNNING)
+    assert 'result' not in polled.as_dict()
+
+    release.set()
+    data = store.wait(job.id, 5).as_dict()
+    assert data['status'] == SUCCEEDED
+    assert data['result'] == {'style': 'casual'}
+    assert data['finished_at'] is not None
+
+
+def test_failed_jobs_keep_the_error_record(executor, clock, db_path):
+    def fail():
+        raise RuntimeError('model down')
+
+    error = {'error': 'AI service unavailable', 'code': 'ai_error'}
+    store = JobStore(executor, db_path, on_error=lambda e: error, timer=clock)
+    job = store.submit('roast', fail)
+    data = store.wait(job.id, 5).as_dict()
+    assert data['status'] == FAILED
+    assert data['error'] == error
+    assert 'result' not in data
+
+
+def test_other_workers_see_and_poll_the_job(executor, clock, db_path):
+    store = JobStore(executor, db_path, timer=clock)
+    other = JobStore(ThreadPoolExecutor(max_workers=1), db_path, timer=clock)
+    release = threading.Event()
+    job = store.submit('upload', lambda: release.wait(5) and {'style': 'boho'})
+
+    assert other.wait(job.id, 0.05).status in (QUEUED, RUNNING)
+    threading.Timer(0.1, release.set).start()
+    data = other.wait(job.id, 5).as_dict()
+    assert data['status'] == SUCCEEDED
+    assert data['result'] == {'style': 'boho'}
+    assert other.get('missing') is None
+
+
+def test_results_expire_ttl_after_the_job_finishes(executor, clock, db_path):
+    store = JobStore(executor, db_path, ttl=60, timer=clock)
+    release = threading.Event()
+    job = store.submit('upload', release.wait)
+
+    clock.now = 50  # a slow job must not expire while running...
+    release.set()
+    assert store.wait(job.id, 5).status == SUCCEEDED
+    clock.now = 100  # ...because finishing restarts the TTL
+    assert store.get(job.id).status == SUCCEEDED
+    clock.now = 111
+    assert store.get(job.id) is None
+
+
+def test_unfinished_jobs_expire_too(executor, clock, db_path):
+    store = JobStore(executor, db_path, ttl=60, timer=clock)
+    release = threading.Event()
+    job = store.submit('upload', release.wait)
+    clock.now = 61
+    assert store.get(job.id) is None
+    assert store.wait(job.id, 5) is None
+    release.set()
+
+
+def test_store_is_bounded(executor, clock, db_path):
+    store = JobStore(executor, db_path, maxsize=3, timer=clock)
+    jobs = []
+    for _ in range(5):
+        clock.now += 1
+        job = store.submit('upload', lambda: None)
+        assert store.wait(job.id, 5).status == SUCCEEDED
+        jobs.append(job)
+    assert [store.get(job.id) is not None for job in jobs] == [False, False, True, True, True]
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from schemas import JsonFieldStream
+
+DOCUMENT = json.dumps({
+    'first_impression': 'Bold "statement" look, {braces} and all \\u00e9',
+    'hot_takes': [{'emoji': '🔥', 'text': 'Loud, in [a good] way'}, {'emoji': '👟', 'text': 'Shoes: 10/10'}],
+    'nested': [[1, [2, 3]], []],
+    'rating': 123,
+    'score': -1.5e3,
+    'verdict': True,
+    'note': None,
+}, ensure_ascii=False)
+
+
+def feed_in_chunks(text, size):
+    stream = JsonFieldStream()
+    fields = []
+    for start in range(0, len(text), size):
+        fields.extend(stream.feed(text[start:start + size]))
+    return fields
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 64, 10_000])
+def test_any_chunking_yields_every_field_once_in_order(size):
+    assert feed_in_chunks(DOCUMENT, size) == list(json.loads(DOCUMENT).items())
+
+
+def test_number_is_held_until_its_delimiter():
+    stream = JsonFieldStream()
+    assert stream.feed('{"rating": 1') == []
+    assert stream.feed('2') == []
+    assert stream.feed('3}') == [('rating', 123)]
+
+
+@pytest.mark.parametrize('pieces, value', [
+    (['{"score": 1.', '5}'], 1.5),
+    (['{"score": 2e', '3}'], 2000.0),
+    (['{"score": -', '4}'], -4),
+    (['{"score": 1.5E', '-', '1}'], 0.15),
+])
+def test_number_split_inside_its_fraction_or_exponent(pieces, value):
+    stream = JsonFieldStream()
+    fields = []
+    for piece in pieces:
+        fields.extend(stream.feed(piece))
+    assert fields == [('score', value)]
+
+
+def test_string_split_inside_an_escape():
+    stream = JsonFieldStream()
+    assert stream.feed('{"a": "say \\') == []
+    assert stream.feed('"hi\\') == []
+    assert stream.feed('" \\u00') == []
+    assert stream.feed('e9", "b": 1}') == [('a', 'say "hi" é'), ('b', 1)]
+
+
+def test_nested_array_is_reported_once_closed():
+    stream = JsonFieldStream()
+    assert stream.feed('{"picks": [["a", "b"], [') == []
+    assert stream.feed('"c"]') == []
+    assert stream.feed(']') == []  # the closing brace or comma may still be on its way
+    assert stream.feed(' }') == [('picks', [['a', 'b'], ['c']])]
+
+
+def test_key_split_across_chunks_and_leading_whitespace():
+    stream = JsonFieldStream()
+    assert stream.feed('  \n{ "fir') == []
+    assert stream.feed('st"  :  "x" ,') == [('first', 'x')]
+    assert stream.feed('"second":"y"}') == [('second', 'y')]
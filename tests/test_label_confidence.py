@@ -0,0 +1,46 @@
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from schemas import label_confidence
+
+
+def logprobs(*tokens):
+    """Fake completion logprobs: (token, probability) pairs"""
+    return SimpleNamespace(content=[
+        SimpleNamespace(token=token, logprob=math.log(p)) for token, p in tokens
+    ])
+
+
+def test_label_tokens_between_the_quotes():
+    answer = logprobs(('{"', 1.0), ('style', 1.0), ('":"', 1.0), ('south', 0.9), ('_asian', 0.8), ('"}', 1.0))
+    assert label_confidence(answer, 'south_asian') == pytest.approx(0.72)
+
+
+def test_tokens_straddling_the_opening_quote_count():
+    answer = logprobs(('{"style', 1.0), ('":"west', 0.6), ('ern', 0.9), ('"}', 0.5))
+    assert label_confidence(answer, 'western') == pytest.approx(0.54)
+
+
+def test_tokens_straddling_the_closing_quote_count():
+    answer = logprobs(('{"style":"', 0.2), ('western"', 0.7), ('}', 0.1))
+    assert label_confidence(answer, 'western') == pytest.approx(0.7)
+
+
+def test_one_token_spanning_the_whole_value():
+    answer = logprobs(('{"style":', 1.0), ('"african"}', 0.4))
+    assert label_confidence(answer, 'african') == pytest.approx(0.4)
+
+
+def test_label_must_be_a_whole_quoted_string():
+    answer = logprobs(('{"style":"', 1.0), ('east', 0.9), ('_asian', 0.9), ('"}', 1.0))
+    assert label_confidence(answer, 'east_asian') == pytest.approx(0.81)
+    assert label_confidence(answer, 'asian') == 0.0
+    assert label_confidence(answer, 'western') == 0.0
+
+
+def test_missing_logprobs_mean_full_confidence():
+    assert label_confidence(None, 'western') == 1.0
+    assert label_confidence(SimpleNamespace(content=None), 'western') == 1.0
+    assert label_confidence(SimpleNamespace(content=[]), 'western') == 1.0
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import PriorityScheduler, QueueTimeout, Tier
+
+
+def wait_until(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+def queued(scheduler, tier):
+    return scheduler.stats()['tiers'][tier]['queued']
+
+
+def test_stride_shares_slots_by_weight():
+    scheduler = PriorityScheduler(1, [Tier('premium', 3, 20), Tier('free', 1, 20), Tier('setup', 1, 1)])
+    scheduler.acquire('setup')  # hold the only slot while both queues fill up
+    order = []
+
+    def call(tier):
+        scheduler.acquire(tier)
+        order.append(tier)  # still holding the slot, so appends follow grant order
+        scheduler.release(tier)
+
+    threads = []
+    for tier in ('free', 'premium'):
+        for _ in range(12):
+            thread = threading.Thread(target=call, args=(tier,))
+            thread.start()
+            threads.append(thread)
+        wait_until(lambda: queued(scheduler, tier) == 12)
+
+    scheduler.release('setup')
+    for thread in threads:
+        thread.join(2)
+    assert len(order) == 24
+    first = order[:8]
+    assert first.count('premium') == 6
+    assert first.count('free') == 2  # outweighed, never starved
+    assert scheduler.stats()['in_flight'] == 0
+
+
+def test_tier_cap_keeps_slots_in_reserve():
+    scheduler = PriorityScheduler(2, [Tier('premium', 3, 2), Tier('free', 1, 1, max_wait=0.05)])
+    scheduler.acquire('free')
+    with pytest.raises(QueueTimeout):
+        scheduler.acquire('free')
+    scheduler.acquire('premium')  # the reserved slot is still free
+    assert scheduler.stats()['in_flight'] == 2
+
+
+def test_queue_timeout_withdraws_the_waiter():
+    scheduler = PriorityScheduler(1, [Tier('premium', 3, 1), Tier('free', 1, 1, max_wait=0.05)])
+    scheduler.acquire('premium')
+    start = time.monotonic()
+    with pytest.raises(QueueTimeout):
+        scheduler.acquire('free')
+    assert time.monotonic() - start >= 0.05
+    assert queued(scheduler, 'free') == 0
+
+    # The timed-out call must not be granted the slot it gave up on
+    scheduler.release('premium')
+    assert scheduler.stats()['in_flight'] == 0
+    scheduler.acquire('free')
+    assert scheduler.stats()['tiers']['free']['in_flight'] == 1
+
+
+def test_waiter_is_granted_on_release():
+    scheduler = PriorityScheduler(1, [Tier('free', 1, 1, max_wait=2)])
+    scheduler.acquire('free')
+    granted = threading.Event()
+
+    def call():
+        scheduler.acquire('free')
+        granted.set()
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    wait_until(lambda: queued(scheduler, 'free') == 1)
+    assert not granted.is_set()
+    scheduler.release('free')
+    thread.join(2)
+    assert granted.is_set()
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+import similarity
+from similarity import DIM, SimilarityIndex
+
+
+class InlineThread:
+    """Runs background compaction in the calling thread, so tests see its result"""
+
+    def __init__(self, target, **kwargs):
+        self.target = target
+
+    def start(self):
+        self.target()
+
+
+@pytest.fixture(autouse=True)
+def inline_compaction(monkeypatch):
+    monkeypatch.setattr(similarity.threading, 'Thread', InlineThread)
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(7)
+    rows = rng.standard_normal((20, DIM)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def make_index(directory, **options):
+    options.setdefault('compact_min_rows', 1_000_000)
+    return SimilarityIndex(str(directory), **options)
+
+
+def top_ids(index, vector, k=1):
+    return [record['id'] for _score, record in index.search([vector], k)[0]]
+
+
+def test_first_process_becomes_the_writer(tmp_path, vectors):
+    writer = make_index(tmp_path)
+    reader = make_index(tmp_path)
+    assert writer.writable and not reader.writable
+
+    assert writer.add('a', vectors[0], 'casual', 'Linen shirt') == 'indexed'
+    assert top_ids(reader, vectors[0]) == ['a']  # picked up on the next search
+
+
+def test_reader_adds_are_queued_for_the_writer(tmp_path, vectors):
+    writer = make_index(tmp_path)
+    reader = make_index(tmp_path)
+
+    assert reader.add('b', vectors[1], 'formal', 'Tuxedo') == 'queued'
+    assert reader.live_count() == 0
+    assert writer.live_count() == 1  # ingested by the writer
+    assert top_ids(writer, vectors[1]) == ['b']
+    assert top_ids(reader, vectors[1]) == ['b']
+    assert not list(tmp_path.glob('pending-*'))
+
+
+def test_reader_takes_over_when_the_writer_goes_away(tmp_path, vectors):
+    writer = make_index(tmp_path)
+    reader = make_index(tmp_path)
+    reader.add('a', vectors[0], 'casual', 'Linen shirt')
+    writer._lock_file.close()  # releases the flock, as when the process exits
+
+    assert reader.add('b', vectors[1], 'casual', 'Chinos') == 'indexed'
+    assert reader.writable
+    assert reader.live_count() == 2
+
+
+def test_reindexed_images_shadow_older_rows(tmp_path, vectors):
+    index = make_index(tmp_path)
+    index.add('a', vectors[0], 'casual', 'old')
+    index.add('b', vectors[1], 'casual', 'other')
+    index.add('a', vectors[0], 'casual', 'new')
+    assert len(index) == 3
+    assert index.live_count() == 2
+    results = index.search([vectors[0]], 5)[0]
+    assert [record['fashion_suggestion'] for _score, record in results].count('new') == 1
+    assert 'old' not in [record['fashion_suggestion'] for _score, record in results]
+
+
+def test_compaction_drops_shadowed_and_oldest_rows(tmp_path, vectors):
+    index = make_index(tmp_path, max_rows=6)
+    reader = make_index(tmp_path, max_rows=6)
+    for i in range(5):
+        index.add(f'img{i}', vectors[i], 'casual', f'look {i}')
+    index.add('img4', vectors[4], 'casual', 'look 4 again')
+    assert len(index) == 6
+
+    index.compact()
+    assert len(index) == index.live_count() == 5
+    assert top_ids(index, vectors[4]) == ['img4']
+
+    # Going past max_rows compacts on its own and drops the oldest rows
+    index.add('img5', vectors[5], 'casual', 'look 5')
+    index.add('img6', vectors[6], 'casual', 'look 6')
+    assert len(index) == index.live_count() == 6
+    assert 'img0' not in top_ids(index, vectors[0], k=6)
+
+    # Readers swap to the rewritten files
+    assert reader.live_count() == 6
+    assert top_ids(reader, vectors[6]) == ['img6']
+    assert top_ids(reader, vectors[1]) == ['img1']
+
+
+def test_compaction_starts_once_enough_rows_are_dead(tmp_path, vectors):
+    index = make_index(tmp_path, compact_min_rows=3, compact_ratio=0.2)
+    for i in range(3):
+        index.add('same', vectors[i], 'casual', f'take {i}')
+    assert len(index) == 3
+    index.add('same', vectors[3], 'casual', 'take 3')  # 3 dead rows out of 4
+    assert len(index) == index.live_count() == 1
+    assert top_ids(index, vectors[3]) == ['same']
@@ -0,0 +1,63 @@
+import pytest
+
+from store_catalog import StoreCatalog, get_catalog
+
+BANDS = {'budget': '$', 'mid': '$$', 'premium': '$$$'}
+
+
+def catalog(countries):
+    return StoreCatalog({'version': 'test', 'price_bands': BANDS, 'countries': countries})
+
+
+LOCAL = {
+    'Shoe Hut': {'shoes': 'budget'},
+    'Shoe Palace': {'shoes': 'mid'},
+    'Sole Mates': {'shoes': 'premium'},
+    'Gem Box': {'jewelry': 'mid'},
+    'Gold Leaf': {'jewelry': 'premium'},
+    'Both Ways': {'shoes': 'mid', 'jewelry': 'mid'},
+}
+GLOBAL = {
+    'World Shoes': {'shoes': 'mid'},
+    'Saree House': {'ethnic_wear': 'mid'},
+}
+
+
+def names(stores):
+    return [store['store_name'] for store in stores]
+
+
+def test_global_pass_covers_categories_the_country_lacks():
+    stores = catalog({'Local': LOCAL, 'Global': GLOBAL}).find_stores('Local', ['shoes', 'jewelry', 'ethnic_wear'])
+    assert len(stores) == 5
+    assert 'Saree House' in names(stores)
+    assert 'World Shoes' not in names(stores)  # local stores come first for covered categories
+
+
+def test_country_that_covers_everything_stays_local():
+    stores = catalog({'Local': LOCAL, 'Global': GLOBAL}).find_stores('Local', ['shoes', 'jewelry'])
+    assert names(stores)[0] == 'Both Ways'  # carries both categories
+    assert not {'World Shoes', 'Saree House'} & set(names(stores))
+
+
+def test_unknown_country_uses_the_global_list():
+    stores = catalog({'Local': LOCAL, 'Global': GLOBAL}).find_stores('Atlantis', ['ethnic_wear', 'shoes'])
+    assert names(stores) == ['Saree House', 'World Shoes']
+
+
+def test_describes_categories_and_price_bands():
+    (store,) = catalog({'Global': {'Both Ways': {'shoes': 'premium', 'jewelry': 'budget'}}}).find_stores(
+        '', ['jewelry', 'shoes', 'not_a_category'])
+    assert store == {'store_name': 'Both Ways', 'product_type': 'Jewelry, Shoes', 'price_range': '$ – $$$'}
+
+
+def test_rejects_unknown_categories_and_bands():
+    with pytest.raises(ValueError):
+        catalog({'Global': {'Odd': {'hats': 'mid'}}})
+    with pytest.raises(ValueError):
+        catalog({'Global': {'Odd': {'shoes': 'luxury'}}})
+
+
+def test_shipped_catalog_covers_ethnic_wear_everywhere():
+    stores = get_catalog().find_stores('UK', ['shoes', 'jewelry', 'ethnic_wear'])
+    assert any('Ethnic wear' in store['product_type'] for store in stores)
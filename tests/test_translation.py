@@ -0,0 +1,40 @@
+import translation
+from schemas import parse_result, to_markdown
+from translation import translate_result, translation_key
+
+SUGGESTION = {
+    'theme': 'Soft Tailoring',
+    'vibe': 'Relaxed',
+    'top': 'Linen shirt',
+    'bottom': 'Pleated trousers',
+    'shoes': 'Loafers',
+    'accessories': ['Tote bag'],
+    'fit_hack': 'Tuck the front only',
+    'styling_tips': ['Roll the sleeves'],
+}
+
+
+def fake_translate_lines(lines, target_lang):
+    return [f'[{target_lang}] {line}' for line in lines]
+
+
+def test_translation_key_hashes_structured_results():
+    key = translation_key(SUGGESTION, 'fr')
+    assert key.startswith('translation/fr/')
+    assert key == translation_key(dict(reversed(list(SUGGESTION.items()))), 'fr')
+    assert key != translation_key(dict(SUGGESTION, vibe='Bold'), 'fr')
+    assert key != translation_key(SUGGESTION, 'de')
+
+
+def test_renders_translated_suggestion(monkeypatch):
+    monkeypatch.setattr(translation, 'translate_lines', fake_translate_lines)
+    markdown = to_markdown(translate_result(parse_result('suggestion', SUGGESTION), 'fr'))
+    assert '[fr] Linen shirt' in markdown
+    assert '- [fr] Tote bag' in markdown
+    assert '- [fr] Roll the sleeves' in markdown
+
+
+def test_english_is_not_translated(monkeypatch):
+    monkeypatch.setattr(translation, 'translate_lines', None)
+    suggestion = parse_result('suggestion', SUGGESTION)
+    assert translate_result(suggestion, 'en') is suggestion
@@ -0,0 +1,64 @@
+"""Post-hoc translation of structured results, shared by the frontend and backend.
+
+Only prose fields are translated (see schemas.VERBATIM_FIELDS), so a
+translated result keeps the shape the UI renders from. Travel and trends are
+normally written natively in the target language (see NATIVE_LANGUAGES in
+app.py); this is the fallback for languages the model handles poorly and
+for the features that are still generated in English.
+"""
+import hashlib
+import json
+
+from schemas import iter_strings, map_strings
+
+# How each language offered in the frontend is named in prompts
+LANGUAGE_NAMES = {
+    'en': 'English',
+    'fr': 'French',
+    'de': 'German',
+    'pt': 'Portuguese',
+    'ur': 'Roman Urdu (Urdu written in the Latin alphabet)',
+}
+
+
+def translate_lines(lines, target_lang):
+    """Translate short strings in as few requests as possible, one string per line"""
+    from deep_translator import GoogleTranslator
+
+    translator = GoogleTranslator(source='auto', target=target_lang)
+    translated, batch = [], []
+
+    def flush():
+        if not batch:
+            return
+        out = translator.translate('\n'.join(batch)).split('\n')
+        if len(out) != len(batch):  # lines were merged or split; fall back to one by one
+            out = [translator.translate(line) for line in batch]
+        translated.extend(out)
+        batch.clear()
+
+    size = 0
+    for line in lines:
+        line = line.replace('\n', ' ')
+        if batch and size + len(line) > 4500:
+            flush()
+            size = 0
+        batch.append(line)
+        size += len(line) + 1
+    flush()
+    return translated
+
+
+def translation_key(raw, target_lang):
+    """Cache key for the translation of a raw (JSON-like) result into `target_lang`"""
+    digest = hashlib.sha256(json.dumps(raw, sort_keys=True).encode()).hexdigest()[:16]
+    return f'translation/{target_lang}/{digest}'
+
+
+def translate_result(result, target_lang):
+    """Translate every prose field of a typed result, keeping its structure intact"""
+    if target_lang == 'en':
+        return result
+    texts = [text for text in dict.fromkeys(iter_strings(result)) if text.strip()]
+    lookup = dict(zip(texts, translate_lines(texts, target_lang)))
+    return map_strings(result, lambda text: lookup.get(text, text))
@@ -0,0 +1,136 @@
+"""OpenAI token and cost accounting.
+
+Every completion's ``usage`` block is recorded here, aggregated by endpoint,
+feature (the prompt name from prompts.py) and model, and priced with a
+per-model table. Totals are also exported as Prometheus counters; the
+/usage endpoint serves summary().
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from metrics import OPENAI_COST, OPENAI_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# USD per 1M tokens. Override or extend with OPENAI_PRICES, a JSON object
+# in the same shape (or a path to a JSON file holding one).
+DEFAULT_PRICES = {
+    'gpt-4o': {'input': 2.50, 'cached_input': 1.25, 'output': 10.00},
+    'gpt-4o-mini': {'input': 0.15, 'cached_input': 0.075, 'output': 0.60},
+}
+
+TOKEN_KINDS = ('prompt_tokens', 'cached_tokens', 'completion_tokens')
+
+
+def load_prices(value=None):
+    """The default price table updated with OPENAI_PRICES (inline JSON or a file path)"""
+    prices = {model: dict(rates) for model, rates in DEFAULT_PRICES.items()}
+    value = os.getenv('OPENAI_PRICES', '') if value is None else value
+    if not value.strip():
+        return prices
+    try:
+        if value.lstrip().startswith('{'):
+            overrides = json.loads(value)
+        else:
+            with open(value, encoding='utf-8') as f:
+                overrides = json.load(f)
+        for model, rates in overrides.items():
+            prices.setdefault(model, {}).update({kind: float(rate) for kind, rate in rates.items()})
+    except (OSError, ValueError, AttributeError, TypeError) as e:
+        logger.error('Ignoring invalid OPENAI_PRICES: %s', e)
+    return prices
+
+
+def usage_counts(usage):
+    """Token counts from an OpenAI usage object (cached tokens are part of prompt tokens)"""
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'cached_tokens': (getattr(details, 'cached_tokens', 0) or 0) if details else 0,
+        'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+    }
+
+
+class UsageLedger:
+    """Thread-safe running totals of tokens and estimated cost"""
+
+    def __init__(self, prices=None):
+        self._prices = prices
+        self.since = datetime.utcnow().isoformat()
+        self._totals = {}  # (endpoint, feature, model) -> counts
+        self._lock = threading.Lock()
+
+    @property
+    def prices(self):
+        # Read on first use so OPENAI_PRICES from a .env file is picked up
+        if self._prices is None:
+            self._prices = load_prices()
+        return self._prices
+
+    def price_for(self, model):
+        """Rates for `model`, matching dated snapshots such as gpt-4o-2024-08-06 to their base name"""
+        if model in self.prices:
+            return self.prices[model]
+        matches = [name for name in self.prices if model.startswith(name + '-')]
+        return self.prices[max(matches, key=len)] if matches else None
+
+    def cost(self, model, counts):
+        rates = self.price_for(model)
+        if rates is None:
+            return 0.0
+        uncached = counts['prompt_tokens'] - counts['cached_tokens']
+        return (
+            uncached * rates.get('input', 0)
+            + counts['cached_tokens'] * rates.get('cached_input', rates.get('input', 0))
+            + counts['completion_tokens'] * rates.get('output', 0)
+        ) / 1_000_000
+
+    def record(self, endpoint, feature, model, usage):
+        """Add one completion's usage; returns its estimated cost in USD"""
+        if usage is None:
+            return 0.0
+        counts = usage_counts(usage)
+        cost = self.cost(model, counts)
+
+        with self._lock:
+            totals = self._totals.setdefault((endpoint, feature, model), dict.fromkeys(TOKEN_KINDS + ('calls', 'cost_usd'), 0))
+            for kind in TOKEN_KINDS:
+                totals[kind] += counts[kind]
+            totals['calls'] += 1
+            totals['cost_usd'] += cost
+
+        for kind in TOKEN_KINDS:
+            OPENAI_TOKENS.inc(counts[kind], endpoint=endpoint, feature=feature, model=model, kind=kind.replace('_tokens', ''))
+        OPENAI_COST.inc(cost, endpoint=endpoint, feature=feature, model=model)
+        return cost
+
+    def _rollup(self, label_index, label_names):
+        grouped = {}
+        for key, totals in self._totals.items():
+            labels = tuple(key[i] for i in label_index)
+            row = grouped.setdefault(labels, dict.fromkeys(TOKEN_KINDS + ('calls', 'cost_usd'), 0))
+            for kind, value in totals.items():
+                row[kind] += value
+        rows = [dict(zip(label_names, labels), **row) for labels, row in grouped.items()]
+        for row in rows:
+            row['cost_usd'] = round(row['cost_usd'], 6)
+            row['cached_ratio'] = round(row['cached_tokens'] / row['prompt_tokens'], 3) if row['prompt_tokens'] else 0.0
+        return sorted(rows, key=lambda row: row['cost_usd'], reverse=True)
+
+    def summary(self):
+        """Totals overall, by feature and model, and by endpoint; most expensive first"""
+        with self._lock:
+            total = self._rollup((), ())
+            return {
+                'since': self.since,
+                'total': total[0] if total else dict.fromkeys(TOKEN_KINDS + ('calls', 'cost_usd', 'cached_ratio'), 0),
+                'by_feature': self._rollup((1, 2), ('feature', 'model')),
+                'by_endpoint': self._rollup((0,), ('endpoint',)),
+                'prices_per_million_tokens': self.prices,
+            }
+
+
+USAGE = UsageLedger()